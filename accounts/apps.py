@@ -1,6 +1,14 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class AccountsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'accounts'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        if settings.FACE_WARMUP_ON_START:
+            # Roda em cada worker: o pool de reconhecimento é criado e aquecido por processo
+            from .warmup import start_warm_up
+            start_warm_up()
@@ -0,0 +1,175 @@
+# Manutenção incremental do resumo diário (AttendanceDay).
+# Cada alteração em batidas, justificativas ou aprovações recalcula apenas os dias afetados,
+# lendo no máximo três batidas por dia, e grava tudo com um único upsert; os relatórios em cache
+# desses usuários são invalidados quando a transação confirmar.
+from collections import defaultdict
+from datetime import time
+from django.db import transaction
+from django.utils import timezone
+from .models import Attendance, AttendanceDay, Justification
+from .report_cache import invalidate_reports
+
+# Horários em minutos desde a meia-noite: status, atraso e horas são calculados em inteiros
+# e convertidos para texto (HH:MM) apenas na serialização.
+LATE_AFTER = 7 * 60
+# Sem batida de almoço o intervalo padrão de uma hora é descontado das horas trabalhadas
+DEFAULT_LUNCH = 60
+MINUTES_PER_DAY = 24 * 60
+WORKED_STATUSES = ('Aprovado', 'Atraso')
+POINT_TYPES = ('entrada', 'almoco', 'saida')
+
+SUMMARY_FIELDS = [
+    'entrada', 'almoco', 'saida', 'punch_count', 'worked_seconds', 'is_late', 'status',
+    'justification_count', 'approved_justification_count', 'updated_at',
+]
+
+
+def minute_of(value):
+    # Os relatórios sempre trabalharam com precisão de minutos (HH:MM)
+    return value.hour * 60 + value.minute if value is not None else None
+
+
+def time_of(minute):
+    return time(minute // 60, minute % 60) if minute is not None else None
+
+
+def format_minute(minute):
+    return f"{minute // 60:02d}:{minute % 60:02d}" if minute is not None else '-'
+
+
+def day_status(entrada, saida):
+    if entrada is None:
+        return 'Falta'
+    if saida is None:
+        return 'Pendente'
+    if entrada > LATE_AFTER:
+        return 'Atraso'
+    return 'Aprovado'
+
+
+def worked_minutes(entrada, almoco, saida):
+    if entrada is None or saida is None:
+        return 0
+    end = saida if saida >= entrada else saida + MINUTES_PER_DAY
+    return max(0, end - entrada - (0 if almoco is not None else DEFAULT_LUNCH))
+
+
+class DayRecord:
+    """Um dia de ponto com os horários em minutos desde a meia-noite (None quando não batido)."""
+
+    __slots__ = ('date', 'entrada', 'almoco', 'saida', 'punch_count', 'justification_count', 'approved_justification_count', 'status', 'worked_minutes')
+
+    def __init__(self, date, entrada=None, almoco=None, saida=None, punch_count=0, justification_count=0, approved_justification_count=0):
+        self.date = date
+        self.entrada = entrada
+        self.almoco = almoco
+        self.saida = saida
+        self.punch_count = punch_count
+        self.justification_count = justification_count
+        self.approved_justification_count = approved_justification_count
+        self.status = day_status(entrada, saida)
+        self.worked_minutes = worked_minutes(entrada, almoco, saida) if self.status in WORKED_STATUSES else 0
+
+    @classmethod
+    def from_punches(cls, date, punches, justifications=()):
+        """Monta o dia a partir de (tipo, data_hora) das batidas e do campo approved das justificativas."""
+        current_tz = timezone.get_current_timezone()
+        first = {}
+        for point_type, data_hora in punches:
+            if point_type not in first or data_hora < first[point_type]:
+                first[point_type] = data_hora
+        entrada, almoco, saida = (
+            minute_of(first[point_type].astimezone(current_tz)) if point_type in first else None
+            for point_type in POINT_TYPES
+        )
+        return cls(
+            date, entrada, almoco, saida,
+            punch_count=len(punches),
+            justification_count=len(justifications),
+            approved_justification_count=sum(1 for approved in justifications if approved),
+        )
+
+    @classmethod
+    def from_summary(cls, date, entrada, almoco, saida, punch_count=0, justification_count=0):
+        # Linha do AttendanceDay (TimeFields) para o formato em minutos
+        return cls(date, minute_of(entrada), minute_of(almoco), minute_of(saida), punch_count, justification_count)
+
+    @property
+    def is_late(self):
+        return self.status == 'Atraso'
+
+    def to_summary(self, user_id):
+        return AttendanceDay(
+            user_id=user_id,
+            date=self.date,
+            entrada=time_of(self.entrada),
+            almoco=time_of(self.almoco),
+            saida=time_of(self.saida),
+            punch_count=self.punch_count,
+            worked_seconds=self.worked_minutes * 60,
+            is_late=self.is_late,
+            status=self.status,
+            justification_count=self.justification_count,
+            approved_justification_count=self.approved_justification_count,
+        )
+
+    def serialize(self, day_id):
+        lunch = format_minute(self.almoco)
+        return {
+            'id': str(day_id),
+            'date': self.date.strftime('%d/%m/%Y'),
+            'entrada': format_minute(self.entrada),
+            'entrada_almoco': lunch,
+            'saida_almoco': lunch,
+            'saida': format_minute(self.saida),
+            'status': self.status,
+            'observacao': '',
+        }
+
+
+def build_day(user_id, date, punches, justifications):
+    return DayRecord.from_punches(date, punches, justifications).to_summary(user_id)
+
+
+def refresh_attendance_days(keys):
+    """Recalcula os dias (user_id, data local) informados: duas consultas e um upsert em lote."""
+    keys = {(user_id, date) for user_id, date in keys if user_id and date}
+    if not keys:
+        return 0
+    user_ids = {user_id for user_id, _ in keys}
+    dates = {date for _, date in keys}
+
+    punches = defaultdict(list)
+    rows = Attendance.objects.filter(user_id__in=user_ids, data_local__in=dates).values_list('user_id', 'data_local', 'point_type', 'data_hora')
+    for user_id, date, point_type, data_hora in rows:
+        if (user_id, date) in keys:
+            punches[(user_id, date)].append((point_type, data_hora))
+
+    justifications = defaultdict(list)
+    rows = Justification.objects.filter(user_id__in=user_ids, date__in=dates).values_list('user_id', 'date', 'approval__approved')
+    for user_id, date, approved in rows:
+        if (user_id, date) in keys:
+            justifications[(user_id, date)].append(approved)
+
+    days = [
+        build_day(user_id, date, punches[(user_id, date)], justifications[(user_id, date)])
+        for user_id, date in keys
+        if punches[(user_id, date)] or justifications[(user_id, date)]
+    ]
+    empty = [key for key in keys if not punches[key] and not justifications[key]]
+    with transaction.atomic():
+        if days:
+            AttendanceDay.objects.bulk_create(
+                days,
+                update_conflicts=True,
+                unique_fields=['user', 'date'],
+                update_fields=SUMMARY_FIELDS,
+            )
+        for user_id, date in empty:
+            AttendanceDay.objects.filter(user_id=user_id, date=date).delete()
+        invalidate_reports(user_ids, dates)
+    return len(days)
+
+
+def refresh_attendance_day(user_id, date):
+    return refresh_attendance_days({(user_id, date)})
@@ -0,0 +1,156 @@
+# Medição das etapas da batida de ponto: decodificação, detecção, codificação, busca e gravação
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from ..face_encoding import decode_image, downscale, open_image, scale_location
+from ..matching import EmbeddingGallery, QuantizedGallery, pgvector_candidates
+from ..models import Attendance, CustomUser
+from ..photos import persist_photo, photo_paths
+from ..quantization import pack_embedding
+from .stats import StageTimer, summarize
+import face_recognition
+import hashlib
+import numpy as np
+import time
+import uuid
+
+
+def time_image_stages(images, options, repeat=1):
+    timer = StageTimer()
+    for _ in range(repeat):
+        for data in images:
+            pil_image = timer.measure('verify', open_image, data)
+            pil_image = timer.measure('decode', decode_image, pil_image)
+            image = np.asarray(pil_image)
+            detection_image, scale = timer.measure('resize', downscale, image, options['max_edge'], pil_image)
+            locations = timer.measure(
+                'detect', face_recognition.face_locations, detection_image,
+                number_of_times_to_upsample=options['upsample'], model=options['detector'],
+            )
+            # Sem rosto detectado (imagens sintéticas) codifica o quadro central para medir o encoder
+            if locations:
+                location = scale_location(locations[0], scale, image.shape)
+            else:
+                height, width = image.shape[:2]
+                side = min(height, width) // 2
+                top, left = (height - side) // 2, (width - side) // 2
+                location = (top, left + side, top + side, left)
+            timer.measure(
+                'encode', face_recognition.face_encodings, image,
+                known_face_locations=[location], num_jitters=options['num_jitters'], model=options['encoder_model'],
+            )
+    return timer.report()
+
+
+def scan_nearest(vectors, probe):
+    # Equivalente em memória ao backend 'scan': uma chamada de face_distance por usuário
+    best_index, best_distance = -1, float('inf')
+    for index, vector in enumerate(vectors):
+        distance = face_recognition.face_distance([vector], probe)[0]
+        if distance < best_distance:
+            best_index, best_distance = index, distance
+    return best_index, best_distance
+
+
+def time_in_memory_backend(backend, user_ids, vectors, probes, expected, candidates=10):
+    samples = []
+    hits = 0
+    if backend == 'scan':
+        for probe, index in zip(probes, expected):
+            started = time.perf_counter()
+            found, _ = scan_nearest(vectors, probe)
+            samples.append(time.perf_counter() - started)
+            hits += found == index
+    elif backend == 'gallery':
+        gallery = EmbeddingGallery()
+        gallery.load_arrays(user_ids, vectors)
+        for probe, index in zip(probes, expected):
+            started = time.perf_counter()
+            user_id, _ = gallery.nearest(probe)
+            samples.append(time.perf_counter() - started)
+            hits += user_id == user_ids[index]
+    elif backend == 'quantized':
+        gallery = QuantizedGallery()
+        gallery.load_embeddings(user_ids, vectors)
+        # Linha de cada id na galeria, sem supor ids contíguos
+        order = np.argsort(user_ids)
+        for probe, index in zip(probes, expected):
+            started = time.perf_counter()
+            candidate_ids = gallery.candidates(probe, candidates)
+            rows = vectors[order[np.searchsorted(user_ids, candidate_ids, sorter=order)]]
+            user_id = candidate_ids[int(np.argmin(np.linalg.norm(rows - probe, axis=1)))]
+            samples.append(time.perf_counter() - started)
+            hits += user_id == user_ids[index]
+    else:
+        raise ValueError(f"Backend sem benchmark em memória: {backend}")
+    result = summarize(samples)
+    result['accuracy'] = hits / len(probes) if len(probes) else None
+    return result
+
+
+class RollbackBenchmark(Exception):
+    pass
+
+
+def run_prefix():
+    # Prefixo único por execução: não colide com usuários bench_* deixados por outra execução
+    return f"bench_{uuid.uuid4().hex[:8]}"
+
+
+def time_pgvector_backend(vectors, probes, expected, candidates=1, batch_size=5000, prefix=None):
+    """Insere a galeria sintética no Postgres numa transação descartada ao final."""
+    prefix = prefix or run_prefix()
+    result = {}
+    try:
+        with transaction.atomic():
+            users = []
+            started = time.perf_counter()
+            for start in range(0, len(vectors), batch_size):
+                chunk = [
+                    CustomUser(
+                        username=f"{prefix}_{start + offset}",
+                        email=f"{prefix}_{start + offset}@benchmark.invalid",
+                        facial_embedding=vector.tolist(),
+                        facial_embedding_code=pack_embedding(vector, settings.FACE_EMBEDDING_CODE_DTYPE),
+                    )
+                    for offset, vector in enumerate(vectors[start:start + batch_size])
+                ]
+                users.extend(CustomUser.objects.bulk_create(chunk))
+            result['insert_seconds'] = time.perf_counter() - started
+
+            samples = []
+            hits = 0
+            for probe, index in zip(probes, expected):
+                started = time.perf_counter()
+                found = pgvector_candidates(probe, CustomUser, k=candidates)
+                samples.append(time.perf_counter() - started)
+                hits += bool(found) and found[0].id == users[index].id
+            result.update(summarize(samples))
+            result['accuracy'] = hits / len(probes) if len(probes) else None
+            raise RollbackBenchmark()
+    except RollbackBenchmark:
+        pass
+    return result
+
+
+def time_persist_stage(image, repeat=20, prefix=None):
+    # Gravação da foto e do registro de ponto; o banco é revertido e os arquivos removidos
+    prefix = prefix or run_prefix()
+    timer = StageTimer()
+    saved_paths = []
+    try:
+        with transaction.atomic():
+            user = CustomUser.objects.create(username=f"{prefix}_persist", email=f"{prefix}_persist@benchmark.invalid")
+            for index in range(repeat):
+                # Caminho distinto por repetição para não cair no atalho de conteúdo já gravado
+                paths = photo_paths(hashlib.sha256(image + str(index).encode()).hexdigest())
+                timer.measure('persist_photo', persist_photo, image, *paths)
+                saved_paths.extend(paths)
+                timer.measure('persist_insert', Attendance.objects.create, user=user, point_type='entrada')
+            raise RollbackBenchmark()
+    except RollbackBenchmark:
+        pass
+    finally:
+        for path in saved_paths:
+            default_storage.delete(path)
+    return timer.report()
@@ -0,0 +1,35 @@
+import numpy as np
+import time
+
+
+def summarize(samples):
+    # Latências em milissegundos e vazão de uma única thread
+    if not samples:
+        return {'n': 0}
+    values = np.asarray(samples, dtype=np.float64) * 1000
+    mean = float(values.mean())
+    return {
+        'n': int(len(values)),
+        'mean_ms': mean,
+        'p50_ms': float(np.percentile(values, 50)),
+        'p95_ms': float(np.percentile(values, 95)),
+        'p99_ms': float(np.percentile(values, 99)),
+        'throughput_per_s': 1000 / mean if mean else None,
+    }
+
+
+class StageTimer:
+    def __init__(self):
+        self.samples = {}
+
+    def record(self, stage, seconds):
+        self.samples.setdefault(stage, []).append(seconds)
+
+    def measure(self, stage, fn, *args, **kwargs):
+        started = time.perf_counter()
+        result = fn(*args, **kwargs)
+        self.record(stage, time.perf_counter() - started)
+        return result
+
+    def report(self):
+        return {stage: summarize(samples) for stage, samples in self.samples.items()}
@@ -0,0 +1,33 @@
+# Geração de dados sintéticos para os benchmarks de reconhecimento
+from PIL import Image
+import numpy as np
+import io
+
+DIMENSIONS = 128
+
+
+def synthetic_gallery(size, seed=42):
+    # Vetores normalizados, com a mesma escala dos embeddings reais do dlib (norma ~1)
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(size, DIMENSIONS)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    user_ids = np.arange(1, size + 1, dtype=np.int64)
+    return user_ids, vectors
+
+
+def synthetic_probes(vectors, count, noise=0.03, seed=7):
+    # Sondas próximas de embeddings da galeria, simulando uma nova foto da mesma pessoa
+    rng = np.random.default_rng(seed)
+    indexes = rng.choice(len(vectors), size=min(count, len(vectors)), replace=False)
+    probes = vectors[indexes] + rng.normal(scale=noise, size=(len(indexes), DIMENSIONS)).astype(np.float32)
+    return indexes, probes
+
+
+def synthetic_image(width=1280, height=960, seed=0, image_format='JPEG'):
+    # Quadro de câmera sintético (sem rosto) para medir decodificação e detecção
+    rng = np.random.default_rng(seed)
+    pixels = rng.integers(0, 256, size=(height // 8, width // 8, 3), dtype=np.uint8)
+    image = Image.fromarray(pixels).resize((width, height), Image.Resampling.BILINEAR)
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format, quality=90)
+    return buffer.getvalue()
@@ -0,0 +1,122 @@
+from collections import OrderedDict
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError
+from django.utils import timezone
+from .models import FaceEmbeddingCacheEntry
+import numpy as np
+import threading
+import hashlib
+import logging
+import json
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def embedding_cache_key(data, options):
+    # SHA-256 dos bytes enviados; as opções de codificação entram no hash para não misturar configurações
+    hasher = hashlib.sha256(data)
+    hasher.update(json.dumps(options, sort_keys=True).encode())
+    return hasher.hexdigest()
+
+
+class EmbeddingCache:
+    """LRU com TTL em memória e, opcionalmente, uma tabela no banco compartilhada entre workers."""
+
+    def __init__(self, max_entries=None, ttl=None, use_db=None):
+        self._max_entries = max_entries
+        self._ttl = ttl
+        self._use_db = use_db
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db_writes = 0
+        self.hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    @property
+    def max_entries(self):
+        return self._max_entries if self._max_entries is not None else settings.FACE_EMBEDDING_CACHE_SIZE
+
+    @property
+    def ttl(self):
+        return self._ttl if self._ttl is not None else settings.FACE_EMBEDDING_CACHE_TTL
+
+    @property
+    def use_db(self):
+        return self._use_db if self._use_db is not None else settings.FACE_EMBEDDING_CACHE_DB
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0 or self.use_db
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, embedding = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return embedding
+                del self._entries[key]
+
+        if self.use_db:
+            cutoff = timezone.now() - timedelta(seconds=self.ttl)
+            row = FaceEmbeddingCacheEntry.objects.filter(digest=key, created_at__gte=cutoff).values_list('embedding', flat=True).first()
+            if row is not None:
+                embedding = np.asarray(row, dtype=np.float64)
+                self._remember(key, embedding)
+                with self._lock:
+                    self.db_hits += 1
+                return embedding
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, embedding):
+        if not self.enabled:
+            return
+        self._remember(key, embedding)
+        if self.use_db:
+            try:
+                FaceEmbeddingCacheEntry.objects.update_or_create(
+                    digest=key,
+                    defaults={'embedding': np.asarray(embedding).tolist(), 'created_at': timezone.now()},
+                )
+            except IntegrityError:
+                pass
+            self._db_writes += 1
+            if self._db_writes % 100 == 0:
+                cutoff = timezone.now() - timedelta(seconds=self.ttl)
+                FaceEmbeddingCacheEntry.objects.filter(created_at__lt=cutoff).delete()
+
+    def _remember(self, key, embedding):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, embedding)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'db_hits': self.db_hits,
+                'misses': self.misses,
+            }
+
+
+embedding_cache = EmbeddingCache()
@@ -0,0 +1,201 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import nullcontext
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+from itertools import repeat
+from .face_encoding import try_encode_face, warm_up
+from .matching import notify_gallery_bulk_changed
+from .models import CustomUser, UserRole
+from .quantization import pack_embedding
+from .services import get_face_encoding_options
+from .utils.validators import validate_cpf, validate_phone_number
+from .logs import get_event_logger
+import multiprocessing
+import json
+import csv
+import io
+import os
+
+logger = get_event_logger(__name__)
+
+MANIFEST_FIELDS = ['username', 'email', 'password', 'cpf', 'phone_number', 'role', 'photo']
+REQUIRED_FIELDS = ['username', 'email', 'cpf', 'phone_number', 'photo']
+ALLOWED_PHOTO_EXTENSIONS = {'.jpg', '.jpeg', '.png'}
+
+
+def parse_manifest(content, filename):
+    if isinstance(content, bytes):
+        content = content.decode('utf-8-sig')
+    if filename.lower().endswith('.json'):
+        rows = json.loads(content)
+        if not isinstance(rows, list):
+            raise ValueError('O manifesto JSON deve ser uma lista de objetos.')
+    elif filename.lower().endswith('.csv'):
+        rows = list(csv.DictReader(io.StringIO(content)))
+    else:
+        raise ValueError('Formato de manifesto não suportado. Use .csv ou .json')
+    return [
+        {field: str(row.get(field) or '').strip() for field in MANIFEST_FIELDS}
+        for row in rows
+    ]
+
+
+def validate_rows(rows, archive):
+    photo_names = set(archive.namelist())
+    errors = {index: [] for index in range(len(rows))}
+
+    usernames = [row['username'] for row in rows]
+    emails = [row['email'].lower() for row in rows]
+    existing_usernames = set(CustomUser.objects.filter(username__in=usernames).values_list('username', flat=True))
+    existing_emails = {
+        email.lower() for email in CustomUser.objects.filter(email__in=[row['email'] for row in rows]).values_list('email', flat=True)
+    }
+    username_field = CustomUser._meta.get_field('username')
+    seen_usernames = set()
+    seen_emails = set()
+
+    for index, row in enumerate(rows):
+        row_errors = errors[index]
+        missing = [field for field in REQUIRED_FIELDS if not row[field]]
+        if missing:
+            row_errors.append(f"Campos obrigatórios ausentes: {', '.join(missing)}")
+            continue
+
+        try:
+            username_field.run_validators(row['username'])
+        except ValidationError as e:
+            row_errors.extend(e.messages)
+        try:
+            validate_email(row['email'])
+        except ValidationError as e:
+            row_errors.extend(e.messages)
+
+        is_valid_cpf, cpf_error = validate_cpf(row['cpf'])
+        if not is_valid_cpf:
+            row_errors.append(cpf_error)
+        is_valid_phone, phone_error = validate_phone_number(row['phone_number'])
+        if not is_valid_phone:
+            row_errors.append(phone_error)
+
+        if row['role'] and row['role'] not in [role.value for role in UserRole]:
+            row_errors.append(f"Perfil inválido: {row['role']}")
+
+        if row['username'] in existing_usernames or row['username'] in seen_usernames:
+            row_errors.append('Nome de usuário já cadastrado.')
+        if emails[index] in existing_emails or emails[index] in seen_emails:
+            row_errors.append('Email já cadastrado.')
+        seen_usernames.add(row['username'])
+        seen_emails.add(emails[index])
+
+        if os.path.splitext(row['photo'].lower())[1] not in ALLOWED_PHOTO_EXTENSIONS:
+            row_errors.append('Formato de imagem não suportado. Use .jpg, .jpeg ou .png')
+        elif row['photo'] not in photo_names:
+            row_errors.append(f"Foto {row['photo']} não encontrada no arquivo zip.")
+
+    return errors
+
+
+def embedding_executor(workers):
+    if workers <= 1:
+        return nullcontext()
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=warm_up,
+    )
+
+
+def extract_embeddings(executor, photos, options):
+    # Codificação facial em paralelo em todos os núcleos; devolve (embedding, erro) na ordem de entrada
+    if executor is None:
+        return [try_encode_face(data, options) for data in photos]
+    return list(executor.map(try_encode_face, photos, repeat(options), chunksize=4))
+
+
+def hash_passwords(passwords, workers):
+    # O PBKDF2 do hashlib libera a GIL, então threads bastam para paralelizar
+    def hash_password(password):
+        return make_password(password or None)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        return list(executor.map(hash_password, passwords))
+
+
+def insert_users(users, chunk_size):
+    created = {}
+    failed = {}
+    for start in range(0, len(users), chunk_size):
+        chunk = users[start:start + chunk_size]
+        try:
+            with transaction.atomic():
+                CustomUser.objects.bulk_create([user for _, user in chunk])
+            for index, user in chunk:
+                created[index] = user
+        except IntegrityError:
+            # Algum conflito de unicidade no lote: insere um a um para isolar a linha problemática
+            for index, user in chunk:
+                try:
+                    with transaction.atomic():
+                        user.save(force_insert=True)
+                    created[index] = user
+                except IntegrityError as e:
+                    failed[index] = str(e)
+    return created, failed
+
+
+def enroll_users(rows, archive, workers=None, chunk_size=None):
+    workers = workers or settings.FACE_BULK_ENROLL_WORKERS
+    chunk_size = chunk_size or settings.FACE_BULK_ENROLL_CHUNK_SIZE
+    logger.info('enroll.started', 'Cadastro em lote iniciado: {rows} linhas, {workers} processos', rows=len(rows), workers=workers, chunk_size=chunk_size)
+
+    errors = validate_rows(rows, archive)
+    valid_indexes = [index for index in range(len(rows)) if not errors[index]]
+
+    options = get_face_encoding_options()
+    encoded = {}
+    with embedding_executor(workers) as executor:
+        # Lê as fotos do zip por lotes para não manter o arquivo inteiro em memória
+        for start in range(0, len(valid_indexes), chunk_size):
+            batch = valid_indexes[start:start + chunk_size]
+            photos = [archive.read(rows[index]['photo']) for index in batch]
+            for index, (embedding, error) in zip(batch, extract_embeddings(executor, photos, options)):
+                if error:
+                    errors[index].append(f"Erro ao processar imagem facial: {error}")
+                else:
+                    encoded[index] = embedding
+
+    indexes = sorted(encoded)
+    passwords = hash_passwords([rows[index]['password'] for index in indexes], workers)
+    users = []
+    for index, password in zip(indexes, passwords):
+        row = rows[index]
+        users.append((index, CustomUser(
+            username=row['username'],
+            email=row['email'],
+            password=password,
+            cpf=row['cpf'],
+            phone_number=row['phone_number'],
+            role=row['role'] or UserRole.USER.value,
+            facial_embedding=encoded[index].tolist(),
+            facial_embedding_code=pack_embedding(encoded[index], settings.FACE_EMBEDDING_CODE_DTYPE),
+        )))
+
+    created, failed = insert_users(users, chunk_size)
+    for index, error in failed.items():
+        errors[index].append(f"Erro ao inserir usuário: {error}")
+    if created:
+        notify_gallery_bulk_changed()
+
+    report = []
+    for index, row in enumerate(rows):
+        item = {'row': index + 1, 'username': row['username'], 'email': row['email']}
+        if index in created:
+            item.update({'status': 'created', 'user_id': created[index].id})
+        else:
+            item.update({'status': 'error', 'errors': errors[index]})
+        report.append(item)
+    logger.info('enroll.finished', 'Cadastro em lote concluído: {created} criados, {failed} com erro', created=len(created), failed=len(rows) - len(created))
+    return report
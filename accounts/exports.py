@@ -0,0 +1,131 @@
+# Exportação das batidas e dos totais diários para a folha de pagamento.
+# As linhas saem do banco por cursor no servidor (.iterator) em tuplas (values_list) e são escritas
+# à medida que chegam, então a memória não cresce com o tamanho da exportação.
+from datetime import datetime, time, timedelta
+from django.conf import settings
+from django.utils import timezone
+from .attendance_days import format_minute, minute_of
+from .models import Attendance, AttendanceDay
+import csv
+
+EXPORT_KINDS = ('punches', 'days')
+EXPORT_FORMATS = ('csv', 'xlsx')
+
+PUNCH_HEADER = ['id', 'usuario', 'cpf', 'data', 'hora', 'tipo']
+PUNCH_COLUMNS = ('id', 'user__username', 'user__cpf', 'data_local', 'data_hora', 'point_type')
+
+# Texto iniciado por estes caracteres vira fórmula no Excel/LibreOffice (injeção via nome de usuário etc.)
+FORMULA_PREFIXES = ('=', '@', '\t', '\r')
+# '-' e '+' só viram fórmula com algo depois: o '-' sozinho é o marcador de horário vazio (format_minute)
+SIGN_PREFIXES = ('-', '+')
+
+DAY_HEADER = ['usuario', 'cpf', 'data', 'entrada', 'almoco', 'saida', 'batidas', 'horas_trabalhadas', 'status', 'justificativas', 'justificativas_aprovadas']
+DAY_COLUMNS = (
+    'user__username', 'user__cpf', 'date', 'entrada', 'almoco', 'saida', 'punch_count',
+    'worked_seconds', 'status', 'justification_count', 'approved_justification_count',
+)
+
+
+class Echo:
+    # "Arquivo" cujo write devolve a linha, para o csv.writer alimentar o StreamingHttpResponse
+    def write(self, value):
+        return value
+
+
+def is_number(text):
+    try:
+        float(text)
+    except ValueError:
+        return False
+    return True
+
+
+def safe_cell(value):
+    # Apóstrofo na frente: a planilha exibe o texto como veio, sem avaliar
+    if not isinstance(value, str):
+        return value
+    if value.startswith(FORMULA_PREFIXES):
+        return f"'{value}"
+    if value.startswith(SIGN_PREFIXES) and len(value) > 1 and not is_number(value):
+        return f"'{value}"
+    return value
+
+
+def safe_row(row):
+    return [safe_cell(value) for value in row]
+
+
+def local_day_start(date):
+    return timezone.make_aware(datetime.combine(date, time.min))
+
+
+def punch_rows(start_date, end_date, user_id=None, point_type=None):
+    # Limites em data_hora (e não em data_local) para usar o índice (data_hora, id)
+    queryset = Attendance.objects.filter(
+        data_hora__gte=local_day_start(start_date),
+        data_hora__lt=local_day_start(end_date + timedelta(days=1)),
+    )
+    if user_id:
+        queryset = queryset.filter(user_id=user_id)
+    if point_type:
+        queryset = queryset.filter(point_type=point_type)
+    current_tz = timezone.get_current_timezone()
+    rows = queryset.order_by('data_hora', 'id').values_list(*PUNCH_COLUMNS).iterator(chunk_size=settings.ATTENDANCE_EXPORT_CHUNK_SIZE)
+    for punch_id, username, cpf, date, data_hora, kind in rows:
+        yield [punch_id, username, cpf or '', date.isoformat() if date else '', data_hora.astimezone(current_tz).strftime('%H:%M:%S'), kind]
+
+
+def day_rows(start_date, end_date, user_id=None):
+    queryset = AttendanceDay.objects.filter(date__gte=start_date, date__lte=end_date)
+    if user_id:
+        queryset = queryset.filter(user_id=user_id)
+    rows = queryset.order_by('date', 'user_id').values_list(*DAY_COLUMNS).iterator(chunk_size=settings.ATTENDANCE_EXPORT_CHUNK_SIZE)
+    for username, cpf, date, entrada, almoco, saida, punch_count, seconds, status, justifications, approved in rows:
+        yield [
+            username, cpf or '', date.isoformat(),
+            format_minute(minute_of(entrada)), format_minute(minute_of(almoco)), format_minute(minute_of(saida)),
+            punch_count, round(seconds / 3600, 2), status, justifications, approved,
+        ]
+
+
+def export_rows(kind, start_date, end_date, user_id=None, point_type=None):
+    """Cabeçalho e gerador de linhas da exportação pedida."""
+    if kind == 'days':
+        return DAY_HEADER, day_rows(start_date, end_date, user_id)
+    return PUNCH_HEADER, punch_rows(start_date, end_date, user_id, point_type)
+
+
+def stream_csv(header, rows):
+    writer = csv.writer(Echo())
+    # BOM para o Excel abrir os acentos corretamente
+    yield '\ufeff' + writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(safe_row(row))
+
+
+def write_xlsx(header, rows, output):
+    """Planilha em modo write_only (linhas vão para disco, não para a memória).
+
+    O formato XLSX é um zip que só fica válido ao final, então não há como enviar em fluxo:
+    a planilha é gerada por um worker da fila (punch_queue.process_export_job) e baixada pronta.
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('chronos')
+    sheet.append(header)
+    for row in rows:
+        sheet.append(safe_row(row))
+    workbook.save(output)
+
+
+def export_filename(kind, start_date, end_date, export_format):
+    return f"chronos-{kind}-{start_date.isoformat()}-{end_date.isoformat()}.{export_format}"
+
+
+def xlsx_available():
+    try:
+        import openpyxl  # noqa: F401
+    except ImportError:
+        return False
+    return True
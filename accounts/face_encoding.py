@@ -0,0 +1,135 @@
+# Funções puras de decodificação/detecção/codificação facial.
+# Este módulo não depende do Django para poder rodar nos processos do pool de reconhecimento.
+from PIL import Image, ImageOps
+import face_recognition
+import numpy as np
+import time
+import io
+
+ALLOWED_FORMATS = {'JPEG', 'PNG', 'MPO'}
+
+DEFAULT_OPTIONS = {
+    'max_edge': 0,
+    'detector': 'hog',
+    'upsample': 1,
+    'num_jitters': 1,
+    'encoder_model': 'small',
+}
+
+
+def warm_up():
+    # A importação de face_recognition carrega os pesos do dlib; uma detecção e uma codificação
+    # numa imagem vazia inicializam o restante antes da primeira batida real
+    image = np.zeros((150, 150, 3), dtype=np.uint8)
+    face_recognition.face_locations(image)
+    face_recognition.face_encodings(image, known_face_locations=[(0, 150, 150, 0)])
+    return True
+
+
+def downscale(image, max_edge, source=None):
+    # source: a mesma imagem já em PIL, para não reconstruí-la a partir do array
+    height, width = image.shape[:2]
+    if not max_edge or max(height, width) <= max_edge:
+        return image, 1.0
+    scale = max_edge / max(height, width)
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    resized = (source or Image.fromarray(image)).resize(size, Image.Resampling.BILINEAR)
+    return np.asarray(resized), scale
+
+
+def scale_location(location, scale, shape):
+    # Converte (top, right, bottom, left) da imagem reduzida para a imagem original
+    if scale == 1.0:
+        return location
+    height, width = shape[:2]
+    top, right, bottom, left = location
+    return (
+        max(0, int(top / scale)),
+        min(width, int(round(right / scale))),
+        min(height, int(round(bottom / scale))),
+        max(0, int(left / scale)),
+    )
+
+
+def open_image(data):
+    # Lê apenas o cabeçalho; a decodificação dos pixels acontece uma única vez em decode_image
+    image = Image.open(io.BytesIO(data))
+    if image.format not in ALLOWED_FORMATS:
+        raise ValueError(f"Formato de imagem não suportado: {image.format}")
+    return image
+
+
+def decode_image(image):
+    # Fotos de celular vêm rotacionadas via EXIF; a mesma imagem RGB serve à detecção, à codificação e à miniatura
+    return ImageOps.exif_transpose(image).convert('RGB')
+
+
+def encode_photo(image, max_edge, quality, image_format):
+    image = image.copy()
+    image.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format, quality=quality)
+    return buffer.getvalue()
+
+
+def render_photo(image, photo_options):
+    """Gera (foto reduzida, miniatura) a partir da imagem já decodificada."""
+    return (
+        encode_photo(image, photo_options['max_edge'], photo_options['quality'], photo_options['format']),
+        encode_photo(image, photo_options['thumb_edge'], photo_options['quality'], photo_options['format']),
+    )
+
+
+def encode_face(data, options=None):
+    """Valida, decodifica, detecta e codifica o primeiro rosto da imagem.
+
+    Retorna o embedding e o tempo (em segundos) gasto em cada etapa.
+    """
+    options = {**DEFAULT_OPTIONS, **(options or {})}
+    timings = {}
+
+    started = time.perf_counter()
+    pil_image = open_image(data)
+    timings['verify'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    pil_image = decode_image(pil_image)
+    image = np.asarray(pil_image)
+    timings['decode'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    detection_image, scale = downscale(image, options['max_edge'], pil_image)
+    timings['resize'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    locations = face_recognition.face_locations(
+        detection_image,
+        number_of_times_to_upsample=options['upsample'],
+        model=options['detector'],
+    )
+    timings['detect'] = time.perf_counter() - started
+    if not locations:
+        raise ValueError("Nenhum rosto detectado na imagem.")
+
+    started = time.perf_counter()
+    location = scale_location(locations[0], scale, image.shape)
+    encodings = face_recognition.face_encodings(
+        image,
+        known_face_locations=[location],
+        num_jitters=options['num_jitters'],
+        model=options['encoder_model'],
+    )
+    timings['encode'] = time.perf_counter() - started
+    if not encodings:
+        raise ValueError("Nenhum rosto detectado na imagem.")
+
+    return encodings[0], timings
+
+
+def try_encode_face(data, options=None):
+    # Variante para processamento em lote: devolve o erro em vez de levantar exceção
+    try:
+        embedding, _ = encode_face(data, options)
+        return embedding, None
+    except Exception as e:
+        return None, str(e)
@@ -0,0 +1,72 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from .models import PunchIdempotencyKey
+from .punches import PunchError
+from .logs import get_event_logger
+
+logger = get_event_logger(__name__)
+
+MAX_KEY_LENGTH = 128
+
+
+def claim_idempotency_key(key, request_user):
+    """Reserva a chave antes do reconhecimento.
+
+    Retorna (registro, None) quando esta requisição deve processar a batida, ou
+    (registro, resposta guardada) quando a chave já foi concluída.
+    """
+    key = key.strip()
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise PunchError(f"Idempotency-Key inválida (até {MAX_KEY_LENGTH} caracteres)")
+    requested_by = request_user if request_user.is_authenticated else None
+    now = timezone.now()
+
+    try:
+        with transaction.atomic():
+            return PunchIdempotencyKey.objects.create(key=key, requested_by=requested_by, created_at=now), None
+    except IntegrityError:
+        pass
+
+    with transaction.atomic():
+        # A busca inclui o principal: chaves iguais de usuários diferentes são registros distintos
+        record = PunchIdempotencyKey.objects.select_for_update().get(key=key, requested_by=requested_by)
+
+        expired = record.created_at < now - timedelta(seconds=settings.PUNCH_IDEMPOTENCY_TTL)
+        stale = record.status == PunchIdempotencyKey.STATUS_PROCESSING and \
+            record.created_at < now - timedelta(seconds=settings.PUNCH_IDEMPOTENCY_STALE_SECONDS)
+        if expired or stale:
+            # Resposta vencida ou requisição original interrompida: esta requisição assume a chave
+            record.status = PunchIdempotencyKey.STATUS_PROCESSING
+            record.response = None
+            record.status_code = None
+            record.attendance = None
+            record.created_at = now
+            record.save(update_fields=['status', 'response', 'status_code', 'attendance', 'created_at'])
+            return record, None
+
+    if record.status == PunchIdempotencyKey.STATUS_PROCESSING:
+        raise PunchError('Batida com esta Idempotency-Key ainda em processamento', status.HTTP_409_CONFLICT)
+    logger.info('idempotency.replayed', 'Idempotency-Key {key} repetida, devolvendo resposta guardada', key=key, status_code=record.status_code)
+    return record, (record.response, record.status_code)
+
+
+def remember_response(record, response_data, status_code):
+    record.status = PunchIdempotencyKey.STATUS_DONE
+    record.response = response_data
+    record.status_code = status_code
+    record.attendance_id = response_data.get('attendance_id') if isinstance(response_data, dict) else None
+    record.save(update_fields=['status', 'response', 'status_code', 'attendance'])
+
+
+def release_idempotency_key(record):
+    # Erros transitórios (ex.: pool sobrecarregado) não devem ficar guardados: o cliente pode tentar de novo
+    PunchIdempotencyKey.objects.filter(pk=record.pk, status=PunchIdempotencyKey.STATUS_PROCESSING).delete()
+
+
+def prune_idempotency_keys():
+    cutoff = timezone.now() - timedelta(seconds=settings.PUNCH_IDEMPOTENCY_TTL)
+    deleted, _ = PunchIdempotencyKey.objects.filter(created_at__lt=cutoff).delete()
+    return deleted
@@ -0,0 +1,114 @@
+# Camada de log estruturado para os caminhos quentes (batida de ponto e relatórios).
+# - formatação preguiçosa: a mensagem só é montada se algum handler realmente emitir o registro;
+# - amostragem por evento (LOG_SAMPLE_RATES) e limite de registros por segundo por evento;
+# - payloads completos (requisição, resposta, embeddings) apenas em DEBUG.
+from django.conf import settings
+import threading
+import logging
+import random
+import json
+import time
+
+MAX_VALUE_LENGTH = 200
+
+
+def _short(key, value):
+    text = str(value)
+    if key == 'payload':
+        return text
+    return text if len(text) <= MAX_VALUE_LENGTH else f"{text[:MAX_VALUE_LENGTH]}…"
+
+
+class EventMessage:
+    """Mensagem montada apenas quando o registro é formatado por um handler."""
+
+    __slots__ = ('event', 'message', 'fields')
+
+    def __init__(self, event, message, fields):
+        self.event = event
+        self.message = message
+        self.fields = fields
+
+    def __str__(self):
+        fields = ' '.join(f"{key}={_short(key, value)}" for key, value in self.fields.items())
+        text = self.message.format(**self.fields) if self.message else self.event
+        return f"{text} [{self.event}] {fields}".rstrip()
+
+
+class RateLimiter:
+    # Janela de um segundo por evento; o número de registros descartados vai no próximo emitido
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._windows = {}
+
+    def allow(self, event, limit):
+        now = int(time.monotonic())
+        with self._lock:
+            window, count, suppressed = self._windows.get(event, (now, 0, 0))
+            if window != now:
+                window, count = now, 0
+            if count >= limit:
+                self._windows[event] = (window, count, suppressed + 1)
+                return False, 0
+            self._windows[event] = (window, count + 1, 0)
+            return True, suppressed
+
+
+_rate_limiter = RateLimiter()
+
+
+class EventLogger:
+    def __init__(self, name):
+        self.logger = logging.getLogger(name)
+
+    def log(self, level, event, message=None, sample=None, limit=True, **fields):
+        if not self.logger.isEnabledFor(level):
+            return
+        rate = settings.LOG_SAMPLE_RATES.get(event, 1.0) if sample is None else sample
+        if rate < 1.0 and random.random() >= rate:
+            return
+        if limit and settings.LOG_RATE_LIMIT > 0:
+            allowed, suppressed = _rate_limiter.allow(event, settings.LOG_RATE_LIMIT)
+            if not allowed:
+                return
+            if suppressed:
+                fields['suppressed'] = suppressed
+        self.logger.log(level, '%s', EventMessage(event, message, fields), extra={'event': event, 'event_fields': fields}, stacklevel=3)
+
+    def debug(self, event, message=None, **fields):
+        self.log(logging.DEBUG, event, message, **fields)
+
+    def info(self, event, message=None, **fields):
+        self.log(logging.INFO, event, message, **fields)
+
+    def warning(self, event, message=None, **fields):
+        self.log(logging.WARNING, event, message, **fields)
+
+    def error(self, event, message=None, **fields):
+        # Erros nunca são amostrados nem limitados: cada falha precisa chegar ao log
+        self.log(logging.ERROR, event, message, sample=1.0, limit=False, **fields)
+
+    def payload(self, event, build, **fields):
+        """Despeja um payload completo só em DEBUG; build() é chamado apenas nesse caso."""
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.log(logging.DEBUG, event, limit=False, payload=build(), **fields)
+
+
+def get_event_logger(name):
+    return EventLogger(name)
+
+
+class JsonFormatter(logging.Formatter):
+    # Uma linha JSON por registro, com os campos do evento em primeiro nível
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'event': getattr(record, 'event', None),
+            'message': record.getMessage(),
+        }
+        entry.update(getattr(record, 'event_fields', {}))
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
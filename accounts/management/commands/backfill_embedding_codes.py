@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from accounts.matching import notify_gallery_bulk_changed
+from accounts.models import CustomUser
+from accounts.quantization import pack_embedding
+
+
+class Command(BaseCommand):
+    help = 'Gera os códigos compactos (facial_embedding_code) dos usuários que ainda não os possuem.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Regera os códigos de todos os usuários (ex.: após trocar FACE_EMBEDDING_CODE_DTYPE)')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        users = CustomUser.objects.exclude(facial_embedding__isnull=True).only('id', 'facial_embedding')
+        if not options['all']:
+            users = users.filter(facial_embedding_code__isnull=True)
+
+        batch = []
+        total = 0
+        for user in users.iterator(chunk_size=options['batch_size']):
+            user.facial_embedding_code = pack_embedding(user.facial_embedding, settings.FACE_EMBEDDING_CODE_DTYPE)
+            batch.append(user)
+            if len(batch) >= options['batch_size']:
+                CustomUser.objects.bulk_update(batch, ['facial_embedding_code'])
+                total += len(batch)
+                batch = []
+        if batch:
+            CustomUser.objects.bulk_update(batch, ['facial_embedding_code'])
+            total += len(batch)
+
+        if total:
+            notify_gallery_bulk_changed()
+        self.stdout.write(self.style.SUCCESS(f"{total} códigos de embedding gerados."))
@@ -0,0 +1,108 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+from django.utils import timezone
+from accounts.benchmarks.stages import (
+    run_prefix, time_image_stages, time_in_memory_backend, time_persist_stage, time_pgvector_backend,
+)
+from accounts.benchmarks.synthetic import synthetic_gallery, synthetic_image, synthetic_probes
+from accounts.services import get_face_encoding_options
+import platform
+import json
+import os
+
+IN_MEMORY_BACKENDS = ('gallery', 'quantized', 'scan')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+class Command(BaseCommand):
+    help = 'Mede a latência (p50/p95/p99) e a vazão de cada etapa da batida de ponto com galerias sintéticas.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000,100000', help='Tamanhos de galeria separados por vírgula')
+        parser.add_argument('--backends', default='gallery,quantized,scan,pgvector', help='Backends de busca separados por vírgula')
+        parser.add_argument('--probes', type=int, default=100, help='Sondas por tamanho de galeria')
+        parser.add_argument('--noise', type=float, default=0.03)
+        parser.add_argument('--scan-max-size', type=int, default=100000, help='Maior galeria medida com o backend scan (linha a linha)')
+        parser.add_argument('--images', help='Diretório com fotos de rosto reais; sem ele são usados quadros sintéticos')
+        parser.add_argument('--image-repeat', type=int, default=3)
+        parser.add_argument('--persist', action='store_true', help='Mede também a gravação da foto e do registro (transação revertida)')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', help='Grava o relatório em JSON')
+
+    def load_images(self, directory):
+        if not directory:
+            return [synthetic_image(seed=seed) for seed in range(5)], 'synthetic'
+        if not os.path.isdir(directory):
+            raise CommandError(f"Diretório não encontrado: {directory}")
+        images = []
+        for name in sorted(os.listdir(directory)):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                with open(os.path.join(directory, name), 'rb') as image_file:
+                    images.append(image_file.read())
+        if not images:
+            raise CommandError(f"Nenhuma imagem .jpg/.jpeg/.png em {directory}")
+        return images, directory
+
+    def run_db_stage(self, stage, *args, **kwargs):
+        # Usuários sintéticos colidindo com registros existentes (e-mail, CPF) abortam só com a mensagem
+        try:
+            return stage(*args, **kwargs)
+        except IntegrityError as e:
+            raise CommandError(f"Falha ao inserir dados sintéticos do benchmark: {str(e)}")
+
+    def handle(self, *args, **options):
+        try:
+            sizes = sorted({int(size) for size in options['sizes'].split(',') if size.strip()})
+        except ValueError:
+            raise CommandError('--sizes deve ser uma lista de inteiros separados por vírgula.')
+        backends = [backend.strip() for backend in options['backends'].split(',') if backend.strip()]
+        unknown = set(backends) - set(IN_MEMORY_BACKENDS) - {'pgvector'}
+        if unknown:
+            raise CommandError(f"Backends desconhecidos: {', '.join(sorted(unknown))}")
+
+        encoding_options = get_face_encoding_options()
+        images, image_source = self.load_images(options['images'])
+        report = {
+            'started_at': timezone.now().isoformat(),
+            'host': {'python': platform.python_version(), 'machine': platform.machine(), 'cpus': os.cpu_count()},
+            'options': {key: options[key] for key in ('sizes', 'backends', 'probes', 'noise', 'seed')},
+            'encoding_options': encoding_options,
+            'images': {'source': image_source, 'count': len(images)},
+            'stages': {},
+            'match': [],
+        }
+
+        self.stdout.write(f"Etapas de imagem: {len(images)} imagens ({image_source}), {options['image_repeat']} repetições")
+        report['stages'].update(time_image_stages(images, encoding_options, options['image_repeat']))
+        prefix = run_prefix()
+        report['run_prefix'] = prefix
+        if options['persist']:
+            report['stages'].update(self.run_db_stage(time_persist_stage, images[0], prefix=prefix))
+        for stage, result in report['stages'].items():
+            self.stdout.write(f"  {stage:<16} p50={result['p50_ms']:.2f} ms  p95={result['p95_ms']:.2f} ms  p99={result['p99_ms']:.2f} ms")
+
+        for size in sizes:
+            user_ids, vectors = synthetic_gallery(size, options['seed'])
+            expected, probes = synthetic_probes(vectors, options['probes'], options['noise'], options['seed'])
+            for backend in backends:
+                if backend == 'scan' and size > options['scan_max_size']:
+                    self.stdout.write(f"  {backend:<10} {size:>8}: ignorado (acima de --scan-max-size)")
+                    continue
+                if backend == 'pgvector':
+                    result = self.run_db_stage(time_pgvector_backend, vectors, probes, expected, prefix=prefix)
+                else:
+                    result = time_in_memory_backend(backend, user_ids, vectors, probes, expected)
+                result.update({'backend': backend, 'gallery_size': size})
+                report['match'].append(result)
+                self.stdout.write(
+                    f"  {backend:<10} {size:>8}: p50={result['p50_ms']:.3f} ms  p95={result['p95_ms']:.3f} ms  "
+                    f"p99={result['p99_ms']:.3f} ms  {result['throughput_per_s']:.1f} buscas/s  acerto={result['accuracy']:.3f}"
+                )
+
+        report['finished_at'] = timezone.now().isoformat()
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                json.dump(report, output, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Relatório gravado em {options['output']}"))
+        else:
+            self.stdout.write(json.dumps(report, indent=2))
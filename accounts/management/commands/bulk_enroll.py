@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+from accounts.enrollment import parse_manifest, enroll_users
+import zipfile
+import json
+
+
+class Command(BaseCommand):
+    help = 'Cadastra funcionários em lote a partir de um manifesto CSV/JSON e de um zip de fotos faciais.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('manifest', help='Arquivo .csv ou .json com username, email, password, cpf, phone_number, role e photo')
+        parser.add_argument('photos', help='Arquivo .zip com as fotos referenciadas na coluna photo')
+        parser.add_argument('--workers', type=int, default=None, help='Processos de codificação facial (padrão: FACE_BULK_ENROLL_WORKERS)')
+        parser.add_argument('--chunk-size', type=int, default=None, help='Linhas por lote de bulk_create (padrão: FACE_BULK_ENROLL_CHUNK_SIZE)')
+        parser.add_argument('--report', help='Caminho para gravar o relatório por linha em JSON')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['manifest'], 'rb') as manifest:
+                rows = parse_manifest(manifest.read(), options['manifest'])
+        except (OSError, ValueError, UnicodeDecodeError) as e:
+            raise CommandError(f"Manifesto inválido: {e}")
+
+        try:
+            archive = zipfile.ZipFile(options['photos'])
+        except (OSError, zipfile.BadZipFile) as e:
+            raise CommandError(f"Arquivo de fotos inválido: {e}")
+
+        with archive:
+            report = enroll_users(rows, archive, workers=options['workers'], chunk_size=options['chunk_size'])
+
+        created = sum(1 for item in report if item['status'] == 'created')
+        for item in report:
+            if item['status'] != 'created':
+                self.stderr.write(f"Linha {item['row']} ({item['username']}): {'; '.join(item['errors'])}")
+
+        if options['report']:
+            with open(options['report'], 'w', encoding='utf-8') as output:
+                json.dump(report, output, ensure_ascii=False, indent=2)
+
+        self.stdout.write(self.style.SUCCESS(f"{created} de {len(report)} usuários cadastrados."))
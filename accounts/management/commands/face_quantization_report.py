@@ -0,0 +1,86 @@
+from django.core.management.base import BaseCommand, CommandError
+from accounts.benchmarks.synthetic import synthetic_gallery, synthetic_probes
+from accounts.matching import EmbeddingGallery, QuantizedGallery
+from accounts.models import CustomUser
+import numpy as np
+import json
+import time
+
+
+class Command(BaseCommand):
+    help = 'Mede recall@k e latência da busca quantizada (varredura compacta + reordenação exata) contra a busca exata.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--synthetic', type=int, default=0, help='Usa N embeddings sintéticos em vez dos usuários cadastrados')
+        parser.add_argument('--probes', type=int, default=200)
+        parser.add_argument('--noise', type=float, default=0.03, help='Desvio padrão do ruído somado aos embeddings para gerar as sondas')
+        parser.add_argument('--k', default='1,5,10,20,50', help='Valores de k separados por vírgula')
+        parser.add_argument('--dtype', choices=['int8', 'float16'], default=None)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', help='Grava o relatório em JSON')
+
+    def handle(self, *args, **options):
+        if options['synthetic']:
+            user_ids, vectors = synthetic_gallery(options['synthetic'], options['seed'])
+        else:
+            rows = list(CustomUser.objects.exclude(facial_embedding__isnull=True).values_list('id', 'facial_embedding'))
+            user_ids = np.asarray([user_id for user_id, _ in rows])
+            vectors = np.asarray([embedding for _, embedding in rows], dtype=np.float32)
+        if not len(vectors):
+            raise CommandError('Nenhum embedding disponível para o relatório.')
+
+        try:
+            ks = sorted({int(k) for k in options['k'].split(',') if k.strip()})
+        except ValueError:
+            raise CommandError('--k deve ser uma lista de inteiros separados por vírgula.')
+
+        exact = EmbeddingGallery()
+        exact.load_arrays(user_ids, vectors)
+        quantized = QuantizedGallery(dtype=options['dtype'])
+        quantized.load_embeddings(user_ids, vectors)
+
+        _, probes = synthetic_probes(vectors, options['probes'], options['noise'], options['seed'])
+
+        exact_ids = []
+        exact_times = []
+        for probe in probes:
+            started = time.perf_counter()
+            user_id, _ = exact.nearest(probe)
+            exact_times.append(time.perf_counter() - started)
+            exact_ids.append(user_id)
+
+        index_by_id = {int(user_id): index for index, user_id in enumerate(user_ids)}
+        report = {
+            'gallery_size': int(len(vectors)),
+            'probes': int(len(probes)),
+            'dtype': quantized.code_dtype,
+            'bytes_per_embedding': {'float32': 128 * 4, 'compact': int(quantized._matrix.itemsize * 128 + (4 if quantized.code_dtype == 'int8' else 0))},
+            'exact_ms_p50': float(np.percentile(exact_times, 50) * 1000),
+            'results': [],
+        }
+        for k in ks:
+            hits = 0
+            times = []
+            for probe, expected in zip(probes, exact_ids):
+                started = time.perf_counter()
+                candidates = quantized.candidates(probe, k)
+                # Reordenação exata em memória (no backend real é uma consulta por pk__in)
+                rows = vectors[[index_by_id[candidate] for candidate in candidates]]
+                best = candidates[int(np.argmin(np.linalg.norm(rows - probe, axis=1)))]
+                times.append(time.perf_counter() - started)
+                hits += best == expected
+            report['results'].append({
+                'k': k,
+                'recall': hits / len(probes),
+                'ms_p50': float(np.percentile(times, 50) * 1000),
+                'ms_p95': float(np.percentile(times, 95) * 1000),
+            })
+
+        self.stdout.write(f"Galeria: {report['gallery_size']} embeddings, {report['probes']} sondas, códigos {report['dtype']}")
+        self.stdout.write(f"Busca exata float32: p50 {report['exact_ms_p50']:.3f} ms")
+        for result in report['results']:
+            self.stdout.write(f"k={result['k']:>4}  recall={result['recall']:.4f}  p50={result['ms_p50']:.3f} ms  p95={result['ms_p95']:.3f} ms")
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                json.dump(report, output, indent=2)
@@ -0,0 +1,60 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from accounts.punch_queue import claim_next_job, process_job
+from accounts.logs import get_event_logger
+import multiprocessing
+import time
+
+logger = get_event_logger(__name__)
+
+
+def run_worker(poll_interval, once):
+    while True:
+        job = claim_next_job()
+        if job is None:
+            if once:
+                return
+            time.sleep(poll_interval)
+            continue
+        try:
+            process_job(job)
+        except Exception as e:
+            # O trabalho volta para a fila quando ficar obsoleto (PUNCH_JOB_STALE_SECONDS)
+            logger.error('punch_job.unexpected_error', 'Erro inesperado processando o trabalho {ticket}: {error}', ticket=job.ticket, kind=job.kind, error=str(e))
+
+
+class Command(BaseCommand):
+    help = 'Drena a fila de batidas assíncronas (PunchJob) com um pool de processos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help='Processos de reconhecimento (padrão: PUNCH_QUEUE_WORKERS)')
+        parser.add_argument('--poll-interval', type=float, default=0.5, help='Espera em segundos quando a fila está vazia')
+        parser.add_argument('--once', action='store_true', help='Encerra quando a fila esvaziar')
+
+    def handle(self, *args, **options):
+        workers = options['workers'] or settings.PUNCH_QUEUE_WORKERS
+        self.stdout.write(f"Processando a fila de batidas com {workers} processos")
+        if workers <= 1:
+            run_worker(options['poll_interval'], options['once'])
+            return
+
+        # Conexões abertas não podem ser compartilhadas entre processos criados por fork.
+        # Os workers não são daemon: a sincronização offline e o cadastro em lote abrem o próprio
+        # pool de processos para reconhecer as fotos em paralelo
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        processes = [
+            context.Process(target=run_worker, args=(options['poll_interval'], options['once']))
+            for _ in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                process.join()
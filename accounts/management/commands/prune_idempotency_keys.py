@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from accounts.idempotency import prune_idempotency_keys
+
+
+class Command(BaseCommand):
+    help = 'Remove as respostas guardadas por Idempotency-Key que já passaram de PUNCH_IDEMPOTENCY_TTL.'
+
+    def handle(self, *args, **options):
+        deleted = prune_idempotency_keys()
+        self.stdout.write(self.style.SUCCESS(f"{deleted} chaves de idempotência removidas."))
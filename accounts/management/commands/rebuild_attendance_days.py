@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from accounts.attendance_days import refresh_attendance_days
+from accounts.models import Attendance, AttendanceDay, Justification
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói o resumo diário (AttendanceDay) a partir do histórico de batidas e justificativas.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help='Reconstrói apenas este usuário')
+        parser.add_argument('--since', help='Reconstrói apenas a partir desta data (YYYY-MM-DD)')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Dias recalculados por upsert')
+
+    def handle(self, *args, **options):
+        attendances = Attendance.objects.all()
+        justifications = Justification.objects.exclude(user__isnull=True)
+        summaries = AttendanceDay.objects.all()
+        if options['user']:
+            attendances = attendances.filter(user_id=options['user'])
+            justifications = justifications.filter(user_id=options['user'])
+            summaries = summaries.filter(user_id=options['user'])
+        if options['since']:
+            since = parse_date(options['since'])
+            if since is None:
+                raise CommandError('--since deve estar no formato YYYY-MM-DD.')
+            attendances = attendances.filter(data_local__gte=since)
+            justifications = justifications.filter(date__gte=since)
+            summaries = summaries.filter(date__gte=since)
+
+        keys = set(attendances.exclude(data_local__isnull=True).values_list('user_id', 'data_local').distinct())
+        keys.update(justifications.values_list('user_id', 'date').distinct())
+        # Dias resumidos que não têm mais batidas nem justificativas
+        stale = set(summaries.values_list('user_id', 'date')) - keys
+        keys.update(stale)
+
+        keys = sorted(keys, key=lambda key: (key[0], key[1]))
+        total = 0
+        for start in range(0, len(keys), options['batch_size']):
+            total += refresh_attendance_days(keys[start:start + options['batch_size']])
+        self.stdout.write(self.style.SUCCESS(f"{total} dias resumidos ({len(stale)} removidos)."))
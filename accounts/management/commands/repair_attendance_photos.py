@@ -0,0 +1,36 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from accounts.models import Attendance
+
+
+class Command(BaseCommand):
+    help = 'Limpa foto e miniatura das batidas cujos arquivos não chegaram a ser gravados.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='Verifica apenas batidas a partir desta data (YYYY-MM-DD)')
+        parser.add_argument('--dry-run', action='store_true', help='Apenas lista as batidas afetadas')
+
+    def handle(self, *args, **options):
+        attendances = Attendance.objects.exclude(foto_path__isnull=True).exclude(foto_path='')
+        if options['since']:
+            since = parse_date(options['since'])
+            if since is None:
+                raise CommandError('--since deve estar no formato YYYY-MM-DD.')
+            attendances = attendances.filter(data_local__gte=since)
+
+        # A foto original não é guardada, então não há como gerar de novo: a batida volta a "sem foto"
+        missing = set()
+        paths = attendances.values_list('foto_path', 'foto_thumb').distinct().iterator()
+        for photo_path, thumb_path in paths:
+            if not default_storage.exists(photo_path) or (thumb_path and not default_storage.exists(thumb_path)):
+                missing.add(photo_path)
+
+        affected = attendances.filter(foto_path__in=missing)
+        if options['dry_run']:
+            for attendance_id in affected.values_list('id', flat=True):
+                self.stdout.write(f"Batida {attendance_id} sem arquivo de foto")
+            self.stdout.write(self.style.SUCCESS(f"{len(missing)} fotos ausentes."))
+            return
+        cleared = affected.update(foto_path=None, foto_thumb=None)
+        self.stdout.write(self.style.SUCCESS(f"{len(missing)} fotos ausentes; {cleared} batidas atualizadas."))
@@ -0,0 +1,332 @@
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from pgvector.django import L2Distance
+from .models import FaceGalleryState
+from .quantization import pack_embedding, unpack_codes, approximate_distances
+from .logs import get_event_logger
+import face_recognition
+import numpy as np
+import threading
+import time
+
+logger = get_event_logger(__name__)
+
+
+def scan_match(login_embedding, User):
+    # Varredura completa em Python: O(usuários) por batida, mantida como referência
+    min_distance = float('inf')
+    matched_user = None
+    for u in User.objects.exclude(facial_embedding__isnull=True):
+        db_embedding = np.array(u.facial_embedding)
+        distance = face_recognition.face_distance([db_embedding], login_embedding)[0]
+        if distance < min_distance:
+            min_distance = distance
+            matched_user = u
+    return matched_user, min_distance
+
+
+def pgvector_candidates(login_embedding, User, k=None):
+    """Retorna os k usuários mais próximos do embedding, ordenados pela distância L2, usando o índice HNSW."""
+    k = k or settings.FACE_MATCH_CANDIDATES
+    queryset = (
+        User.objects.exclude(facial_embedding__isnull=True)
+        .annotate(distance=L2Distance('facial_embedding', np.asarray(login_embedding, dtype=np.float32)))
+        .order_by('distance')[:k]
+    )
+    with transaction.atomic():
+        ef_search = max(settings.FACE_HNSW_EF_SEARCH, k)
+        with connection.cursor() as cursor:
+            # SET LOCAL vale apenas para esta transação
+            cursor.execute(f"SET LOCAL hnsw.ef_search = {int(ef_search)}")
+        return list(queryset)
+
+
+def pgvector_match(login_embedding, User):
+    candidates = pgvector_candidates(login_embedding, User)
+    if not candidates:
+        return None, float('inf')
+    best = candidates[0]
+    return best, float(best.distance)
+
+
+def verify_user(login_embedding, user):
+    # Verificação 1:1: compara apenas com o embedding do usuário informado
+    if user is None or user.facial_embedding is None:
+        return None, float('inf')
+    db_embedding = np.asarray(user.facial_embedding, dtype=np.float32)
+    distance = float(np.linalg.norm(db_embedding - np.asarray(login_embedding, dtype=np.float32)))
+    return user, distance
+
+
+def current_gallery_version():
+    state, _ = FaceGalleryState.objects.get_or_create(pk=1)
+    return state.version
+
+
+def bump_gallery_version():
+    updated = FaceGalleryState.objects.filter(pk=1).update(version=F('version') + 1)
+    if not updated:
+        FaceGalleryState.objects.get_or_create(pk=1)
+        FaceGalleryState.objects.filter(pk=1).update(version=F('version') + 1)
+    return current_gallery_version()
+
+
+class EmbeddingGallery:
+    """Galeria em memória: todos os embeddings numa matriz float32 contígua e um array paralelo de ids."""
+
+    dimensions = 128
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._matrix = None
+        self._user_ids = None
+        self._version = None
+        self._checked_at = 0.0
+
+    @property
+    def loaded(self):
+        return self._matrix is not None
+
+    def __len__(self):
+        return 0 if self._user_ids is None else len(self._user_ids)
+
+    def fetch(self, User):
+        rows = User.objects.exclude(facial_embedding__isnull=True).values_list('id', 'facial_embedding')
+        user_ids = []
+        vectors = []
+        for user_id, embedding in rows.iterator(chunk_size=2000):
+            user_ids.append(user_id)
+            vectors.append(embedding)
+        return user_ids, vectors
+
+    def load(self, User):
+        with self._lock:
+            version = current_gallery_version()
+            user_ids, vectors = self.fetch(User)
+            self.load_arrays(user_ids, vectors)
+            self._version = version
+            self._checked_at = time.monotonic()
+            logger.info('gallery.loaded', '{gallery} carregada: {size} embeddings, versão {version}', gallery=self.__class__.__name__, size=len(self), version=version)
+
+    def load_arrays(self, user_ids, vectors):
+        with self._lock:
+            self._user_ids = np.asarray(user_ids, dtype=np.int64)
+            if len(vectors):
+                self._matrix = np.ascontiguousarray(np.asarray(vectors, dtype=np.float32))
+            else:
+                self._matrix = np.empty((0, self.dimensions), dtype=np.float32)
+
+    def invalidate(self):
+        with self._lock:
+            self._version = None
+
+    def ensure_current(self, User):
+        with self._lock:
+            if not self.loaded or self._version is None:
+                self.load(User)
+                return
+            now = time.monotonic()
+            if now - self._checked_at < settings.FACE_GALLERY_VERSION_CHECK_SECONDS:
+                return
+            self._checked_at = now
+            if current_gallery_version() != self._version:
+                self.load(User)
+
+    def distances(self, probe):
+        probe = np.asarray(probe, dtype=np.float32)
+        with self._lock:
+            matrix, user_ids = self._matrix, self._user_ids
+        return user_ids, np.linalg.norm(matrix - probe, axis=1)
+
+    def nearest(self, probe):
+        user_ids, distances = self.distances(probe)
+        if not len(user_ids):
+            return None, float('inf')
+        index = int(np.argmin(distances))
+        return int(user_ids[index]), float(distances[index])
+
+    def upsert(self, user_id, embedding):
+        with self._lock:
+            if not self.loaded:
+                return
+            vector = np.asarray(embedding, dtype=np.float32).reshape(1, self.dimensions)
+            positions = np.flatnonzero(self._user_ids == user_id)
+            if len(positions):
+                self._matrix[positions[0]] = vector[0]
+            else:
+                self._matrix = np.ascontiguousarray(np.vstack([self._matrix, vector]))
+                self._user_ids = np.append(self._user_ids, np.int64(user_id))
+
+    def remove(self, user_id):
+        with self._lock:
+            if not self.loaded:
+                return
+            keep = self._user_ids != user_id
+            if keep.all():
+                return
+            self._matrix = np.ascontiguousarray(self._matrix[keep])
+            self._user_ids = self._user_ids[keep]
+
+    def advance_version(self, new_version):
+        # Se outro worker alterou a galeria no meio do caminho, força recarga completa
+        with self._lock:
+            if self._version is not None and new_version == self._version + 1:
+                self._version = new_version
+            else:
+                self._version = None
+
+
+class QuantizedGallery(EmbeddingGallery):
+    """Galeria compacta (int8 ou float16) usada na primeira passada; a decisão final usa distâncias exatas."""
+
+    def __init__(self, dtype=None):
+        super().__init__()
+        self.dtype = dtype
+        self._scales = None
+        self._squared_norms = None
+
+    @property
+    def code_dtype(self):
+        return self.dtype or settings.FACE_EMBEDDING_CODE_DTYPE
+
+    def fetch(self, User):
+        rows = User.objects.exclude(facial_embedding_code__isnull=True).values_list('id', 'facial_embedding_code')
+        user_ids = []
+        codes = []
+        for user_id, code in rows.iterator(chunk_size=5000):
+            user_ids.append(user_id)
+            codes.append(code)
+        return user_ids, codes
+
+    def load_arrays(self, user_ids, codes):
+        with self._lock:
+            self._user_ids = np.asarray(user_ids, dtype=np.int64)
+            self._matrix, self._scales = unpack_codes(codes, self.code_dtype)
+            self._squared_norms = np.einsum('ij,ij->i', self._matrix.astype(np.float32), self._matrix.astype(np.float32))
+
+    def load_embeddings(self, user_ids, vectors):
+        self.load_arrays(user_ids, [pack_embedding(vector, self.code_dtype) for vector in vectors])
+
+    def distances(self, probe):
+        with self._lock:
+            matrix, scales, squared_norms, user_ids = self._matrix, self._scales, self._squared_norms, self._user_ids
+        return user_ids, approximate_distances(matrix, scales, squared_norms, probe, settings.FACE_QUANTIZED_CHUNK_ROWS)
+
+    def candidates(self, probe, k):
+        user_ids, distances = self.distances(probe)
+        if not len(user_ids):
+            return []
+        k = min(k, len(user_ids))
+        top = np.argpartition(distances, k - 1)[:k]
+        top = top[np.argsort(distances[top])]
+        return [int(user_id) for user_id in user_ids[top]]
+
+    def upsert(self, user_id, embedding):
+        with self._lock:
+            if not self.loaded:
+                return
+            row, scale = unpack_codes([pack_embedding(embedding, self.code_dtype)], self.code_dtype)
+            squared_norm = np.einsum('ij,ij->i', row.astype(np.float32), row.astype(np.float32))
+            positions = np.flatnonzero(self._user_ids == user_id)
+            if len(positions):
+                self._matrix[positions[0]] = row[0]
+                self._scales[positions[0]] = scale[0]
+                self._squared_norms[positions[0]] = squared_norm[0]
+            else:
+                self._matrix = np.ascontiguousarray(np.vstack([self._matrix, row]))
+                self._scales = np.append(self._scales, scale)
+                self._squared_norms = np.append(self._squared_norms, squared_norm)
+                self._user_ids = np.append(self._user_ids, np.int64(user_id))
+
+    def remove(self, user_id):
+        with self._lock:
+            if not self.loaded:
+                return
+            keep = self._user_ids != user_id
+            if keep.all():
+                return
+            self._matrix = np.ascontiguousarray(self._matrix[keep])
+            self._scales = self._scales[keep]
+            self._squared_norms = self._squared_norms[keep]
+            self._user_ids = self._user_ids[keep]
+
+
+gallery = EmbeddingGallery()
+quantized_gallery = QuantizedGallery()
+
+
+def gallery_match(login_embedding, User):
+    gallery.ensure_current(User)
+    user_id, min_distance = gallery.nearest(login_embedding)
+    if user_id is None:
+        return None, min_distance
+    matched_user = User.objects.filter(pk=user_id).first()
+    if matched_user is None:
+        gallery.invalidate()
+        return None, float('inf')
+    return matched_user, min_distance
+
+
+def rerank_candidates(login_embedding, User, candidate_ids):
+    # Segunda passada: distância exata apenas nos k candidatos da varredura compacta
+    matched_user = None
+    min_distance = float('inf')
+    for user in User.objects.filter(pk__in=candidate_ids).exclude(facial_embedding__isnull=True):
+        user, distance = verify_user(login_embedding, user)
+        if distance < min_distance:
+            matched_user, min_distance = user, distance
+    return matched_user, min_distance
+
+
+def quantized_match(login_embedding, User):
+    quantized_gallery.ensure_current(User)
+    candidate_ids = quantized_gallery.candidates(login_embedding, settings.FACE_QUANTIZED_CANDIDATES)
+    if not candidate_ids:
+        return None, float('inf')
+    return rerank_candidates(login_embedding, User, candidate_ids)
+
+
+IN_PROCESS_GALLERIES = [gallery, quantized_gallery]
+
+
+def notify_embedding_changed(user_id, embedding):
+    if embedding is None:
+        notify_embedding_removed(user_id)
+        return
+    for in_process_gallery in IN_PROCESS_GALLERIES:
+        in_process_gallery.upsert(user_id, embedding)
+    version = bump_gallery_version()
+    for in_process_gallery in IN_PROCESS_GALLERIES:
+        in_process_gallery.advance_version(version)
+
+
+def notify_embedding_removed(user_id):
+    for in_process_gallery in IN_PROCESS_GALLERIES:
+        in_process_gallery.remove(user_id)
+    version = bump_gallery_version()
+    for in_process_gallery in IN_PROCESS_GALLERIES:
+        in_process_gallery.advance_version(version)
+
+
+def notify_gallery_bulk_changed():
+    # Alterações em massa (bulk_create) não passam pelos ganchos individuais: recarrega tudo
+    bump_gallery_version()
+    for in_process_gallery in IN_PROCESS_GALLERIES:
+        in_process_gallery.invalidate()
+
+
+MATCH_BACKENDS = {
+    'scan': scan_match,
+    'pgvector': pgvector_match,
+    'gallery': gallery_match,
+    'quantized': quantized_match,
+}
+
+
+def get_match_backend(name=None):
+    name = name or settings.FACE_MATCH_BACKEND
+    try:
+        return MATCH_BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Backend de reconhecimento desconhecido: {name}")
@@ -0,0 +1,206 @@
+# Histogramas e contadores em memória para as etapas da batida de ponto.
+# Cada processo grava periodicamente um retrato dos seus valores em METRICS_DIR/<pid>.json;
+# o endpoint /metrics soma os arquivos de todos os workers e responde no formato texto do Prometheus.
+from contextlib import contextmanager
+from django.conf import settings
+import threading
+import tempfile
+import logging
+import atexit
+import json
+import time
+import os
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+METRICS = {
+    'chronos_punch_stage_seconds': ('histogram', 'Duração de cada etapa da batida de ponto'),
+    'chronos_queue_wait_seconds': ('histogram', 'Tempo de espera em fila antes do processamento'),
+    'chronos_punch_results_total': ('counter', 'Batidas processadas por resultado'),
+    'chronos_face_errors_total': ('counter', 'Falhas ao extrair o embedding facial por motivo'),
+    'chronos_embedding_cache_total': ('counter', 'Consultas ao cache de embeddings por resultado'),
+    'chronos_report_cache_total': ('counter', 'Consultas ao cache de relatórios por resultado'),
+    'chronos_recognition_rejected_total': ('counter', 'Requisições recusadas pelo pool de reconhecimento'),
+}
+
+_lock = threading.Lock()
+_values = {}
+_last_flush = 0.0
+
+
+def _key(name, labels):
+    if name not in METRICS:
+        raise KeyError(f"Métrica não registrada: {name}")
+    return name, tuple(sorted(labels.items()))
+
+
+def increment(name, amount=1, **labels):
+    if not settings.METRICS_ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _values[key] = _values.get(key, 0) + amount
+    _maybe_flush()
+
+
+def observe(name, seconds, **labels):
+    if not settings.METRICS_ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        # [contagem por bucket..., soma, total]
+        value = _values.get(key)
+        if value is None:
+            value = _values[key] = [0] * (len(DEFAULT_BUCKETS) + 2)
+        for index, bound in enumerate(DEFAULT_BUCKETS):
+            if seconds <= bound:
+                value[index] += 1
+                break
+        value[-2] += seconds
+        value[-1] += 1
+    _maybe_flush()
+
+
+def observe_stages(timings, name='chronos_punch_stage_seconds'):
+    for stage, seconds in timings.items():
+        observe(name, seconds, stage=stage)
+
+
+@contextmanager
+def timed(stage, name='chronos_punch_stage_seconds'):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, stage=stage)
+
+
+def snapshot():
+    with _lock:
+        return [[name, list(labels), value if isinstance(value, (int, float)) else list(value)] for (name, labels), value in _values.items()]
+
+
+def metrics_dir():
+    return settings.METRICS_DIR
+
+
+def flush():
+    global _last_flush
+    directory = metrics_dir()
+    _last_flush = time.monotonic()
+    if not directory:
+        return
+    try:
+        os.makedirs(directory, exist_ok=True)
+        # Escrita atômica: o leitor nunca vê um arquivo pela metade
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as output:
+            json.dump(snapshot(), output)
+        os.replace(temp_path, os.path.join(directory, f"{os.getpid()}.json"))
+    except OSError as e:
+        logger.warning(f"Não foi possível gravar as métricas em {directory}: {str(e)}")
+
+
+def _maybe_flush():
+    if time.monotonic() - _last_flush >= settings.METRICS_FLUSH_INTERVAL:
+        flush()
+
+
+def clear_metrics_dir():
+    # Chamado pelo mestre do gunicorn na inicialização, antes de existirem workers
+    directory = metrics_dir()
+    if not directory or not os.path.isdir(directory):
+        return
+    for name in os.listdir(directory):
+        if name.endswith('.json') or name.endswith('.tmp'):
+            os.remove(os.path.join(directory, name))
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def remove_dead_snapshot(directory, name):
+    # Worker reciclado pelo gunicorn (max_requests, timeout): o processo que o substitui recomeça do zero,
+    # então o arquivo antigo sairia somado para sempre; o Prometheus trata a queda como reinício do contador
+    pid = name[:-len('.json')]
+    if not pid.isdigit() or pid_alive(int(pid)):
+        return False
+    try:
+        os.remove(os.path.join(directory, name))
+    except OSError:
+        pass
+    return True
+
+
+def collect():
+    """Soma os valores dos processos vivos que gravaram em METRICS_DIR (mais o processo atual)."""
+    flush()
+    snapshots = []
+    directory = metrics_dir()
+    if directory and os.path.isdir(directory):
+        for name in os.listdir(directory):
+            if not name.endswith('.json') or remove_dead_snapshot(directory, name):
+                continue
+            try:
+                with open(os.path.join(directory, name)) as source:
+                    snapshots.append(json.load(source))
+            except (OSError, ValueError):
+                continue
+    else:
+        snapshots.append(snapshot())
+
+    totals = {}
+    for entries in snapshots:
+        for name, labels, value in entries:
+            if name not in METRICS:
+                continue
+            key = (name, tuple(tuple(label) for label in labels))
+            if isinstance(value, list):
+                current = totals.setdefault(key, [0] * len(value))
+                for index, item in enumerate(value):
+                    current[index] += item
+            else:
+                totals[key] = totals.get(key, 0) + value
+    return totals
+
+
+def _format_labels(labels, extra=None):
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ''
+    escaped = [(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for name, value in items]
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def render_prometheus():
+    totals = collect()
+    lines = []
+    for name, (metric_type, help_text) in METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for (metric_name, labels), value in sorted(totals.items()):
+            if metric_name != name:
+                continue
+            if metric_type == 'counter':
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+                continue
+            cumulative = 0
+            for bound, count in zip(DEFAULT_BUCKETS, value):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(labels, ('le', bound))} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(labels, ('le', '+Inf'))} {value[-1]}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {value[-2]}")
+            lines.append(f"{name}_count{_format_labels(labels)} {value[-1]}")
+    return '\n'.join(lines) + '\n'
+
+
+atexit.register(flush)
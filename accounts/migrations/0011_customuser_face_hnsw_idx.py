@@ -0,0 +1,22 @@
+from django.db import migrations
+import pgvector.django
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0010_alter_customuser_username'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customuser',
+            index=pgvector.django.HnswIndex(
+                ef_construction=64,
+                fields=['facial_embedding'],
+                m=16,
+                name='customuser_face_hnsw_idx',
+                opclasses=['vector_l2_ops'],
+            ),
+        ),
+    ]
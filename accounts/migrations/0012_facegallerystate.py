@@ -0,0 +1,25 @@
+from django.db import migrations, models
+
+
+def create_gallery_state(apps, schema_editor):
+    FaceGalleryState = apps.get_model('accounts', 'FaceGalleryState')
+    FaceGalleryState.objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0011_customuser_face_hnsw_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FaceGalleryState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(create_gallery_state, migrations.RunPython.noop),
+    ]
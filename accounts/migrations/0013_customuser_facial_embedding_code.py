@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0012_facegallerystate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='facial_embedding_code',
+            field=models.BinaryField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,22 @@
+from django.db import migrations, models
+import django.utils.timezone
+import pgvector.django
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0013_customuser_facial_embedding_code'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FaceEmbeddingCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('digest', models.CharField(max_length=64, unique=True)),
+                ('embedding', pgvector.django.VectorField(dimensions=128)),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
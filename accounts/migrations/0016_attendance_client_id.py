@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0015_attendance_data_hora_punchjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendance',
+            name='client_id',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_data_local(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "UPDATE accounts_attendance SET data_local = (data_hora AT TIME ZONE %s)::date WHERE data_local IS NULL",
+            [settings.TIME_ZONE],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0016_attendance_client_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendance',
+            name='data_local',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_data_local, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['user', 'data_hora'], name='attendance_user_datahora_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['user', 'point_type', 'data_local'], name='attendance_user_type_day_idx'),
+        ),
+    ]
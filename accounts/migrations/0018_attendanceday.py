@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0017_attendance_data_local_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('entrada', models.TimeField(blank=True, null=True)),
+                ('almoco', models.TimeField(blank=True, null=True)),
+                ('saida', models.TimeField(blank=True, null=True)),
+                ('punch_count', models.PositiveSmallIntegerField(default=0)),
+                ('worked_seconds', models.PositiveIntegerField(default=0)),
+                ('is_late', models.BooleanField(default=False)),
+                ('status', models.CharField(choices=[('Aprovado', 'Aprovado'), ('Atraso', 'Atraso'), ('Pendente', 'Pendente'), ('Falta', 'Falta')], default='Falta', max_length=20)),
+                ('justification_count', models.PositiveSmallIntegerField(default=0)),
+                ('approved_justification_count', models.PositiveSmallIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_days', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'date'), name='attendanceday_user_date_uniq')],
+            },
+        ),
+    ]
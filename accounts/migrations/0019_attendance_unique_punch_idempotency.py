@@ -0,0 +1,77 @@
+from django.conf import settings
+from django.db import migrations, models
+from django.db.migrations.exceptions import IrreversibleError
+import django.db.models.deletion
+import django.utils.timezone
+import tempfile
+import logging
+import csv
+import os
+
+logger = logging.getLogger('accounts.migrations')
+
+DUPLICATE_COLUMNS = ('id', 'user_id', 'point_type', 'data_local', 'data_hora', 'foto_path', 'client_id')
+
+
+def delete_duplicate_attendances(apps, schema_editor):
+    # Batidas repetidas (criadas antes da restrição) impediriam o índice único: mantém a primeira de cada dia.
+    # As removidas são exportadas em CSV e registradas no log para conferência
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            DELETE FROM accounts_attendance a
+            USING accounts_attendance b
+            WHERE a.user_id = b.user_id
+              AND a.point_type = b.point_type
+              AND a.data_local = b.data_local
+              AND (a.data_hora, a.id) > (b.data_hora, b.id)
+            RETURNING {', '.join(f'a.{column}' for column in DUPLICATE_COLUMNS)}
+            """
+        )
+        removed = cursor.fetchall()
+    if not removed:
+        return
+
+    fd, export_path = tempfile.mkstemp(prefix='attendance_duplicates_', suffix='.csv')
+    with os.fdopen(fd, 'w', newline='', encoding='utf-8') as export:
+        writer = csv.writer(export)
+        writer.writerow(DUPLICATE_COLUMNS)
+        writer.writerows(removed)
+    for row in removed:
+        logger.warning("Batida duplicada removida: %s", dict(zip(DUPLICATE_COLUMNS, row)))
+    logger.warning("%s batidas duplicadas removidas; exportadas em %s", len(removed), export_path)
+
+
+def restore_duplicate_attendances(apps, schema_editor):
+    raise IrreversibleError(
+        'As batidas duplicadas removidas por 0019 não podem ser restauradas pela migração; '
+        'use o CSV exportado (attendance_duplicates_*.csv) para conferência manual.'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0018_attendanceday'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicate_attendances, restore_duplicate_attendances),
+        migrations.AddConstraint(
+            model_name='attendance',
+            constraint=models.UniqueConstraint(fields=('user', 'point_type', 'data_local'), name='attendance_user_type_day_uniq'),
+        ),
+        migrations.CreateModel(
+            name='PunchIdempotencyKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=128, unique=True)),
+                ('status', models.CharField(choices=[('processing', 'Processando'), ('done', 'Concluído')], default='processing', max_length=20)),
+                ('response', models.JSONField(blank=True, null=True)),
+                ('status_code', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('attendance', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='idempotency_keys', to='accounts.attendance')),
+                ('requested_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='punch_idempotency_keys', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
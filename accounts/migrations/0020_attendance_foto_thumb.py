@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0019_attendance_unique_punch_idempotency'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendance',
+            name='foto_thumb',
+            field=models.ImageField(blank=True, null=True, upload_to='attendance/thumbs/'),
+        ),
+    ]
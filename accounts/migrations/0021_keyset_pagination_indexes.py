@@ -0,0 +1,23 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0020_attendance_foto_thumb'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['data_hora', 'id'], name='attendance_datahora_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='justification',
+            index=models.Index(fields=['created_at', 'id'], name='justification_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='justification',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='justification_user_created_idx'),
+        ),
+    ]
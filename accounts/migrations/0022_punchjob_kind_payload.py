@@ -0,0 +1,26 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0021_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='punchjob',
+            name='kind',
+            field=models.CharField(choices=[('punch', 'Batida'), ('enroll', 'Cadastro em lote')], default='punch', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='punchjob',
+            name='payload',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='punchjob',
+            name='photo',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+    ]
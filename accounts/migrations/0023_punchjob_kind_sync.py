@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0022_punchjob_kind_payload'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='punchjob',
+            name='kind',
+            field=models.CharField(choices=[('punch', 'Batida'), ('sync', 'Sincronização offline'), ('enroll', 'Cadastro em lote')], default='punch', max_length=20),
+        ),
+    ]
@@ -0,0 +1,24 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0023_punchjob_kind_sync'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='punchidempotencykey',
+            name='key',
+            field=models.CharField(max_length=128),
+        ),
+        migrations.AddConstraint(
+            model_name='punchidempotencykey',
+            constraint=models.UniqueConstraint(fields=('requested_by', 'key'), name='punch_idem_owner_key_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='punchidempotencykey',
+            constraint=models.UniqueConstraint(condition=models.Q(('requested_by__isnull', True)), fields=('key',), name='punch_idem_anon_key_uniq'),
+        ),
+    ]
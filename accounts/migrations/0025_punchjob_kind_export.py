@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0024_punchidempotencykey_owner_key'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='punchjob',
+            name='kind',
+            field=models.CharField(choices=[('punch', 'Batida'), ('sync', 'Sincronização offline'), ('enroll', 'Cadastro em lote'), ('export', 'Exportação XLSX')], default='punch', max_length=20),
+        ),
+    ]
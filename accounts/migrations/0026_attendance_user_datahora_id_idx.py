@@ -0,0 +1,20 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0025_punchjob_kind_export'),
+    ]
+
+    operations = [
+        # (user, data_hora, id) serve à listagem por usuário com cursor e cobre o antigo (user, data_hora)
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['user', 'data_hora', 'id'], name='attendance_user_dt_id_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='attendance',
+            name='attendance_user_datahora_idx',
+        ),
+    ]
@@ -1,7 +1,10 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
-from pgvector.django import VectorField
+from pgvector.django import VectorField, HnswIndex
+from django.conf import settings
+from .quantization import pack_embedding
 from enum import Enum
+import uuid
 from django.utils import timezone
 from django.core.validators import RegexValidator
 
@@ -32,17 +35,63 @@ class CustomUser(AbstractUser):
     )
     email = models.EmailField(unique=True)
     facial_embedding = VectorField(dimensions=128, null=True, blank=True)
+    # Cópia compacta (int8/float16) do embedding para a varredura inicial do backend 'quantized'
+    facial_embedding_code = models.BinaryField(null=True, blank=True, editable=False)
     role = models.CharField(max_length=10, choices=[(role.value, role.value) for role in UserRole], default=UserRole.USER.value)
     phone_number = models.CharField(max_length=15, blank=True, null=True)
     cpf = models.CharField(max_length=14, blank=True, null= True)
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Índice ANN para a busca por vizinho mais próximo (distância L2, a mesma do face_recognition).
+            # m/ef_construction fixos aqui e na migração; mudar exige uma nova migração que recrie o índice
+            HnswIndex(
+                name='customuser_face_hnsw_idx',
+                fields=['facial_embedding'],
+                m=16,
+                ef_construction=64,
+                opclasses=['vector_l2_ops'],
+            ),
+        ]
+
     def __str__(self):
         return self.username
 
+    def refresh_embedding_code(self):
+        if self.facial_embedding is None:
+            self.facial_embedding_code = None
+        else:
+            self.facial_embedding_code = pack_embedding(self.facial_embedding, settings.FACE_EMBEDDING_CODE_DTYPE)
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'facial_embedding' in update_fields:
+            self.refresh_embedding_code()
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'facial_embedding_code'}
+        super().save(*args, **kwargs)
+
     @property
     def is_admin(self):
         return self.role == UserRole.ADMIN.value
 
+class FaceGalleryState(models.Model):
+    # Carimbo de versão da galeria de embeddings, compartilhado entre os workers
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Galeria facial v{self.version}"
+
+class FaceEmbeddingCacheEntry(models.Model):
+    # Cache de embeddings por SHA-256 da imagem enviada, compartilhado entre workers
+    digest = models.CharField(max_length=64, unique=True)
+    embedding = VectorField(dimensions=128)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return self.digest
+
 class PasswordResetToken(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
     token = models.CharField(max_length=255, unique=True)
@@ -59,19 +108,160 @@ class Attendance(models.Model):
         ('almoco', 'Almoço'),
         ('saida', 'Saída')
     ])
-    data_hora = models.DateTimeField(auto_now_add=True)
+    data_hora = models.DateTimeField(default=timezone.now)
     foto_path = models.ImageField(upload_to='attendance/photos/', null=True, blank=True)
+    foto_thumb = models.ImageField(upload_to='attendance/thumbs/', null=True, blank=True)
     is_synced = models.BooleanField(default=False)
+    # Identificador gerado pelo quiosque para batidas enviadas pela sincronização offline
+    client_id = models.CharField(max_length=64, unique=True, null=True, blank=True)
+    # Data local (TIME_ZONE) da batida, gravada junto para validar a sequência do dia sem converter data_hora
+    data_local = models.DateField(null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # Paginação por chave (data_hora, id) das listagens (ver accounts/pagination.py): geral e por usuário
+            models.Index(fields=['data_hora', 'id'], name='attendance_datahora_id_idx'),
+            models.Index(fields=['user', 'data_hora', 'id'], name='attendance_user_dt_id_idx'),
+            models.Index(fields=['user', 'point_type', 'data_local'], name='attendance_user_type_day_idx'),
+        ]
+        constraints = [
+            # Garante no banco uma batida de cada tipo por dia, mesmo com requisições concorrentes
+            models.UniqueConstraint(fields=['user', 'point_type', 'data_local'], name='attendance_user_type_day_uniq'),
+        ]
+
+    def refresh_data_local(self):
+        self.data_local = timezone.localdate(self.data_hora) if self.data_hora else None
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'data_hora' in update_fields:
+            self.refresh_data_local()
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'data_local'}
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.user.username} - {self.point_type} em {self.data_hora}"
 
+class AttendanceDay(models.Model):
+    # Resumo diário mantido a cada batida/justificativa/aprovação (ver accounts/attendance_days.py)
+    STATUS_CHOICES = [
+        ('Aprovado', 'Aprovado'),
+        ('Atraso', 'Atraso'),
+        ('Pendente', 'Pendente'),
+        ('Falta', 'Falta'),
+    ]
+
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='attendance_days')
+    date = models.DateField()
+    entrada = models.TimeField(null=True, blank=True)
+    almoco = models.TimeField(null=True, blank=True)
+    saida = models.TimeField(null=True, blank=True)
+    punch_count = models.PositiveSmallIntegerField(default=0)
+    worked_seconds = models.PositiveIntegerField(default=0)
+    is_late = models.BooleanField(default=False)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Falta')
+    justification_count = models.PositiveSmallIntegerField(default=0)
+    approved_justification_count = models.PositiveSmallIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'date'], name='attendanceday_user_date_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.date} ({self.status})"
+
+class PunchJob(models.Model):
+    # Fila local (no banco) de batidas aceitas de forma assíncrona e de trabalhos em lote
+    # (sincronização offline, cadastro em lote, exportação XLSX), que não cabem no tempo de uma requisição
+    STATUS_PENDING = 'pending'
+    STATUS_PROCESSING = 'processing'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+
+    KIND_PUNCH = 'punch'
+    KIND_SYNC = 'sync'
+    KIND_ENROLL = 'enroll'
+    KIND_EXPORT = 'export'
+    BATCH_KINDS = (KIND_SYNC, KIND_ENROLL, KIND_EXPORT)
+
+    ticket = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    kind = models.CharField(max_length=20, default=KIND_PUNCH, choices=[
+        (KIND_PUNCH, 'Batida'),
+        (KIND_SYNC, 'Sincronização offline'),
+        (KIND_ENROLL, 'Cadastro em lote'),
+        (KIND_EXPORT, 'Exportação XLSX'),
+    ])
+    photo = models.CharField(max_length=255, blank=True, default='')
+    # Parâmetros dos trabalhos em lote (caminhos dos arquivos enviados ou gerados, modo, filtros)
+    payload = models.JSONField(null=True, blank=True)
+    point_type = models.CharField(max_length=20)
+    target_user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, null=True, blank=True, related_name='punch_jobs')
+    requested_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True, related_name='requested_punch_jobs')
+    status = models.CharField(max_length=20, default=STATUS_PENDING, choices=[
+        (STATUS_PENDING, 'Pendente'),
+        (STATUS_PROCESSING, 'Processando'),
+        (STATUS_DONE, 'Concluído'),
+        (STATUS_FAILED, 'Falhou'),
+    ])
+    result = models.JSONField(null=True, blank=True)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    punched_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='punchjob_status_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"Batida {self.ticket} - {self.status}"
+
+class PunchIdempotencyKey(models.Model):
+    # Resposta guardada por chave Idempotency-Key: reenvios do quiosque devolvem o mesmo resultado
+    STATUS_PROCESSING = 'processing'
+    STATUS_DONE = 'done'
+
+    # A chave vale por principal (usuário autenticado ou quiosque anônimo): nunca devolve a resposta de outro
+    key = models.CharField(max_length=128)
+    requested_by = models.ForeignKey(CustomUser, on_delete=models.CASCADE, null=True, blank=True, related_name='punch_idempotency_keys')
+    status = models.CharField(max_length=20, default=STATUS_PROCESSING, choices=[
+        (STATUS_PROCESSING, 'Processando'),
+        (STATUS_DONE, 'Concluído'),
+    ])
+    attendance = models.ForeignKey(Attendance, on_delete=models.SET_NULL, null=True, blank=True, related_name='idempotency_keys')
+    response = models.JSONField(null=True, blank=True)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['requested_by', 'key'], name='punch_idem_owner_key_uniq'),
+            # NULLs não colidem no índice único: os quiosques anônimos precisam de uma restrição própria
+            models.UniqueConstraint(fields=['key'], condition=models.Q(requested_by__isnull=True), name='punch_idem_anon_key_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.key} - {self.status}"
+
 class Justification(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, null=True, blank=True)
     date = models.DateField(default=timezone.now)
     reason = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Paginação por chave (created_at, id) da listagem, geral e por usuário
+            models.Index(fields=['created_at', 'id'], name='justification_created_id_idx'),
+            models.Index(fields=['user', 'created_at', 'id'], name='justification_user_created_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user.username if self.user else 'Desconhecido'} - Justificativa em {self.date}"
 
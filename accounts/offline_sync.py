@@ -0,0 +1,262 @@
+from collections import defaultdict
+from datetime import timedelta
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .attendance_days import refresh_attendance_days
+from .embedding_cache import embedding_cache, embedding_cache_key
+from .enrollment import embedding_executor, extract_embeddings
+from .models import Attendance, Justification
+from .punches import VALID_POINT_TYPES, PunchError, check_claim_permission, match_punch, resolve_target_user
+from .photos import schedule_attendance_photo
+from .services import get_face_encoding_options, validate_face_image_extension
+from .logs import get_event_logger
+import base64
+import gzip
+import json
+import io
+
+logger = get_event_logger(__name__)
+User = get_user_model()
+
+GZIP_MAGIC = b'\x1f\x8b'
+GZIP_CHUNK_SIZE = 1024 * 1024
+
+
+def decompress_batch(raw, max_bytes):
+    # Descompacta em blocos e para no limite: um corpo pequeno não pode virar gigabytes em memória
+    chunks = []
+    size = 0
+    with gzip.GzipFile(fileobj=io.BytesIO(raw)) as stream:
+        while chunk := stream.read(GZIP_CHUNK_SIZE):
+            size += len(chunk)
+            if size > max_bytes:
+                raise ValueError(f"O lote descompactado excede o limite de {max_bytes} bytes.")
+            chunks.append(chunk)
+    return b''.join(chunks)
+
+
+def load_batch(raw):
+    max_bytes = settings.ATTENDANCE_SYNC_MAX_BYTES
+    if raw[:2] == GZIP_MAGIC:
+        raw = decompress_batch(raw, max_bytes)
+    elif len(raw) > max_bytes:
+        raise ValueError(f"O lote excede o limite de {max_bytes} bytes.")
+    payload = json.loads(raw)
+    items = payload.get('items') if isinstance(payload, dict) else payload
+    if not isinstance(items, list):
+        raise ValueError('O lote deve ser uma lista de batidas ou um objeto com a chave "items".')
+    if len(items) > settings.ATTENDANCE_SYNC_MAX_ITEMS:
+        raise ValueError(f"O lote excede o limite de {settings.ATTENDANCE_SYNC_MAX_ITEMS} batidas.")
+    return items
+
+
+def parse_item(index, raw):
+    if not isinstance(raw, dict):
+        raise PunchError('Item inválido')
+    point_type = raw.get('point_type')
+    if point_type not in VALID_POINT_TYPES:
+        raise PunchError('Tipo de ponto inválido')
+
+    captured_at = parse_datetime(str(raw.get('captured_at') or ''))
+    if captured_at is None:
+        raise PunchError('captured_at ausente ou inválido. Use ISO 8601.')
+    if timezone.is_naive(captured_at):
+        captured_at = timezone.make_aware(captured_at)
+    if captured_at > timezone.now() + timedelta(minutes=5):
+        raise PunchError('captured_at no futuro')
+
+    client_id = raw.get('client_id')
+    client_id = str(client_id)[:64] if client_id else None
+    try:
+        data = base64.b64decode(raw.get('photo') or '', validate=True)
+    except ValueError:
+        data = b''
+    if not data:
+        raise PunchError('Foto ausente ou com base64 inválido')
+    photo = ContentFile(data, name=raw.get('filename') or f"{client_id or f'sync_{index}'}.jpg")
+    try:
+        validate_face_image_extension(photo)
+    except ValueError as e:
+        raise PunchError(str(e))
+
+    return {
+        'point_type': point_type,
+        'captured_at': captured_at,
+        'local_date': timezone.localdate(captured_at),
+        'client_id': client_id,
+        'user_id': raw.get('user_id'),
+        'photo': photo,
+        'data': data,
+    }
+
+
+def encode_items(items):
+    options = get_face_encoding_options()
+    embeddings = {}
+    missing = []
+    for index, item in items.items():
+        item['cache_key'] = embedding_cache_key(item['data'], options)
+        embedding = embedding_cache.get(item['cache_key'])
+        if embedding is not None:
+            embeddings[index] = (embedding, None)
+        else:
+            missing.append(index)
+
+    # Roda num worker da fila (process_punch_jobs), fora do pool das batidas ao vivo: as fotos
+    # sem cache são reconhecidas em paralelo por um pool próprio, limitado a ATTENDANCE_SYNC_WORKERS
+    workers = min(settings.ATTENDANCE_SYNC_WORKERS, len(missing))
+    with embedding_executor(workers) as executor:
+        results = extract_embeddings(executor, [items[index]['data'] for index in missing], options)
+    for index, (embedding, error) in zip(missing, results):
+        if embedding is not None:
+            embedding_cache.set(items[index]['cache_key'], embedding)
+        embeddings[index] = (embedding, error)
+    return embeddings
+
+
+def prefetch_day_types(user_dates):
+    """Uma única consulta com as batidas dos dias afetados, agrupadas por (usuário, data local)."""
+    day_types = defaultdict(set)
+    if not user_dates:
+        return day_types
+    rows = Attendance.objects.filter(
+        user_id__in={user_id for user_id, _ in user_dates},
+        data_local__in={local_date for _, local_date in user_dates},
+    ).values_list('user_id', 'data_local', 'point_type')
+    for user_id, local_date, point_type in rows:
+        if (user_id, local_date) in user_dates:
+            day_types[(user_id, local_date)].add(point_type)
+    return day_types
+
+
+def insert_attendances(pending, chunk_size):
+    created = {}
+    failed = {}
+    for start in range(0, len(pending), chunk_size):
+        chunk = pending[start:start + chunk_size]
+        try:
+            with transaction.atomic():
+                Attendance.objects.bulk_create([attendance for _, attendance in chunk])
+            for index, attendance in chunk:
+                created[index] = attendance
+        except IntegrityError:
+            # Conflito de client_id com outro envio concorrente: isola item a item
+            for index, attendance in chunk:
+                try:
+                    with transaction.atomic():
+                        attendance.save(force_insert=True)
+                    created[index] = attendance
+                except IntegrityError:
+                    failed[index] = 'Batida já sincronizada'
+    return created, failed
+
+
+def sync_punches(raw_items, request_user, mode):
+    results = [{'index': index, 'client_id': None, 'status': 'error'} for index in range(len(raw_items))]
+    items = {}
+
+    def reject(index, message, result_status='rejected'):
+        results[index].update({'status': result_status, 'error': message})
+
+    for index, raw in enumerate(raw_items):
+        try:
+            items[index] = parse_item(index, raw)
+            results[index]['client_id'] = items[index]['client_id']
+        except PunchError as e:
+            reject(index, e.message, 'error')
+
+    # Reenvios: client_id já gravado ou repetido dentro do próprio lote
+    client_ids = [item['client_id'] for item in items.values() if item['client_id']]
+    existing = dict(Attendance.objects.filter(client_id__in=client_ids).values_list('client_id', 'id'))
+    seen_client_ids = set()
+    for index in list(items):
+        client_id = items[index]['client_id']
+        if not client_id:
+            continue
+        if client_id in existing or client_id in seen_client_ids:
+            results[index].update({'status': 'duplicate', 'attendance_id': existing.get(client_id)})
+            del items[index]
+        seen_client_ids.add(client_id)
+
+    # Mesma regra da batida online (resolve_target_user): verificação contra o user_id informado ou
+    # contra o próprio usuário autenticado, identificação 1:N caso contrário
+    claimed_ids = {}
+    for index in list(items):
+        claimed = items[index]['user_id']
+        if mode != 'identify' and claimed:
+            try:
+                claimed_ids[index] = check_claim_permission(request_user, claimed)
+            except PunchError as e:
+                reject(index, e.message, 'error')
+                del items[index]
+    claimed_users = User.objects.in_bulk(set(claimed_ids.values()))
+
+    embeddings = encode_items(items)
+    matches = {}
+    failures = []
+    for index in sorted(items, key=lambda index: items[index]['captured_at']):
+        item = items[index]
+        embedding, error = embeddings[index]
+        if error:
+            reject(index, f"Erro ao processar imagem facial: {error}", 'error')
+            continue
+
+        try:
+            target_user = resolve_target_user(request_user, mode, item['user_id'], users=claimed_users)
+        except PunchError as e:
+            reject(index, e.message, 'error')
+            continue
+
+        matched_user, min_distance = match_punch(embedding, target_user)
+        if matched_user and min_distance < settings.FACE_MATCH_THRESHOLD:
+            matches[index] = matched_user
+        else:
+            reject(index, 'Rosto não corresponde ou nenhum usuário encontrado')
+            failures.append(Justification(
+                reason=f"Falha no reconhecimento (sincronização). Distância: {min_distance}",
+                date=item['local_date'],
+            ))
+
+    day_types = prefetch_day_types({(user.id, items[index]['local_date']) for index, user in matches.items()})
+    pending = []
+    for index in sorted(matches, key=lambda index: items[index]['captured_at']):
+        item = items[index]
+        user = matches[index]
+        registered = day_types[(user.id, item['local_date'])]
+        position = VALID_POINT_TYPES.index(item['point_type'])
+        if position > 0 and VALID_POINT_TYPES[position - 1] not in registered:
+            reject(index, f"Primeiro marque {VALID_POINT_TYPES[position - 1]}")
+            continue
+        if item['point_type'] in registered:
+            reject(index, 'Tipo de ponto já registrado neste dia')
+            continue
+        photo_path, thumb_path = schedule_attendance_photo(item['data'])
+        registered.add(item['point_type'])
+        results[index]['user_id'] = user.id
+        pending.append((index, Attendance(
+            user=user,
+            point_type=item['point_type'],
+            data_hora=item['captured_at'],
+            data_local=item['local_date'],
+            foto_path=photo_path,
+            foto_thumb=thumb_path,
+            is_synced=True,
+            client_id=item['client_id'],
+        )))
+
+    created, failed = insert_attendances(pending, settings.ATTENDANCE_SYNC_CHUNK_SIZE)
+    for index, attendance in created.items():
+        results[index].update({'status': 'created', 'attendance_id': attendance.id})
+    for index, message in failed.items():
+        results[index].update({'status': 'duplicate', 'error': message})
+    if failures:
+        Justification.objects.bulk_create(failures)
+    # bulk_create não dispara os sinais do resumo diário
+    refresh_attendance_days({(attendance.user_id, attendance.data_local) for attendance in created.values()})
+
+    logger.info('sync.finished', 'Sincronização offline: {created} de {total} batidas gravadas', created=len(created), total=len(raw_items), duplicates=len(failed), rejected=len(failures))
+    return results
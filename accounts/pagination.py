@@ -0,0 +1,86 @@
+# Paginação por chave (keyset) para as listagens que crescem sem limite.
+# O cursor guarda (valor da ordenação, id) do último item da página; a próxima página é
+# "WHERE (campo, id) < (valor, id) ORDER BY campo DESC, id DESC LIMIT n", servida pelo índice
+# (campo, id), então páginas profundas custam o mesmo que a primeira.
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+import base64
+import json
+
+
+class KeysetPagination(BasePagination):
+    ordering_field = 'data_hora'
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, settings.API_PAGE_SIZE))
+        except ValueError:
+            raise ValidationError({'error': 'page_size deve ser um número inteiro'})
+        return min(max(1, page_size), settings.API_MAX_PAGE_SIZE)
+
+    def encode_cursor(self, value, pk):
+        payload = json.dumps([value.isoformat(), pk]).encode()
+        return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            value, pk = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+            value = parse_datetime(value)
+            if value is None:
+                raise ValueError(cursor)
+            return value, int(pk)
+        except (ValueError, TypeError):
+            raise ValidationError({'error': 'Cursor inválido'})
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        field = self.ordering_field
+        queryset = queryset.order_by(f"-{field}", '-id')
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            value, pk = self.decode_cursor(cursor)
+            # O limite redundante (campo <= valor) deixa o intervalo explícito para o índice
+            queryset = queryset.filter(Q(**{f"{field}__lte": value}) & (Q(**{f"{field}__lt": value}) | Q(id__lt=pk)))
+
+        page = list(queryset[:self.page_size + 1])
+        self.has_next = len(page) > self.page_size
+        page = page[:self.page_size]
+        self.next_cursor = self.encode_cursor(getattr(page[-1], field), page[-1].pk) if self.has_next else None
+        return page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'page_size': self.page_size,
+            'results': data,
+        })
+
+
+class JustificationKeysetPagination(KeysetPagination):
+    ordering_field = 'created_at'
+
+
+def requested_fields(request, allowed):
+    """Campos pedidos em ?fields=a,b (projeção); None quando não informado."""
+    fields = request.query_params.get('fields')
+    if not fields:
+        return None
+    fields = [field.strip() for field in fields.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise ValidationError({'error': f"Campos desconhecidos: {', '.join(unknown)}. Disponíveis: {', '.join(allowed)}"})
+    return fields
@@ -1,6 +1,23 @@
 from rest_framework.permissions import BasePermission
+from django.conf import settings
+import hmac
 from .models import CustomUser, UserRole
 
 class AdminPermission(BasePermission):
     def has_permission(self, request, view):
-        return request.user.is_authenticated and getattr(request.user, 'role', UserRole.USER.value) == UserRole.ADMIN.value
\ No newline at end of file
+        return request.user.is_authenticated and getattr(request.user, 'role', UserRole.USER.value) == UserRole.ADMIN.value
+
+class AttendanceKioskPermission(BasePermission):
+    # Quiosques sem login só são aceitos quando a implantação permite explicitamente
+    def has_permission(self, request, view):
+        return request.user.is_authenticated or settings.ATTENDANCE_ANONYMOUS_KIOSK
+
+class MetricsPermission(BasePermission):
+    # /metrics expõe volumes e falhas: só o scraper com o token ou os IPs liberados (REMOTE_ADDR, sem proxy)
+    def has_permission(self, request, view):
+        token = settings.METRICS_TOKEN
+        if token:
+            header = request.META.get('HTTP_AUTHORIZATION', '')
+            if header.startswith('Bearer ') and hmac.compare_digest(header[len('Bearer '):].encode(), token.encode()):
+                return True
+        return request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS
@@ -0,0 +1,119 @@
+# Persistência das fotos de batida fora da requisição.
+# O caminho é derivado do SHA-256 da imagem original, então pode ser gravado na batida antes de o
+# arquivo existir; a foto reduzida e a miniatura são geradas e gravadas numa thread depois do commit,
+# só para batidas aceitas e fora do pool de reconhecimento. Se a gravação falhar, os caminhos
+# são limpos da batida; repair_attendance_photos limpa os que ficaram sem arquivo (ex.: processo encerrado).
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from . import metrics
+from .face_encoding import decode_image, open_image, render_photo
+from .logs import get_event_logger
+from .models import Attendance
+import threading
+import hashlib
+import os
+
+logger = get_event_logger(__name__)
+
+PHOTO_DIR = 'attendance/photos'
+THUMB_DIR = 'attendance/thumbs'
+EXTENSIONS = {'WEBP': '.webp', 'JPEG': '.jpg'}
+# Gravações tentadas antes de desistir e limpar os caminhos da batida
+PHOTO_SAVE_ATTEMPTS = 2
+
+_lock = threading.Lock()
+_executor = None
+_executor_pid = None
+_pending = None
+
+
+def photo_format():
+    return 'WEBP' if settings.ATTENDANCE_PHOTO_FORMAT.upper() == 'WEBP' else 'JPEG'
+
+
+def photo_paths(digest):
+    extension = EXTENSIONS[photo_format()]
+    return (
+        f"{PHOTO_DIR}/{digest[:2]}/{digest}{extension}",
+        f"{THUMB_DIR}/{digest[:2]}/{digest}{extension}",
+    )
+
+
+def get_photo_options():
+    return {
+        'format': photo_format(),
+        'max_edge': settings.ATTENDANCE_PHOTO_MAX_EDGE,
+        'thumb_edge': settings.ATTENDANCE_THUMB_EDGE,
+        'quality': settings.ATTENDANCE_PHOTO_QUALITY,
+    }
+
+
+def save_photo(data, photo_path, thumb_path):
+    with metrics.timed('photo_render'):
+        photo, thumb = render_photo(decode_image(open_image(data)), get_photo_options())
+    with metrics.timed('photo_save'):
+        for path, content in ((photo_path, photo), (thumb_path, thumb)):
+            if not default_storage.exists(path):
+                default_storage.save(path, ContentFile(content))
+
+
+def clear_photo_paths(photo_path):
+    # A batida já foi gravada com os caminhos: sem os arquivos, volta a "sem foto" em vez de um link quebrado
+    return Attendance.objects.filter(foto_path=photo_path).update(foto_path=None, foto_thumb=None)
+
+
+def persist_photo(data, photo_path, thumb_path):
+    """Gera e grava a foto reduzida e a miniatura a partir dos bytes do upload."""
+    # Mesmo conteúdo, mesmo caminho: reenvios e batidas repetidas não gravam de novo
+    if default_storage.exists(photo_path) and default_storage.exists(thumb_path):
+        return
+    for attempt in range(1, PHOTO_SAVE_ATTEMPTS + 1):
+        try:
+            save_photo(data, photo_path, thumb_path)
+            return
+        except Exception as e:
+            logger.error('photo.save_error', 'Erro ao gravar foto {path}: {error}', path=photo_path, attempt=attempt, attempts=PHOTO_SAVE_ATTEMPTS, error=str(e))
+    try:
+        cleared = clear_photo_paths(photo_path)
+        logger.error('photo.cleared', 'Foto {path} não gravada; caminho removido de {cleared} batidas', path=photo_path, cleared=cleared)
+    except Exception as e:
+        logger.error('photo.clear_error', 'Erro ao limpar o caminho da foto {path}: {error}', path=photo_path, error=str(e))
+
+
+def get_executor():
+    global _executor, _executor_pid, _pending
+    with _lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=settings.ATTENDANCE_PHOTO_WORKERS, thread_name_prefix='attendance-photo')
+            _pending = threading.BoundedSemaphore(settings.ATTENDANCE_PHOTO_QUEUE_SIZE)
+            _executor_pid = os.getpid()
+        return _executor, _pending
+
+
+def submit_photo(data, photo_path, thumb_path):
+    # Cada foto na fila segura os bytes do upload: com a fila cheia, grava na própria requisição
+    # (depois do commit), o que limita a memória e freia os clientes em vez de acumular
+    executor, pending = get_executor()
+    if not pending.acquire(blocking=False):
+        persist_photo(data, photo_path, thumb_path)
+        return
+    try:
+        future = executor.submit(persist_photo, data, photo_path, thumb_path)
+    except RuntimeError:
+        pending.release()
+        raise
+    future.add_done_callback(lambda _: pending.release())
+
+
+def schedule_attendance_photo(data):
+    """Reserva os caminhos da foto e da miniatura e agenda a gravação para depois do commit."""
+    digest = hashlib.sha256(data).hexdigest()
+    photo_path, thumb_path = photo_paths(digest)
+    if settings.ATTENDANCE_PHOTO_WORKERS <= 0:
+        transaction.on_commit(lambda: persist_photo(data, photo_path, thumb_path))
+    else:
+        transaction.on_commit(lambda: submit_photo(data, photo_path, thumb_path))
+    return photo_path, thumb_path
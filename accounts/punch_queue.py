@@ -0,0 +1,227 @@
+from collections import defaultdict
+from datetime import date, timedelta
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.files.base import ContentFile, File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from .models import PunchJob
+from .photos import schedule_attendance_photo
+from .punches import match_punch, complete_punch
+from .services import embed_face_data, store_attendance_photo
+from .enrollment import parse_manifest, enroll_users
+from .offline_sync import load_batch, sync_punches
+from .exports import export_filename, export_rows, write_xlsx
+from .logs import get_event_logger
+from . import metrics
+import tempfile
+import zipfile
+import uuid
+import os
+
+logger = get_event_logger(__name__)
+
+
+def enqueue_punch(face_image, point_type, target_user=None, requested_by=None):
+    # Persiste a foto e registra o trabalho; o reconhecimento fica para os workers da fila
+    photo_path = store_attendance_photo(face_image)
+    job = PunchJob.objects.create(
+        photo=photo_path,
+        point_type=point_type,
+        target_user=target_user,
+        requested_by=requested_by if requested_by is not None and requested_by.is_authenticated else None,
+    )
+    logger.info('punch_job.enqueued', 'Batida {ticket} enfileirada', ticket=job.ticket, kind=job.kind, point_type=point_type)
+    return job
+
+
+def enqueue_enrollment(manifest, photos, requested_by):
+    # Manifesto e zip vão para o storage; o cadastro roda num worker da fila
+    prefix = f"enrollment/incoming/{uuid.uuid4().hex}"
+    manifest_path = default_storage.save(f"{prefix}/{os.path.basename(manifest.name)}", manifest)
+    photos_path = default_storage.save(f"{prefix}/photos.zip", photos)
+    job = PunchJob.objects.create(
+        kind=PunchJob.KIND_ENROLL,
+        point_type='',
+        payload={'manifest': manifest_path, 'photos': photos_path},
+        requested_by=requested_by,
+    )
+    logger.info('punch_job.enqueued', 'Cadastro em lote {ticket} enfileirado', ticket=job.ticket, kind=job.kind)
+    return job
+
+
+def enqueue_sync(raw, mode, requested_by):
+    # O lote vai para o storage como recebido (gzip ou não); reconhecimento e gravação rodam num worker da fila
+    batch_path = default_storage.save(f"sync/incoming/{uuid.uuid4().hex}.batch", ContentFile(raw))
+    job = PunchJob.objects.create(
+        kind=PunchJob.KIND_SYNC,
+        point_type='',
+        payload={'batch': batch_path, 'mode': mode},
+        requested_by=requested_by if requested_by is not None and requested_by.is_authenticated else None,
+    )
+    logger.info('punch_job.enqueued', 'Lote offline {ticket} enfileirado', ticket=job.ticket, kind=job.kind)
+    return job
+
+
+def enqueue_export(params, requested_by):
+    # params: kind, start_date, end_date (ISO), user_id e point_type já validados pela view
+    job = PunchJob.objects.create(kind=PunchJob.KIND_EXPORT, point_type='', payload=params, requested_by=requested_by)
+    logger.info('punch_job.enqueued', 'Exportação {ticket} enfileirada', ticket=job.ticket, kind=job.kind)
+    return job
+
+
+def claim_next_job():
+    now = timezone.now()
+    stale_before = now - timedelta(seconds=settings.PUNCH_JOB_STALE_SECONDS)
+    batch_stale_before = now - timedelta(seconds=settings.BATCH_JOB_STALE_SECONDS)
+    with transaction.atomic():
+        # skip_locked permite vários workers drenando a fila sem disputar o mesmo trabalho;
+        # batidas passam na frente dos trabalhos em lote
+        job = (
+            PunchJob.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(status=PunchJob.STATUS_PENDING)
+                | Q(status=PunchJob.STATUS_PROCESSING, kind=PunchJob.KIND_PUNCH, started_at__lt=stale_before)
+                | Q(status=PunchJob.STATUS_PROCESSING, kind__in=PunchJob.BATCH_KINDS, started_at__lt=batch_stale_before)
+            )
+            .order_by(
+                Case(When(kind=PunchJob.KIND_PUNCH, then=Value(0)), default=Value(1), output_field=IntegerField()),
+                'created_at',
+            )
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = PunchJob.STATUS_PROCESSING
+        job.started_at = now
+        job.attempts += 1
+        job.save(update_fields=['status', 'started_at', 'attempts'])
+    if job.attempts == 1:
+        metrics.observe('chronos_queue_wait_seconds', (now - job.created_at).total_seconds(), queue='punch_jobs')
+    return job
+
+
+def discard_upload(path):
+    # A foto original só serve ao processamento: a batida guarda a versão reduzida (accounts/photos.py)
+    if not path:
+        return
+    try:
+        default_storage.delete(path)
+    except OSError as e:
+        logger.warning('punch_job.upload_cleanup_error', 'Não foi possível remover o upload {path}', path=path, error=str(e))
+
+
+def finish_job(job, result, status_code):
+    discard_upload(job.photo)
+    job.result = result
+    job.status_code = status_code
+    job.status = PunchJob.STATUS_DONE if status_code < 400 else PunchJob.STATUS_FAILED
+    job.finished_at = timezone.now()
+    job.save(update_fields=['result', 'status_code', 'status', 'finished_at'])
+    logger.info('punch_job.finished', 'Trabalho {ticket} finalizado com status {status_code}', ticket=job.ticket, kind=job.kind, status_code=status_code, attempts=job.attempts)
+
+
+def process_enrollment_job(job):
+    manifest_path, photos_path = job.payload['manifest'], job.payload['photos']
+    try:
+        with default_storage.open(manifest_path) as manifest:
+            rows = parse_manifest(manifest.read(), manifest_path)
+        with default_storage.open(photos_path) as photos, zipfile.ZipFile(photos) as archive:
+            # Mesmo paralelismo do comando bulk_enroll (FACE_BULK_ENROLL_WORKERS)
+            report = enroll_users(rows, archive)
+    except (ValueError, UnicodeDecodeError, zipfile.BadZipFile) as e:
+        finish_job(job, {'error': f'Cadastro em lote inválido: {str(e)}'}, status.HTTP_400_BAD_REQUEST)
+        return
+    finally:
+        for path in (manifest_path, photos_path):
+            default_storage.delete(path)
+
+    created = sum(1 for item in report if item['status'] == 'created')
+    finish_job(job, {
+        'total': len(report),
+        'created': created,
+        'failed': len(report) - created,
+        'results': report,
+    }, status.HTTP_200_OK)
+
+
+def process_sync_job(job):
+    batch_path = job.payload['batch']
+    try:
+        with default_storage.open(batch_path) as batch:
+            items = load_batch(batch.read())
+        results = sync_punches(items, job.requested_by or AnonymousUser(), job.payload['mode'])
+    except (ValueError, EOFError, OSError) as e:
+        discard_upload(batch_path)
+        finish_job(job, {'error': f'Lote inválido: {str(e)}'}, status.HTTP_400_BAD_REQUEST)
+        return
+    # Só depois do processamento: se o worker cair no meio, o trabalho volta para a fila com o lote
+    # (batidas já gravadas voltam como duplicadas)
+    discard_upload(batch_path)
+
+    summary = defaultdict(int)
+    for item in results:
+        summary[item['status']] += 1
+    finish_job(job, {'total': len(results), 'summary': dict(summary), 'results': results}, status.HTTP_200_OK)
+
+
+def prune_exports():
+    # Planilhas ficam disponíveis por ATTENDANCE_EXPORT_TTL; depois o arquivo é removido e o ticket expira
+    cutoff = timezone.now() - timedelta(seconds=settings.ATTENDANCE_EXPORT_TTL)
+    expired = PunchJob.objects.filter(kind=PunchJob.KIND_EXPORT, finished_at__lt=cutoff, payload__has_key='file')
+    for job in expired:
+        discard_upload(job.payload.pop('file'))
+        job.save(update_fields=['payload'])
+
+
+def process_export_job(job):
+    prune_exports()
+    params = job.payload
+    start_date, end_date = date.fromisoformat(params['start_date']), date.fromisoformat(params['end_date'])
+    header, rows = export_rows(params['kind'], start_date, end_date, params.get('user_id'), params.get('point_type'))
+    with tempfile.TemporaryFile() as output:
+        write_xlsx(header, rows, output)
+        output.seek(0)
+        job.payload['file'] = default_storage.save(f"exports/{job.ticket}.xlsx", File(output))
+    job.save(update_fields=['payload'])
+    finish_job(job, {
+        'filename': export_filename(params['kind'], start_date, end_date, 'xlsx'),
+        'download_url': reverse('job_download', args=[job.ticket]),
+    }, status.HTTP_200_OK)
+
+
+def process_job(job):
+    if job.attempts > settings.PUNCH_JOB_MAX_ATTEMPTS:
+        finish_job(job, {'error': 'Número máximo de tentativas de processamento excedido'}, status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return
+    if job.kind == PunchJob.KIND_ENROLL:
+        process_enrollment_job(job)
+        return
+    if job.kind == PunchJob.KIND_SYNC:
+        process_sync_job(job)
+        return
+    if job.kind == PunchJob.KIND_EXPORT:
+        process_export_job(job)
+        return
+
+    try:
+        with default_storage.open(job.photo) as photo:
+            data = photo.read()
+        login_embedding = embed_face_data(data, job.photo, use_pool=False)
+    except ValueError as e:
+        finish_job(job, {'error': str(e)}, status.HTTP_400_BAD_REQUEST)
+        return
+    except Exception as e:
+        logger.error('punch_job.encode_error', 'Erro ao processar imagem facial da batida {ticket}: {error}', ticket=job.ticket, error=str(e))
+        finish_job(job, {'error': f'Erro ao processar imagem facial: {str(e)}'}, status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return
+
+    matched_user, min_distance = match_punch(login_embedding, job.target_user)
+    result, status_code = complete_punch(
+        matched_user, min_distance, job.point_type, lambda: schedule_attendance_photo(data), punched_at=job.punched_at,
+    )
+    finish_job(job, result, status_code)
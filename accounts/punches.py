@@ -0,0 +1,160 @@
+from datetime import datetime, time, timedelta
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from .models import Attendance
+from .serializers import AttendanceSerializer, JustificationSerializer
+from .services import find_matching_user, verify_matching_user
+from . import metrics
+from .logs import get_event_logger
+
+logger = get_event_logger(__name__)
+User = get_user_model()
+
+VALID_POINT_TYPES = ['entrada', 'almoco', 'saida']
+MATCH_MODES = ('auto', 'verify', 'identify')
+
+
+class PunchError(Exception):
+    def __init__(self, message, status_code=status.HTTP_400_BAD_REQUEST):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def check_claim_permission(request_user, claimed_user_id):
+    if request_user.is_authenticated and not request_user.is_admin and str(request_user.id) != str(claimed_user_id):
+        raise PunchError('Sem permissão para registrar ponto de outro usuário', status.HTTP_403_FORBIDDEN)
+    try:
+        return int(claimed_user_id)
+    except (TypeError, ValueError):
+        raise PunchError('user_id inválido')
+
+
+def resolve_match_mode(mode):
+    mode = (mode or settings.FACE_MATCH_MODE).lower()
+    if mode not in MATCH_MODES:
+        raise PunchError('Modo de reconhecimento inválido. Use auto, verify ou identify.')
+    return mode
+
+
+def resolve_target_user(request_user, mode, claimed_user_id=None, users=None):
+    """Define contra quem a foto será comparada: None significa identificação 1:N.
+
+    users permite passar os usuários já carregados (lotes da sincronização offline).
+    """
+    if mode == 'identify':
+        return None
+    if claimed_user_id:
+        claimed_id = check_claim_permission(request_user, claimed_user_id)
+        target_user = users.get(claimed_id) if users is not None else User.objects.filter(pk=claimed_id).first()
+        if target_user is None:
+            raise PunchError('Usuário não encontrado', status.HTTP_404_NOT_FOUND)
+        return target_user
+    if request_user.is_authenticated:
+        return request_user
+    if mode == 'verify':
+        raise PunchError('Informe user_id para verificação facial')
+    return None
+
+
+def match_punch(login_embedding, target_user=None):
+    if target_user is not None:
+        # Verificação 1:1: a identidade já é conhecida pelo JWT ou informada pelo quiosque
+        with metrics.timed('match_verify'):
+            return verify_matching_user(login_embedding, target_user)
+    with metrics.timed('match_identify'):
+        return find_matching_user(login_embedding, User)
+
+
+def recent_punches(user, punched_at):
+    """Últimas batidas do usuário até o fim do dia da batida, em uma consulta indexada com LIMIT.
+
+    Cada tipo é registrado no máximo uma vez por dia, então todas as batidas do dia estão entre as
+    len(VALID_POINT_TYPES) mais recentes; o mesmo resultado alimenta last_records na resposta.
+    """
+    current_date = timezone.localdate(punched_at)
+    end_of_day = timezone.make_aware(datetime.combine(current_date + timedelta(days=1), time.min))
+    return list(
+        Attendance.objects.filter(user=user, data_hora__lt=end_of_day)
+        .order_by('-data_hora')[:len(VALID_POINT_TYPES)]
+    )
+
+
+def complete_punch(matched_user, min_distance, point_type, store_photo, punched_at=None):
+    """Valida a sequência do dia e grava a batida (ou a justificativa de falha).
+
+    store_photo devolve (caminho da foto, caminho da miniatura) e só é chamado se a batida for válida.
+
+    Retorna (dados da resposta, status HTTP) para ser usado tanto pela view síncrona quanto pelo worker da fila.
+    """
+    punched_at = punched_at or timezone.now()
+    logger.debug('punch.matched', user_id=matched_user.id if matched_user else None, distance=min_distance)
+    if matched_user and min_distance < settings.FACE_MATCH_THRESHOLD:
+        if point_type not in VALID_POINT_TYPES:
+            return {'error': 'Tipo de ponto inválido'}, status.HTTP_400_BAD_REQUEST
+
+        current_date = timezone.localdate(punched_at)
+        with metrics.timed('sequence_check'):
+            recent = recent_punches(matched_user, punched_at)
+            registered_types = {a.point_type for a in recent if a.data_local == current_date}
+            next_index = VALID_POINT_TYPES.index(point_type)
+            if next_index > 0 and VALID_POINT_TYPES[next_index - 1] not in registered_types:
+                metrics.increment('chronos_punch_results_total', result='out_of_sequence')
+                return {'error': f'Primeiro marque {VALID_POINT_TYPES[next_index - 1]}'}, status.HTTP_400_BAD_REQUEST
+            if point_type in registered_types:
+                metrics.increment('chronos_punch_results_total', result='duplicate')
+                return {'error': 'Tipo de ponto já registrado hoje'}, status.HTTP_400_BAD_REQUEST
+
+        try:
+            photo_path, thumb_path = store_photo()
+        except IOError as e:
+            logger.error('punch.photo_error', 'Erro ao salvar arquivo: {error}', error=str(e))
+            return {'error': 'Erro ao salvar imagem'}, status.HTTP_500_INTERNAL_SERVER_ERROR
+
+        attendance_data = {
+            'user': matched_user.id,
+            'point_type': point_type,
+            'foto_path': photo_path,
+            'data_hora': punched_at,
+            'is_synced': False,
+        }
+        serializer = AttendanceSerializer(data=attendance_data)
+        if serializer.is_valid():
+            try:
+                with metrics.timed('insert'), transaction.atomic():
+                    attendance = serializer.save(data_hora=punched_at, foto_path=photo_path, foto_thumb=thumb_path)
+            except IntegrityError:
+                # Outra requisição gravou o mesmo tipo de ponto entre a validação e o insert
+                metrics.increment('chronos_punch_results_total', result='duplicate')
+                return {'error': 'Tipo de ponto já registrado hoje'}, status.HTTP_400_BAD_REQUEST
+            metrics.increment('chronos_punch_results_total', result='matched')
+            logger.info('punch.recorded', 'Registro de ponto bem-sucedido', user_id=matched_user.id, point_type=point_type, day=current_date, distance=round(float(min_distance), 4))
+            last_records = sorted([attendance, *recent], key=lambda a: a.data_hora, reverse=True)[:3]
+            response_data = {
+                'attendance_id': attendance.id,
+                'full_name': f"{matched_user.first_name or ''} {matched_user.last_name or ''}".strip() or matched_user.username,
+                'cpf': matched_user.cpf or "",
+                'funcao': getattr(matched_user, 'funcao', "") or "",
+                'matricula': getattr(matched_user, 'matricula', "") or "",
+                'empresa': getattr(matched_user, 'empresa', "") or "",
+                'date': attendance_data['data_hora'].date().isoformat(),
+                'last_records': AttendanceSerializer(last_records, many=True).data
+            }
+            logger.payload('punch.response', lambda: response_data)
+            return response_data, status.HTTP_200_OK
+        return serializer.errors, status.HTTP_400_BAD_REQUEST
+
+    metrics.increment('chronos_punch_results_total', result='rejected_distance' if matched_user else 'no_candidate')
+    justification_data = {
+        'user': matched_user.id if matched_user else None,
+        'reason': f"Falha no reconhecimento. Distância: {min_distance}",
+        'date': timezone.localdate(punched_at)
+    }
+    justification_serializer = JustificationSerializer(data=justification_data)
+    if justification_serializer.is_valid():
+        justification_serializer.save()
+    logger.warning('punch.rejected', 'Falha no reconhecimento', user_id=matched_user.id if matched_user else None, distance=min_distance)
+    return {'error': 'Rosto não corresponde ou nenhum usuário encontrado'}, status.HTTP_401_UNAUTHORIZED
@@ -0,0 +1,84 @@
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from django.conf import settings
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from .face_encoding import warm_up
+from .logs import get_event_logger
+import multiprocessing
+import threading
+import os
+
+logger = get_event_logger(__name__)
+
+
+class RecognitionUnavailable(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Reconhecimento facial sobrecarregado. Tente novamente em instantes.'
+    default_code = 'recognition_unavailable'
+
+
+_lock = threading.Lock()
+_executor = None
+_executor_pid = None
+_slots = None
+
+
+def _max_pending():
+    return settings.FACE_POOL_MAX_PENDING or settings.FACE_POOL_SIZE * 2
+
+
+def get_executor():
+    global _executor, _executor_pid, _slots
+    with _lock:
+        # Depois de um fork (gunicorn) o executor herdado não é utilizável no processo filho
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.FACE_POOL_SIZE,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=warm_up,
+            )
+            _executor_pid = os.getpid()
+            _slots = threading.BoundedSemaphore(_max_pending())
+            logger.info('recognition_pool.started', 'Pool de reconhecimento iniciado com {size} processos', size=settings.FACE_POOL_SIZE, max_pending=_max_pending())
+        return _executor, _slots
+
+
+def shutdown_executor():
+    global _executor, _executor_pid
+    with _lock:
+        if _executor is not None and _executor_pid == os.getpid():
+            _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+        _executor_pid = None
+
+
+def run_in_recognition_pool(fn, *args):
+    if settings.FACE_POOL_SIZE <= 0:
+        return fn(*args)
+
+    executor, slots = get_executor()
+    if not slots.acquire(blocking=False):
+        logger.warning('recognition_pool.full', 'Fila do pool de reconhecimento cheia, recusando requisição')
+        raise RecognitionUnavailable()
+
+    try:
+        future = executor.submit(fn, *args)
+    except (BrokenProcessPool, RuntimeError) as e:
+        slots.release()
+        logger.error('recognition_pool.unavailable', 'Pool de reconhecimento indisponível: {error}', error=str(e))
+        shutdown_executor()
+        raise RecognitionUnavailable()
+    future.add_done_callback(lambda _: slots.release())
+
+    try:
+        return future.result(timeout=settings.FACE_POOL_TIMEOUT)
+    except FutureTimeoutError:
+        future.cancel()
+        logger.error('recognition_pool.timeout', 'Tempo esgotado aguardando o pool de reconhecimento ({timeout}s)', timeout=settings.FACE_POOL_TIMEOUT)
+        raise RecognitionUnavailable()
+    except BrokenProcessPool as e:
+        logger.error('recognition_pool.broken', 'Processo do pool de reconhecimento morreu: {error}', error=str(e))
+        shutdown_executor()
+        raise RecognitionUnavailable()
+
@@ -0,0 +1,93 @@
+# Cache dos relatórios de ponto.
+# A chave inclui o escopo (usuário ou 'org'), os limites do período e as versões dos dados do escopo.
+# O relatório geral é versionado por mês ('org:<AAAA-MM>'), além de uma versão 'org' para mudanças
+# de cadastro: uma batida só invalida os relatórios gerais que incluem o mês dela.
+# refresh_attendance_days troca as versões afetadas depois do commit, então períodos fechados ficam
+# em cache e o período corrente só é recalculado após uma alteração.
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from . import metrics
+import hashlib
+import uuid
+
+ORGANIZATION_SCOPE = 'org'
+
+
+def get_report_cache():
+    return caches[settings.REPORT_CACHE_ALIAS]
+
+
+def version_key(scope):
+    return f"report:version:{scope}"
+
+
+def new_version():
+    # Versões aleatórias em vez de contador: se a chave da versão for descartada pelo cache,
+    # a nova versão nunca coincide com entradas antigas
+    return uuid.uuid4().hex[:12]
+
+
+def month_scope(date):
+    return f"{ORGANIZATION_SCOPE}:{date:%Y-%m}"
+
+
+def period_months(start_date, end_date):
+    year, month = start_date.year, start_date.month
+    while (year, month) <= (end_date.year, end_date.month):
+        yield start_date.replace(year=year, month=month, day=1)
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def data_versions(scopes):
+    cache = get_report_cache()
+    keys = [version_key(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        for key in missing:
+            cache.add(key, new_version(), None)
+        versions.update(cache.get_many(missing))
+    return [versions.get(key) for key in keys]
+
+
+def report_scopes(scope, start_date, end_date):
+    if scope == ORGANIZATION_SCOPE:
+        return [ORGANIZATION_SCOPE, *(month_scope(month) for month in period_months(start_date, end_date))]
+    return [scope]
+
+
+def bump_data_versions(scopes):
+    get_report_cache().set_many({version_key(scope): new_version() for scope in scopes}, None)
+
+
+def invalidate_reports(user_ids, dates=None):
+    """Invalida os relatórios dos usuários e os gerais quando a transação corrente confirmar.
+
+    Com dates, só os meses dessas datas no relatório geral; sem, todos (mudança de cadastro).
+    """
+    if settings.REPORT_CACHE_TIMEOUT <= 0 or not user_ids:
+        return
+    scopes = set(user_ids)
+    if dates is None:
+        scopes.add(ORGANIZATION_SCOPE)
+    else:
+        scopes.update(month_scope(date) for date in dates)
+    transaction.on_commit(lambda: bump_data_versions(scopes))
+
+
+def cached_report(scope, start_date, end_date, build, *extra):
+    if settings.REPORT_CACHE_TIMEOUT <= 0:
+        return build()
+    cache = get_report_cache()
+    # Um ano no relatório geral são 13 versões: resumidas num hash para a chave continuar curta
+    versions = hashlib.sha1(':'.join(data_versions(report_scopes(scope, start_date, end_date))).encode()).hexdigest()[:16]
+    key = ':'.join(str(part) for part in ('report', scope, start_date.isoformat(), end_date.isoformat(), *extra, versions))
+    report = cache.get(key)
+    if report is not None:
+        metrics.increment('chronos_report_cache_total', result='hit')
+        return report
+    metrics.increment('chronos_report_cache_total', result='miss')
+    report = build()
+    cache.set(key, report, settings.REPORT_CACHE_TIMEOUT)
+    return report
@@ -0,0 +1,184 @@
+# Motor dos relatórios de ponto (por usuário e geral dos funcionários).
+# Lê do resumo diário (AttendanceDay) apenas as colunas exibidas, numa única consulta ordenada,
+# e monta linhas da tabela, contagens e estatísticas numa só passada sobre DayRecords.
+from datetime import datetime, timedelta
+from django.db.models import Count, Q, Sum, Window
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .attendance_days import DayRecord, WORKED_STATUSES
+from .models import AttendanceDay, CustomUser
+from .report_cache import ORGANIZATION_SCOPE, cached_report
+
+# __week_day do Django: 1 = domingo ... 7 = sábado; faltas só contam de segunda a sexta
+WEEKDAYS = (2, 3, 4, 5, 6)
+
+DAY_COLUMNS = ('id', 'date', 'entrada', 'almoco', 'saida', 'punch_count', 'justification_count')
+
+
+def month_bounds(today):
+    start = today.replace(day=1)
+    if today.month == 12:
+        return start, today.replace(year=today.year + 1, month=1, day=1) - timedelta(days=1)
+    return start, today.replace(month=today.month + 1, day=1) - timedelta(days=1)
+
+
+def resolve_period(period, start_date_str=None, end_date_str=None):
+    """Converte o período da query string em (início, fim); ValueError para datas mal formatadas."""
+    if start_date_str and end_date_str:
+        return (
+            datetime.strptime(start_date_str, '%Y-%m-%d').date(),
+            datetime.strptime(end_date_str, '%Y-%m-%d').date(),
+        )
+
+    today = timezone.localdate()
+    if period == 'hoje':
+        return today, today
+    if period == 'semana':
+        # Semana de domingo a sábado
+        start = today - timedelta(days=(today.weekday() + 1) % 7)
+        return start, start + timedelta(days=6)
+    if period == 'ano':
+        return today.replace(month=1, day=1), today.replace(month=12, day=31)
+    # 'mes' e períodos inválidos
+    return month_bounds(today)
+
+
+class DayStats:
+    """Acumula as estatísticas do período em inteiros; horas só viram decimal em as_dict()."""
+
+    __slots__ = ('dias_trabalhados', 'worked_minutes', 'total_faltas', 'total_atrasos', 'total_pontos', 'total_justificativas')
+
+    def __init__(self):
+        self.dias_trabalhados = 0
+        self.worked_minutes = 0
+        self.total_faltas = 0
+        self.total_atrasos = 0
+        self.total_pontos = 0
+        self.total_justificativas = 0
+
+    def add(self, day):
+        self.total_justificativas += day.justification_count
+        if not day.punch_count:
+            return
+        self.total_pontos += day.punch_count
+        if day.status in WORKED_STATUSES:
+            self.dias_trabalhados += 1
+            self.worked_minutes += day.worked_minutes
+        if day.status == 'Atraso':
+            self.total_atrasos += 1
+        elif day.status == 'Falta' and day.date.weekday() < 5:
+            self.total_faltas += 1
+
+    def as_dict(self):
+        return {
+            'dias_trabalhados': self.dias_trabalhados,
+            'total_pontos_registrados': self.total_pontos,
+            'total_justificativas': self.total_justificativas,
+            'horas_trabalhadas_total': round(self.worked_minutes / 60, 1),
+            'total_faltas': self.total_faltas,
+            'total_atrasos': self.total_atrasos,
+        }
+
+
+def attendance_report_days(user_id, start_date, end_date):
+    """Linhas diárias, total de batidas e estatísticas do período em uma consulta e uma passada."""
+    rows = (
+        AttendanceDay.objects.filter(user_id=user_id, date__gte=start_date, date__lte=end_date)
+        .order_by('-date')
+        .values_list(*DAY_COLUMNS)
+    )
+
+    attendance_data = []
+    stats = DayStats()
+    for day_id, *columns in rows:
+        day = DayRecord.from_summary(*columns)
+        stats.add(day)
+        # Dia só com justificativa: conta nas justificativas, não aparece na tabela
+        if day.punch_count:
+            attendance_data.append(day.serialize(day_id))
+
+    return {
+        'total_attendances': stats.total_pontos,
+        'attendances': attendance_data,
+        'stats': stats.as_dict(),
+    }
+
+
+def build_attendance_report(user, start_date, end_date):
+    # Os dados do usuário ficam fora do cache: só as batidas versionam o relatório
+    report = cached_report(user.id, start_date, end_date, lambda: attendance_report_days(user.id, start_date, end_date))
+    return {
+        'user': user.username,
+        'total_attendances': report['total_attendances'],
+        'attendances': report['attendances'],
+        'stats': {
+            **report['stats'],
+            'cpf': user.cpf or 'N/A',
+            'role': user.role or 'N/A',
+        },
+    }
+
+
+def organization_report_rows(start_date, end_date):
+    """Totais do período por funcionário, agregados no banco a partir do resumo diário.
+
+    O resumo já está agrupado por usuário e data local (America/Sao_Paulo), então um único
+    GROUP BY usuário basta; o total de funcionários vem na mesma consulta via COUNT(*) OVER ().
+    """
+    in_period = Q(attendance_days__date__gte=start_date, attendance_days__date__lte=end_date)
+    punched = in_period & Q(attendance_days__punch_count__gt=0)
+    return (
+        CustomUser.objects.filter(is_active=True)
+        .values('id', 'username', 'cpf', 'role')
+        .annotate(
+            dias_trabalhados=Count('attendance_days', filter=punched & Q(attendance_days__status__in=WORKED_STATUSES)),
+            worked_seconds=Coalesce(Sum('attendance_days__worked_seconds', filter=punched), 0),
+            total_faltas=Count('attendance_days', filter=punched & Q(attendance_days__status='Falta', attendance_days__date__week_day__in=WEEKDAYS)),
+            total_atrasos=Count('attendance_days', filter=punched & Q(attendance_days__status='Atraso')),
+            total_pontos=Coalesce(Sum('attendance_days__punch_count', filter=in_period), 0),
+            total_justificativas=Coalesce(Sum('attendance_days__justification_count', filter=in_period), 0),
+            total_funcionarios=Window(Count('*')),
+        )
+        .order_by('username', 'id')
+    )
+
+
+def organization_report_page(start_date, end_date, page, page_size):
+    offset = (page - 1) * page_size
+    rows = list(organization_report_rows(start_date, end_date)[offset:offset + page_size])
+    if rows:
+        count = rows[0]['total_funcionarios']
+    else:
+        # Página além do fim: o total não veio na consulta
+        count = CustomUser.objects.filter(is_active=True).count() if offset else 0
+
+    results = [
+        {
+            'user_id': row['id'],
+            'user': row['username'],
+            'cpf': row['cpf'] or 'N/A',
+            'role': row['role'] or 'N/A',
+            'dias_trabalhados': row['dias_trabalhados'],
+            'total_pontos_registrados': row['total_pontos'],
+            'total_justificativas': row['total_justificativas'],
+            'horas_trabalhadas_total': round(row['worked_seconds'] / 3600, 1),
+            'total_faltas': row['total_faltas'],
+            'total_atrasos': row['total_atrasos'],
+        }
+        for row in rows
+    ]
+    return {
+        'count': count,
+        'page': page,
+        'page_size': page_size,
+        'num_pages': (count + page_size - 1) // page_size,
+        'results': results,
+    }
+
+
+def build_organization_report(start_date, end_date, page, page_size):
+    return cached_report(
+        ORGANIZATION_SCOPE, start_date, end_date,
+        lambda: organization_report_page(start_date, end_date, page, page_size),
+        page, page_size,
+    )
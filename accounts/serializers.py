@@ -3,6 +3,7 @@ from .models import CustomUser, Attendance, Justification, JustificationApproval
 from django.core.files.uploadedfile import InMemoryUploadedFile
 import logging
 from .services import process_face_image_and_get_embedding
+from .matching import notify_embedding_changed
 
 logger = logging.getLogger(__name__)
 
@@ -18,7 +19,7 @@ class RegisterSerializer(serializers.ModelSerializer):
         fields = ['id', 'username', 'email', 'password', 'confirm_password', 'phone_number', 'cpf', 'face_image', 'role']  
     
     def validate(self, attrs):
-        if attrs['password'] != attrs['confirm_password']:
+        if attrs.get('password') != attrs.get('confirm_password'):
             raise serializers.ValidationError({"password": "As senhas não coincidem."})
         return attrs
 
@@ -39,6 +40,25 @@ class RegisterSerializer(serializers.ModelSerializer):
             facial_embedding=embedding.tolist(),
             role=validated_data.get('role', UserRole.USER.value)  
         )
+        notify_embedding_changed(user.id, embedding)
+        return user
+
+    def update(self, instance, validated_data):
+        face_image = validated_data.pop('face_image', None)
+        validated_data.pop('confirm_password', None)
+        password = validated_data.pop('password', None)
+        embedding = None
+        if face_image is not None:
+            try:
+                embedding = process_face_image_and_get_embedding(face_image)
+            except ValueError as e:
+                raise serializers.ValidationError(str(e))
+            instance.facial_embedding = embedding.tolist()
+        if password:
+            instance.set_password(password)
+        user = super().update(instance, validated_data)
+        if embedding is not None:
+            notify_embedding_changed(user.id, embedding)
         return user
 
 class LoginSerializer(serializers.Serializer):
@@ -58,12 +78,19 @@ class AttendanceSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Attendance
-        fields = ['id', 'user', 'user_detail', 'point_type', 'data_hora', 'foto_path', 'is_synced']
-        read_only_fields = ['id', 'data_hora', 'foto_path', 'user_detail']
+        fields = ['id', 'user', 'user_detail', 'point_type', 'data_hora', 'foto_path', 'foto_thumb', 'is_synced']
+        read_only_fields = ['id', 'data_hora', 'foto_path', 'foto_thumb', 'user_detail']
         extra_kwargs = {
             'point_type': {'required': True, 'validators': []},
         }
 
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Projeção das listagens (?fields=): remove os campos não pedidos
+        if fields is not None:
+            for name in set(self.fields) - {'user', *fields}:
+                self.fields.pop(name)
+
     def validate_point_type(self, value):
         valid_types = ['entrada', 'almoco', 'saida']
         if value not in valid_types:
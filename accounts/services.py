@@ -1,228 +1,104 @@
-from django.utils import timezone
-from collections import defaultdict
-from datetime import datetime, timedelta
-from accounts.models import Attendance, Justification
-import face_recognition
-import numpy as np
-import logging
-from PIL import Image
 import os
 from django.core.files.storage import default_storage
+from django.conf import settings
+from .matching import get_match_backend, verify_user
+from .face_encoding import encode_face
+from .recognition_pool import run_in_recognition_pool, RecognitionUnavailable
+from .embedding_cache import embedding_cache, embedding_cache_key
+from . import metrics
+from .logs import get_event_logger
+import time
+import uuid
 
-logger = logging.getLogger(__name__)
-
-def filter_attendances_by_period(user, period, start_date=None, end_date=None):
-    today = timezone.now().date()
-    attendances = Attendance.objects.filter(user=user).order_by('-data_hora')
-
-    if start_date and end_date:
-        return attendances.filter(data_hora__date__gte=start_date, data_hora__date__lte=end_date)
-
-    if period == 'hoje':
-        return attendances.filter(data_hora__date=today)
-    elif period == 'semana':
-        week_start = today - timezone.timedelta(days=today.weekday())
-        return attendances.filter(data_hora__date__gte=week_start, data_hora__date__lte=today)
-    elif period == 'mes':
-        return attendances.filter(data_hora__date__gte=today.replace(day=1))
-    elif period == 'ano':
-        return attendances.filter(data_hora__year=today.year)
-    return attendances
-
-def group_attendances_by_date(attendances):
-    attendance_dict = defaultdict(list)
-    for attendance in attendances:
-        date_str = attendance.data_hora.astimezone(timezone.get_current_timezone()).strftime('%d/%m/%Y')
-        attendance_dict[date_str].append(attendance)
-
-    attendance_data = []
-    for date_str, atts in attendance_dict.items():
-        day_data = {'id': str(atts[0].id), 'date': date_str}
-        
-        for att in atts:
-            time_str = att.data_hora.astimezone(timezone.get_current_timezone()).strftime('%H:%M')
-            if att.point_type == 'entrada':
-                day_data['entrada'] = time_str
-            elif att.point_type == 'almoco':
-                day_data['entrada_almoco'] = time_str
-                day_data['saida_almoco'] = time_str
-            elif att.point_type == 'saida':
-                day_data['saida'] = time_str
-        
-        day_data.setdefault('entrada', '-')
-        day_data.setdefault('entrada_almoco', '-')
-        day_data.setdefault('saida_almoco', '-')
-        day_data.setdefault('saida', '-')
-        
-        day_data['status'] = calculate_day_status(day_data)
-        day_data['observacao'] = ''
-        attendance_data.append(day_data)
-
-    return attendance_data
-
-def calculate_day_status(day_data):
-    entrada = day_data.get('entrada', '-')
-    saida = day_data.get('saida', '-')
-    
-    if entrada == '-':
-        return 'Falta'
-    
-    if saida == '-':
-        return 'Pendente'
-    
-    try:
-        entrada_time = datetime.strptime(entrada, '%H:%M').time()
-        horario_limite = datetime.strptime('07:00', '%H:%M').time()
-        
-        if entrada_time > horario_limite:
-            return 'Atraso'
-    except ValueError:
-        pass
-    
-    return 'Aprovado'
-
-def calculate_stats(user, attendance_data, total_justificativas, total_pontos_registrados):
-    total_hours = 0
-    total_faltas = 0
-    total_atrasos = 0
-    
-    first_attendance_date = None
-    if attendance_data:
-        sorted_attendance = sorted(attendance_data, key=lambda x: datetime.strptime(x['date'], '%d/%m/%Y'))
-        
-        for day in sorted_attendance:
-            if (day.get('entrada', '-') != '-' or 
-                day.get('saida', '-') != '-' or 
-                day.get('entrada_almoco', '-') != '-'):
-                first_attendance_date = datetime.strptime(day['date'], '%d/%m/%Y').date()
-                break
-    
-    if not first_attendance_date:
-        return {
-            'dias_trabalhados': 0,
-            'total_pontos_registrados': total_pontos_registrados,
-            'total_justificativas': total_justificativas,
-            'horas_trabalhadas_total': 0,
-            'total_faltas': 0,
-            'total_atrasos': 0,
-        }
-    
-    print(f"Primeira data com ponto batido: {first_attendance_date}")
-    
-    
-    dias_com_presenca = 0
-    total_faltas = 0
-
-    for day in attendance_data:
-        status = day.get('status', '')
-        day_date = datetime.strptime(day['date'], '%d/%m/%Y').date()
-        
-        if day_date.weekday() < 5 and status == 'Falta':
-            total_faltas += 1
-        
-        if status == 'Atraso':
-            total_atrasos += 1
-        
-        if status in ['Aprovado', 'Atraso']:
-            dias_com_presenca += 1
-            try:
-                if day['entrada'] != '-' and day['saida'] != '-':
-                    entrada_str = day['entrada']
-                    saida_str = day['saida']
-                    
-                    entrada = datetime.strptime(entrada_str, '%H:%M')
-                    saida = datetime.strptime(saida_str, '%H:%M')
-                    
-                    if saida.time() < entrada.time():
-                        saida = saida + timezone.timedelta(days=1)
-                    
-                    almoco_duration = timezone.timedelta(hours=0)
-                    almoco_in = day.get('entrada_almoco', '-')
-                    almoco_out = day.get('saida_almoco', '-')
-                    
-                    if almoco_in and almoco_in != '-' and almoco_out and almoco_out != '-':
-                        try:
-                            almoco_in_dt = datetime.strptime(almoco_in, '%H:%M')
-                            almoco_out_dt = datetime.strptime(almoco_out, '%H:%M')
-                            
-                            if almoco_out_dt.time() >= almoco_in_dt.time():
-                                almoco_duration = almoco_out_dt - almoco_in_dt
-                            else:
-                                almoco_out_dt = almoco_out_dt + timezone.timedelta(days=1)
-                                almoco_duration = almoco_out_dt - almoco_in_dt
-                        except ValueError:
-                            almoco_duration = timezone.timedelta(hours=1)
-                    else:
-                        almoco_duration = timezone.timedelta(hours=1)
-                    
-                    work_duration = saida - entrada - almoco_duration
-                    
-                    if work_duration.total_seconds() > 0:
-                        hours_worked = work_duration.total_seconds() / 3600
-                        total_hours += hours_worked
-                        print(f"Dia {day['date']}: {hours_worked:.2f} horas")
-                    else:
-                        print(f"Dia {day['date']}: Duração inválida, ignorando")
-                        
-            except (ValueError, TypeError) as e:
-                print(f"Erro ao calcular horas para o dia {day.get('date', '?')}: {e}")
-                continue
-    
-    total_faltas = max(0, total_faltas) 
-    
-    print(f"Resumo: {total_hours:.1f}h trabalhadas, {total_faltas} faltas, {total_atrasos} atrasos")
+logger = get_event_logger(__name__)
 
+def get_face_encoding_options():
+    # Etapa de pré-processamento: redução da imagem, detector e parâmetros do codificador
     return {
-        'dias_trabalhados': dias_com_presenca, 
-        'total_pontos_registrados': total_pontos_registrados, 
-        'total_justificativas': total_justificativas,
-        'horas_trabalhadas_total': round(total_hours, 1), 
-        'total_faltas': total_faltas,
-        'total_atrasos': total_atrasos,
+        'max_edge': settings.FACE_MAX_IMAGE_EDGE,
+        'detector': settings.FACE_DETECTOR_MODEL,
+        'upsample': settings.FACE_DETECTION_UPSAMPLE,
+        'num_jitters': settings.FACE_NUM_JITTERS,
+        'encoder_model': settings.FACE_ENCODER_MODEL,
     }
 
-def process_face_image_and_get_embedding(face_image):
+def validate_face_image_extension(face_image):
     allowed_extensions = {'.jpg', '.jpeg', '.png'}
     file_extension = os.path.splitext(face_image.name.lower())[1]
     if file_extension not in allowed_extensions:
         raise ValueError('Formato de imagem não suportado. Use .jpg, .jpeg ou .png')
 
+def read_face_image(face_image):
+    # Uma única leitura do upload; o mesmo buffer serve ao cache, ao reconhecimento e à foto gravada
+    face_image.seek(0)
+    data = face_image.read()
+    face_image.seek(0)
+    return data
+
+def run_inline(fn, *args):
+    return fn(*args)
+
+def process_face_image_and_get_embedding(face_image, use_pool=True):
+    validate_face_image_extension(face_image)
+    with metrics.timed('upload_read'):
+        data = read_face_image(face_image)
+    return embed_face_data(data, face_image.name, use_pool=use_pool)
+
+def embed_face_data(data, name, use_pool=True):
+    """Codifica o rosto a partir dos bytes já lidos da imagem.
+
+    Só o reconhecimento ocupa o pool: a foto da batida é gerada depois do commit (accounts/photos.py).
+    """
     try:
-        img = Image.open(face_image)
-        img.verify()
-        img.close()
-        image = face_recognition.load_image_file(face_image, mode='RGB')
-        logger.info(f"Processando imagem: {face_image.name}, tamanho: {face_image.size} bytes")
-        encodings = face_recognition.face_encodings(image)
-        if not encodings:
-            raise ValueError("Nenhum rosto detectado na imagem.")
-        embedding = encodings[0]
-        logger.info(f"Embedding gerado com sucesso: {embedding.tolist()}")
+        options = get_face_encoding_options()
+        cache_key = embedding_cache_key(data, options)
+        embedding = embedding_cache.get(cache_key)
+        if embedding is not None:
+            metrics.increment('chronos_embedding_cache_total', result='hit')
+            logger.debug('face.cache_hit', 'Embedding obtido do cache para {name}', name=name)
+            return embedding
+        metrics.increment('chronos_embedding_cache_total', result='miss')
+
+        # Os workers da fila assíncrona já são processos dedicados e codificam sem o pool
+        runner = run_in_recognition_pool if use_pool else run_inline
+        started = time.perf_counter()
+        embedding, timings = runner(encode_face, data, options)
+        if use_pool:
+            # O que sobra do tempo total além das etapas é espera na fila do pool (mais o IPC)
+            metrics.observe('chronos_queue_wait_seconds', max(0.0, time.perf_counter() - started - sum(timings.values())), queue='recognition_pool')
+        metrics.observe_stages(timings)
+        embedding_cache.set(cache_key, embedding)
+        logger.info(
+            'face.encoded', 'Imagem {name} codificada', name=name, size=len(data),
+            **{f"{stage}_ms": round(seconds * 1000, 1) for stage, seconds in timings.items()},
+        )
+        logger.payload('face.embedding', lambda: embedding.tolist(), name=name)
         return embedding
+    except RecognitionUnavailable:
+        metrics.increment('chronos_recognition_rejected_total')
+        raise
     except Exception as e:
-        logger.error(f"Erro ao processar imagem facial: {str(e)}")
+        metrics.increment('chronos_face_errors_total', reason='no_face' if 'Nenhum rosto' in str(e) else 'invalid_image')
+        logger.error('face.error', 'Erro ao processar imagem facial: {error}', name=name, error=str(e))
         raise ValueError(f"Erro ao processar imagem facial: {str(e)}")
 
-def find_matching_user(login_embedding, User):
-    min_distance = float('inf')
-    matched_user = None
-    for u in User.objects.all():
-        if u.facial_embedding is not None:
-            db_embedding = np.array(u.facial_embedding)
-            distance = face_recognition.face_distance([db_embedding], login_embedding)[0]
-            logger.info(f"Comparando com usuário {u.username}, distância: {distance}")
-            if distance < min_distance:
-                min_distance = distance
-                matched_user = u
+def find_matching_user(login_embedding, User, backend=None):
+    match = get_match_backend(backend)
+    matched_user, min_distance = match(login_embedding, User)
     return matched_user, min_distance
 
-def save_attendance_photo(face_image):
-    file_path = f"attendance/photos/{timezone.now().strftime('%Y%m%d_%H%M%S')}_{face_image.name}"
+def verify_matching_user(login_embedding, user):
+    return verify_user(login_embedding, user)
+
+def store_attendance_photo(face_image):
+    # Upload original guardado para a fila assíncrona; nome único para batidas simultâneas
+    file_path = f"attendance/incoming/{uuid.uuid4().hex}{os.path.splitext(face_image.name.lower())[1]}"
     try:
-        default_storage.save(file_path, face_image)
-        logger.info(f"Arquivo salvo em: {file_path}")
-        full_path = default_storage.url(file_path)
-        return full_path
+        with metrics.timed('photo_save'):
+            saved_path = default_storage.save(file_path, face_image)
+        logger.debug('photo.saved', 'Arquivo salvo em: {path}', path=saved_path)
+        return saved_path
     except Exception as e:
-        logger.error(f"Erro ao salvar arquivo: {str(e)}")
+        logger.error('photo.error', 'Erro ao salvar arquivo: {error}', error=str(e))
         raise IOError("Erro ao salvar imagem")
+
@@ -0,0 +1,63 @@
+# Mantém o resumo diário (AttendanceDay) em sincronia com batidas, justificativas e aprovações.
+# Os receptores rodam na mesma transação da alteração que os disparou.
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from .attendance_days import refresh_attendance_days
+from .models import Attendance, CustomUser, Justification, JustificationApproval
+from .report_cache import invalidate_reports
+
+
+def _previous_day(sender, instance, user_field, date_field):
+    if not instance.pk:
+        return None
+    return sender.objects.filter(pk=instance.pk).values_list(user_field, date_field).first()
+
+
+@receiver(pre_save, sender=Attendance)
+def remember_attendance_day(sender, instance, **kwargs):
+    # Edições que mudam a data ou o usuário também precisam recalcular o dia antigo
+    instance._previous_day = _previous_day(sender, instance, 'user_id', 'data_local')
+
+
+@receiver(pre_save, sender=Justification)
+def remember_justification_day(sender, instance, **kwargs):
+    instance._previous_day = _previous_day(sender, instance, 'user_id', 'date')
+
+
+@receiver(post_save, sender=Attendance)
+def attendance_saved(sender, instance, **kwargs):
+    refresh_attendance_days({(instance.user_id, instance.data_local), getattr(instance, '_previous_day', None) or (None, None)})
+
+
+@receiver(post_save, sender=Justification)
+def justification_saved(sender, instance, **kwargs):
+    refresh_attendance_days({(instance.user_id, instance.date), getattr(instance, '_previous_day', None) or (None, None)})
+
+
+@receiver(post_delete, sender=Attendance)
+@receiver(post_delete, sender=Justification)
+def day_source_deleted(sender, instance, origin=None, **kwargs):
+    # Na exclusão de um usuário o próprio resumo é removido em cascata
+    if isinstance(origin, CustomUser):
+        return
+    date = instance.data_local if sender is Attendance else instance.date
+    refresh_attendance_days({(instance.user_id, date)})
+
+
+@receiver(post_save, sender=JustificationApproval)
+@receiver(post_delete, sender=JustificationApproval)
+def approval_changed(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, (CustomUser, Justification)):
+        return
+    justification = Justification.objects.filter(pk=instance.justification_id).values_list('user_id', 'date').first()
+    if justification:
+        refresh_attendance_days({justification})
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def user_changed(sender, instance, update_fields=None, **kwargs):
+    # Nome, CPF, cargo e ativo aparecem no relatório geral; o login (last_login) não altera nada
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    invalidate_reports({instance.pk})
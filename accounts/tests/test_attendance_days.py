@@ -0,0 +1,95 @@
+from datetime import date, datetime
+from django.test import TestCase
+from django.utils import timezone
+from accounts.attendance_days import DayRecord, refresh_attendance_days
+from accounts.models import Attendance, AttendanceDay, CustomUser, Justification
+
+
+def local(day, hour, minute=0):
+    return timezone.make_aware(datetime(day.year, day.month, day.day, hour, minute))
+
+
+class DayRecordTests(TestCase):
+    day = date(2025, 7, 7)
+
+    def test_on_time_full_day(self):
+        record = DayRecord(self.day, entrada=7 * 60, almoco=12 * 60, saida=16 * 60)
+        self.assertEqual(record.status, 'Aprovado')
+        self.assertEqual(record.worked_minutes, 9 * 60)
+
+    def test_missing_lunch_deducts_default_hour(self):
+        record = DayRecord(self.day, entrada=6 * 60, saida=15 * 60)
+        self.assertEqual(record.status, 'Aprovado')
+        self.assertEqual(record.worked_minutes, 8 * 60)
+
+    def test_late_entry_still_counts_hours(self):
+        record = DayRecord(self.day, entrada=7 * 60 + 1, almoco=12 * 60, saida=16 * 60)
+        self.assertEqual(record.status, 'Atraso')
+        self.assertTrue(record.is_late)
+        self.assertEqual(record.worked_minutes, 16 * 60 - (7 * 60 + 1))
+
+    def test_pending_and_absent_days_have_no_hours(self):
+        pending = DayRecord(self.day, entrada=6 * 60)
+        absent = DayRecord(self.day, saida=17 * 60)
+        self.assertEqual((pending.status, pending.worked_minutes), ('Pendente', 0))
+        self.assertEqual((absent.status, absent.worked_minutes), ('Falta', 0))
+
+    def test_exit_after_midnight(self):
+        record = DayRecord(self.day, entrada=6 * 60, almoco=12 * 60, saida=30)
+        self.assertEqual(record.worked_minutes, 24 * 60 + 30 - 6 * 60)
+
+    def test_from_punches_keeps_first_punch_of_each_type(self):
+        punches = [
+            ('entrada', local(self.day, 6, 50)),
+            ('entrada', local(self.day, 6, 40)),
+            ('saida', local(self.day, 16, 0)),
+        ]
+        record = DayRecord.from_punches(self.day, punches, justifications=[True, False, None])
+        self.assertEqual(record.entrada, 6 * 60 + 40)
+        self.assertIsNone(record.almoco)
+        self.assertEqual(record.punch_count, 3)
+        self.assertEqual(record.justification_count, 3)
+        self.assertEqual(record.approved_justification_count, 1)
+
+
+class RefreshAttendanceDaysTests(TestCase):
+    day = date(2025, 7, 7)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(username='ana', email='ana@example.com', password='senha123')
+
+    def test_punches_upsert_summary(self):
+        Attendance.objects.create(user=self.user, point_type='entrada', data_hora=local(self.day, 6, 55))
+        summary = AttendanceDay.objects.get(user=self.user, date=self.day)
+        self.assertEqual((summary.status, summary.punch_count), ('Pendente', 1))
+
+        Attendance.objects.create(user=self.user, point_type='saida', data_hora=local(self.day, 16, 0))
+        summary.refresh_from_db()
+        self.assertEqual((summary.status, summary.punch_count), ('Aprovado', 2))
+        self.assertEqual(summary.worked_seconds, (16 * 60 - (6 * 60 + 55) - 60) * 60)
+        self.assertEqual(AttendanceDay.objects.filter(user=self.user).count(), 1)
+
+    def test_day_without_sources_is_deleted(self):
+        attendance = Attendance.objects.create(user=self.user, point_type='entrada', data_hora=local(self.day, 7, 30))
+        self.assertTrue(AttendanceDay.objects.filter(user=self.user, date=self.day).exists())
+
+        attendance.delete()
+        self.assertFalse(AttendanceDay.objects.filter(user=self.user, date=self.day).exists())
+
+    def test_justification_only_day(self):
+        Justification.objects.create(user=self.user, date=self.day, reason='Consulta médica')
+        summary = AttendanceDay.objects.get(user=self.user, date=self.day)
+        self.assertEqual((summary.punch_count, summary.justification_count, summary.status), (0, 1, 'Falta'))
+
+    def test_moving_a_punch_refreshes_both_days(self):
+        attendance = Attendance.objects.create(user=self.user, point_type='entrada', data_hora=local(self.day, 6, 0))
+        next_day = date(2025, 7, 8)
+        attendance.data_hora = local(next_day, 6, 0)
+        attendance.save()
+        self.assertEqual(list(AttendanceDay.objects.filter(user=self.user).values_list('date', flat=True)), [next_day])
+
+    def test_refresh_ignores_incomplete_keys(self):
+        self.assertEqual(refresh_attendance_days({(None, self.day), (self.user.id, None)}), 0)
+        self.assertEqual(refresh_attendance_days({(self.user.id, self.day)}), 0)
+        self.assertFalse(AttendanceDay.objects.exists())
@@ -0,0 +1,20 @@
+from django.test import SimpleTestCase
+from accounts.attendance_days import format_minute
+from accounts.exports import safe_cell, stream_csv
+
+
+class SafeCellTests(SimpleTestCase):
+    def test_formulas_are_escaped(self):
+        for value in ('=1+1', '@SUM(A1)', '+cmd|x', '-2+3', '\t=1', '='):
+            self.assertEqual(safe_cell(value), f"'{value}")
+
+    def test_empty_time_placeholder_is_kept(self):
+        self.assertEqual(safe_cell(format_minute(None)), '-')
+
+    def test_plain_values_are_kept(self):
+        for value in ('ana', '123.456.789-00', '-1.5', '+10', 7, 8.5, None):
+            self.assertEqual(safe_cell(value), value)
+
+    def test_csv_rows_are_escaped(self):
+        lines = list(stream_csv(['usuario', 'entrada'], [['=HYPERLINK("x")', '-']]))
+        self.assertEqual(lines[1], '"\'=HYPERLINK(""x"")",-\r\n')
@@ -0,0 +1,60 @@
+from datetime import timedelta
+from django.contrib.auth.models import AnonymousUser
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework import status
+from accounts.idempotency import claim_idempotency_key, release_idempotency_key, remember_response
+from accounts.models import CustomUser, PunchIdempotencyKey
+from accounts.punches import PunchError
+
+
+class IdempotencyKeyTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(username='ana', email='ana@example.com', password='senha123')
+        cls.other = CustomUser.objects.create_user(username='bia', email='bia@example.com', password='senha123')
+
+    def test_completed_key_replays_stored_response(self):
+        record, stored = claim_idempotency_key('chave-1', self.user)
+        self.assertIsNone(stored)
+        remember_response(record, {'message': 'ok'}, status.HTTP_201_CREATED)
+
+        replayed, stored = claim_idempotency_key('chave-1', self.user)
+        self.assertEqual(replayed.pk, record.pk)
+        self.assertEqual(stored, ({'message': 'ok'}, status.HTTP_201_CREATED))
+
+    def test_key_in_progress_conflicts(self):
+        claim_idempotency_key('chave-2', self.user)
+        with self.assertRaises(PunchError) as raised:
+            claim_idempotency_key('chave-2', self.user)
+        self.assertEqual(raised.exception.status_code, status.HTTP_409_CONFLICT)
+
+    def test_keys_are_scoped_per_principal(self):
+        record, _ = claim_idempotency_key('chave-3', self.user)
+        remember_response(record, {'message': 'ok'}, status.HTTP_201_CREATED)
+
+        other_record, stored = claim_idempotency_key('chave-3', self.other)
+        anonymous_record, anonymous_stored = claim_idempotency_key('chave-3', AnonymousUser())
+        self.assertIsNone(stored)
+        self.assertIsNone(anonymous_stored)
+        self.assertEqual(len({record.pk, other_record.pk, anonymous_record.pk}), 3)
+
+    def test_stale_processing_key_is_taken_over(self):
+        record, _ = claim_idempotency_key('chave-4', self.user)
+        PunchIdempotencyKey.objects.filter(pk=record.pk).update(created_at=timezone.now() - timedelta(hours=1))
+
+        retaken, stored = claim_idempotency_key('chave-4', self.user)
+        self.assertEqual(retaken.pk, record.pk)
+        self.assertIsNone(stored)
+
+    def test_released_key_can_be_claimed_again(self):
+        record, _ = claim_idempotency_key('chave-5', self.user)
+        release_idempotency_key(record)
+        _, stored = claim_idempotency_key('chave-5', self.user)
+        self.assertIsNone(stored)
+
+    def test_invalid_key(self):
+        with self.assertRaises(PunchError):
+            claim_idempotency_key('  ', self.user)
+        with self.assertRaises(PunchError):
+            claim_idempotency_key('x' * 200, self.user)
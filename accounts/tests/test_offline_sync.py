@@ -0,0 +1,81 @@
+from datetime import datetime
+from unittest import mock
+from django.test import TestCase
+from django.utils import timezone
+from accounts.models import Attendance, AttendanceDay, CustomUser
+from accounts.offline_sync import sync_punches
+import base64
+
+
+def encoded(data):
+    return base64.b64encode(data).decode()
+
+
+def fake_encode(data, options=None):
+    if data == b'sem-rosto':
+        return None, 'Nenhum rosto detectado na imagem.'
+    return [0.0] * 128, None
+
+
+@mock.patch('accounts.offline_sync.schedule_attendance_photo', return_value=('attendance/photos/x.webp', 'attendance/thumbs/x.webp'))
+@mock.patch('accounts.offline_sync.embedding_cache')
+@mock.patch('accounts.offline_sync.try_encode_face', side_effect=fake_encode)
+class SyncPunchesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_user(username='admin', email='admin@example.com', password='senha123', role='admin')
+        cls.user = CustomUser.objects.create_user(username='ana', email='ana@example.com', password='senha123')
+
+    def setUp(self):
+        self.captured_at = timezone.make_aware(datetime(2025, 7, 7, 6, 55)).isoformat()
+
+    def item(self, client_id, point_type='entrada', photo=b'rosto', **extra):
+        return {
+            'client_id': client_id,
+            'point_type': point_type,
+            'captured_at': self.captured_at,
+            'photo': encoded(photo),
+            'filename': f"{client_id}.jpg",
+            **extra,
+        }
+
+    def sync(self, items):
+        with mock.patch('accounts.offline_sync.match_punch', return_value=(self.user, 0.2)):
+            return sync_punches(items, self.admin, 'identify')
+
+    def test_partial_failure_keeps_valid_items(self, encode, cache, schedule):
+        cache.get.return_value = None
+        items = [
+            self.item('k-1'),
+            {**self.item('k-2'), 'photo': '###'},
+            self.item('k-3', point_type='saida'),
+            self.item('k-1'),
+            self.item('k-5', photo=b'sem-rosto'),
+        ]
+        results = self.sync(items)
+
+        self.assertEqual([result['status'] for result in results], ['created', 'error', 'rejected', 'duplicate', 'error'])
+        self.assertEqual(results[2]['error'], 'Primeiro marque almoco')
+        attendance = Attendance.objects.get()
+        self.assertEqual((attendance.user, attendance.client_id, attendance.is_synced), (self.user, 'k-1', True))
+        self.assertEqual(results[0]['attendance_id'], attendance.id)
+        # bulk_create não dispara sinais: o resumo diário vem do refresh explícito
+        self.assertEqual(AttendanceDay.objects.get(user=self.user).punch_count, 1)
+
+    def test_resent_batch_reports_duplicates(self, encode, cache, schedule):
+        cache.get.return_value = None
+        first = self.sync([self.item('k-1')])
+        second = self.sync([self.item('k-1')])
+
+        self.assertEqual(second[0]['status'], 'duplicate')
+        self.assertEqual(second[0]['attendance_id'], first[0]['attendance_id'])
+        self.assertEqual(Attendance.objects.count(), 1)
+
+    def test_unmatched_face_is_rejected_with_justification(self, encode, cache, schedule):
+        cache.get.return_value = None
+        with mock.patch('accounts.offline_sync.match_punch', return_value=(None, 0.9)):
+            results = sync_punches([self.item('k-1')], self.admin, 'identify')
+
+        self.assertEqual(results[0]['status'], 'rejected')
+        self.assertFalse(Attendance.objects.exists())
+        schedule.assert_not_called()
@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from accounts.models import Attendance, CustomUser
+from accounts.pagination import KeysetPagination
+
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.instant = timezone.make_aware(datetime(2025, 7, 7, 8, 0))
+        users = [CustomUser.objects.create_user(username=f"user{index}", email=f"user{index}@example.com", password='senha123') for index in range(4)]
+        # Quatro batidas no mesmo instante (empate em data_hora) e duas anteriores
+        for user in users:
+            Attendance.objects.create(user=user, point_type='entrada', data_hora=cls.instant)
+        for user in users[:2]:
+            Attendance.objects.create(user=user, point_type='entrada', data_hora=cls.instant - timedelta(days=1))
+
+    def paginate(self, **params):
+        request = Request(APIRequestFactory().get('/api/attendance/', params))
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(Attendance.objects.all(), request)
+        return paginator, page
+
+    def test_cursor_round_trip(self):
+        paginator = KeysetPagination()
+        cursor = paginator.encode_cursor(self.instant, 42)
+        self.assertEqual(paginator.decode_cursor(cursor), (self.instant, 42))
+
+    def test_pages_cover_ties_without_gaps_or_repeats(self):
+        expected = list(Attendance.objects.order_by('-data_hora', '-id').values_list('id', flat=True))
+        seen = []
+        paginator, page = self.paginate(page_size=3)
+        while True:
+            seen.extend(attendance.id for attendance in page)
+            if paginator.next_cursor is None:
+                break
+            paginator, page = self.paginate(page_size=3, cursor=paginator.next_cursor)
+        self.assertEqual(seen, expected)
+
+    def test_last_page_has_no_next_link(self):
+        paginator, page = self.paginate(page_size=10)
+        self.assertEqual(len(page), 6)
+        self.assertIsNone(paginator.get_next_link())
+
+    def test_page_size_is_capped(self):
+        with self.settings(API_MAX_PAGE_SIZE=2):
+            paginator, page = self.paginate(page_size=1000)
+        self.assertEqual(len(page), 2)
+
+    def test_invalid_cursor(self):
+        with self.assertRaises(ValidationError):
+            self.paginate(cursor='nao-e-um-cursor')
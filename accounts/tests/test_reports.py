@@ -0,0 +1,33 @@
+from datetime import date
+from unittest import mock
+from django.test import SimpleTestCase
+from accounts.reports import month_bounds, resolve_period
+
+
+class ResolvePeriodTests(SimpleTestCase):
+    # Quarta-feira
+    today = date(2025, 7, 9)
+
+    def resolve(self, period, start=None, end=None):
+        with mock.patch('accounts.reports.timezone.localdate', return_value=self.today):
+            return resolve_period(period, start, end)
+
+    def test_named_periods(self):
+        self.assertEqual(self.resolve('hoje'), (self.today, self.today))
+        self.assertEqual(self.resolve('semana'), (date(2025, 7, 6), date(2025, 7, 12)))
+        self.assertEqual(self.resolve('mes'), (date(2025, 7, 1), date(2025, 7, 31)))
+        self.assertEqual(self.resolve('ano'), (date(2025, 1, 1), date(2025, 12, 31)))
+
+    def test_unknown_period_falls_back_to_month(self):
+        self.assertEqual(self.resolve('trimestre'), (date(2025, 7, 1), date(2025, 7, 31)))
+
+    def test_explicit_dates_win(self):
+        self.assertEqual(self.resolve('hoje', '2025-01-10', '2025-02-05'), (date(2025, 1, 10), date(2025, 2, 5)))
+
+    def test_invalid_dates(self):
+        with self.assertRaises(ValueError):
+            self.resolve('mes', '10/01/2025', '2025-02-05')
+
+    def test_month_bounds_across_year_end(self):
+        self.assertEqual(month_bounds(date(2025, 12, 15)), (date(2025, 12, 1), date(2025, 12, 31)))
+        self.assertEqual(month_bounds(date(2024, 2, 10)), (date(2024, 2, 1), date(2024, 2, 29)))
@@ -4,96 +4,170 @@ from rest_framework import status
 from django.contrib.auth import get_user_model
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.generics import ListCreateAPIView, ListAPIView
-from ..serializers import AttendanceSerializer, JustificationSerializer, AttendanceUsersSerializer
-from accounts.models import Attendance, Justification, JustificationApproval, CustomUser
-from django.utils import timezone
-import logging
-from ..services import filter_attendances_by_period, group_attendances_by_date, calculate_day_status, calculate_stats, process_face_image_and_get_embedding, find_matching_user, save_attendance_photo
-from collections import defaultdict
+from rest_framework.exceptions import ValidationError
+from ..serializers import AttendanceSerializer, AttendanceUsersSerializer
+from accounts.models import Attendance, CustomUser, PunchJob
+from django.conf import settings
+from django.urls import reverse
+from django.core.files.storage import default_storage
+from django.http import FileResponse, StreamingHttpResponse
+from ..services import embed_face_data, validate_face_image_extension, read_face_image
+from ..reports import resolve_period, build_attendance_report, build_organization_report
+from ..exports import EXPORT_KINDS, EXPORT_FORMATS, export_filename, export_rows, local_day_start, stream_csv, xlsx_available
+from ..pagination import KeysetPagination, requested_fields
+from ..photos import schedule_attendance_photo
+from .. import metrics
+from ..logs import get_event_logger
+from ..recognition_pool import RecognitionUnavailable
+from ..permission import AdminPermission, AttendanceKioskPermission
+from ..punches import VALID_POINT_TYPES, PunchError, resolve_match_mode, resolve_target_user, match_punch, complete_punch
+from ..punch_queue import enqueue_export, enqueue_punch, enqueue_sync
+from ..idempotency import claim_idempotency_key, remember_response, release_idempotency_key
+from ..offline_sync import load_batch
 from datetime import datetime, timedelta
 
-logger = logging.getLogger(__name__)
+logger = get_event_logger(__name__)
 User = get_user_model()
 
 class MarkAttendanceView(APIView):
-    permission_classes = [IsAuthenticated]
+    permission_classes = [AttendanceKioskPermission]
 
     def post(self, request):
-        logger.info(f"Requisição recebida: {request.FILES}, {request.data}, Content-Type: {request.headers.get('Content-Type')}")
         face_image = request.FILES.get('face_image')
+        logger.info(
+            'punch.received', user_id=request.user.id, point_type=request.data.get('point_type'),
+            size=getattr(face_image, 'size', None), content_type=request.content_type,
+        )
+        logger.payload('punch.request', lambda: {'files': list(request.FILES), 'data': {key: value for key, value in request.data.items() if key != 'face_image'}})
         if not face_image or not hasattr(face_image, 'name'):
-            logger.error(f"face_image inválido em request.FILES: {request.FILES}")
+            logger.warning('punch.invalid_upload', 'face_image inválido em request.FILES', files=list(request.FILES))
             return Response({'error': 'Imagem facial inválida ou ausente. Certifique-se do tipo de codificação no formulário.'}, status=status.HTTP_400_BAD_REQUEST)
         point_type = request.data.get('point_type', 'entrada')
 
         try:
-            login_embedding = process_face_image_and_get_embedding(face_image)
-        except ValueError as e:
-            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
-        except Exception as e:
-            logger.error(f"Erro ao processar imagem facial: {str(e)}")
-            return Response({'error': f'Erro ao processar imagem facial: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-        matched_user, min_distance = find_matching_user(login_embedding, User)
-
-        logger.info(f"Mínima distância encontrada: {min_distance}, usuário correspondente: {matched_user.username if matched_user else 'Nenhum'}")
-        if matched_user and min_distance < 0.5:
-            valid_types = ['entrada', 'almoco', 'saida']
-            if point_type not in valid_types:
-                return Response({'error': 'Tipo de ponto inválido'}, status=status.HTTP_400_BAD_REQUEST)
-
-            current_date = timezone.now().date()
-            logger.info(f"Data atual considerada: {current_date}")
-            all_attendances = Attendance.objects.filter(user=matched_user).order_by('data_hora')
-            registered_types = [a.point_type for a in all_attendances]
-            logger.info(f"Todos os tipos de ponto registrados para {matched_user.username}: {registered_types}")
-            next_index = valid_types.index(point_type) if point_type in valid_types else -1
-            if next_index > 0 and valid_types[next_index - 1] not in registered_types:
-                return Response({'error': f'Primeiro marque {valid_types[next_index - 1]}'}, status=status.HTTP_400_BAD_REQUEST)
-            if Attendance.objects.filter(user=matched_user, point_type=point_type, data_hora__date=current_date).exists():
-                return Response({'error': 'Tipo de ponto já registrado hoje'}, status=status.HTTP_400_BAD_REQUEST)
+            mode = resolve_match_mode(request.data.get('mode'))
+            target_user = resolve_target_user(request.user, mode, request.data.get('user_id'))
+            # Reenvio com a mesma Idempotency-Key: uma consulta indexada e a resposta original
+            idempotency_key = request.headers.get('Idempotency-Key')
+            record, stored = claim_idempotency_key(idempotency_key, request.user) if idempotency_key else (None, None)
+        except PunchError as e:
+            return Response({'error': e.message}, status=e.status_code)
+        if stored:
+            response_data, status_code = stored
+            return Response(response_data, status=status_code, headers={'Idempotent-Replayed': 'true'})
 
+        try:
+            response_data, status_code = self.punch(request, face_image, point_type, target_user)
+        except Exception:
+            if record:
+                release_idempotency_key(record)
+            raise
+        if record:
+            # 5xx são transitórios: libera a chave para que o quiosque possa tentar novamente
+            if status_code >= 500:
+                release_idempotency_key(record)
+            else:
+                remember_response(record, response_data, status_code)
+        return Response(response_data, status=status_code)
+
+    def punch(self, request, face_image, point_type, target_user):
+        async_requested = str(request.data.get('async', '')).lower() in ('1', 'true', 'yes')
+        if async_requested or settings.ATTENDANCE_ASYNC:
+            if point_type not in VALID_POINT_TYPES:
+                return {'error': 'Tipo de ponto inválido'}, status.HTTP_400_BAD_REQUEST
             try:
-                full_path = save_attendance_photo(face_image)
-            except IOError as e:
-                logger.error(f"Erro ao salvar arquivo: {str(e)}")
-                return Response({'error': 'Erro ao salvar imagem'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+                validate_face_image_extension(face_image)
+                job = enqueue_punch(face_image, point_type, target_user=target_user, requested_by=request.user)
+            except ValueError as e:
+                return {'error': str(e)}, status.HTTP_400_BAD_REQUEST
+            except IOError:
+                return {'error': 'Erro ao salvar imagem'}, status.HTTP_500_INTERNAL_SERVER_ERROR
+            return {
+                'ticket': str(job.ticket),
+                'status': job.status,
+                'status_url': request.build_absolute_uri(reverse('punch_job_status', args=[job.ticket])),
+            }, status.HTTP_202_ACCEPTED
 
-            attendance_data = {
-                'user': matched_user.id,
-                'point_type': point_type,
-                'foto_path': full_path,
-                'data_hora': timezone.now(),
-                'is_synced': False,
-            }
-            serializer = AttendanceSerializer(data=attendance_data)
-            if serializer.is_valid():
-                serializer.save()
-                logger.info(f"Registro de ponto bem-sucedido para {matched_user.username} - Tipo: {point_type}")
-                last_records = Attendance.objects.filter(user=matched_user).order_by('-data_hora')[:3]
-                response_data = {
-                    'full_name': f"{matched_user.first_name or ''} {matched_user.last_name or ''}".strip() or matched_user.username,
-                    'cpf': matched_user.cpf or "",
-                    'funcao': getattr(matched_user, 'funcao', "") or "",
-                    'matricula': getattr(matched_user, 'matricula', "") or "",
-                    'empresa': getattr(matched_user, 'empresa', "") or "",
-                    'date': attendance_data['data_hora'].date().isoformat(),
-                    'last_records': AttendanceSerializer(last_records, many=True).data
-                }
-                logger.info(f"Resposta enviada: {response_data}")
-                return Response(response_data, status=status.HTTP_200_OK)
-            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-        else:
-            justification_data = {
-                'user': matched_user.id if matched_user else None,
-                'reason': f"Falha no reconhecimento. Distância: {min_distance}",
-                'date': timezone.now().date()
-            }
-            justification_serializer = JustificationSerializer(data=justification_data)
-            if justification_serializer.is_valid():
-                justification_serializer.save()
-            logger.error(f"Falha no reconhecimento para usuário. Distância: {min_distance}")
-            return Response({'error': 'Rosto não corresponde ou nenhum usuário encontrado'}, status=status.HTTP_401_UNAUTHORIZED)
+        try:
+            validate_face_image_extension(face_image)
+            with metrics.timed('upload_read'):
+                data = read_face_image(face_image)
+            login_embedding = embed_face_data(data, face_image.name)
+        except RecognitionUnavailable as e:
+            return {'error': str(e.detail)}, e.status_code
+        except ValueError as e:
+            return {'error': str(e)}, status.HTTP_400_BAD_REQUEST
+        except Exception as e:
+            logger.error('punch.encode_error', 'Erro ao processar imagem facial: {error}', error=str(e))
+            return {'error': f'Erro ao processar imagem facial: {str(e)}'}, status.HTTP_500_INTERNAL_SERVER_ERROR
+
+        matched_user, min_distance = match_punch(login_embedding, target_user)
+        return complete_punch(matched_user, min_distance, point_type, lambda: schedule_attendance_photo(data))
+
+def can_read_job(user, job):
+    # Quiosque anônimo só lê tickets anônimos; usuários comuns, apenas os próprios
+    if user.is_authenticated and user.is_admin:
+        return True
+    return job.requested_by_id == (user.id if user.is_authenticated else None)
+
+class PunchJobStatusView(APIView):
+    permission_classes = [AttendanceKioskPermission]
+
+    def get(self, request, ticket):
+        job = PunchJob.objects.filter(ticket=ticket).first()
+        if job is None:
+            return Response({'error': 'Ticket não encontrado'}, status=status.HTTP_404_NOT_FOUND)
+        if not can_read_job(request.user, job):
+            return Response({'error': 'Sem permissão para consultar este ticket'}, status=status.HTTP_403_FORBIDDEN)
+
+        # Sem long-poll: segurar o worker síncrono esperando a fila recriaria o esgotamento de workers.
+        # Enquanto o trabalho não termina, Retry-After indica quando consultar de novo
+        headers = {}
+        if job.status in (PunchJob.STATUS_PENDING, PunchJob.STATUS_PROCESSING):
+            headers['Retry-After'] = str(settings.PUNCH_JOB_RETRY_AFTER)
+        return Response({
+            'ticket': str(job.ticket),
+            'status': job.status,
+            'status_code': job.status_code,
+            'result': job.result,
+            'created_at': job.created_at.isoformat(),
+            'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        }, status=status.HTTP_200_OK, headers=headers)
+
+class AttendanceSyncView(APIView):
+    permission_classes = [AttendanceKioskPermission]
+
+    def post(self, request):
+        # Lote de batidas offline: JSON (opcionalmente gzip) no corpo ou no arquivo `batch`
+        try:
+            if request.content_type.startswith('multipart/'):
+                batch = request.FILES.get('batch')
+                if batch is None:
+                    return Response({'error': 'Envie o lote no campo batch.'}, status=status.HTTP_400_BAD_REQUEST)
+                raw = batch.read()
+                mode = request.data.get('mode')
+            else:
+                raw = request.body
+                mode = request.query_params.get('mode')
+            items = load_batch(raw)
+            mode = resolve_match_mode(mode)
+        except PunchError as e:
+            return Response({'error': e.message}, status=e.status_code)
+        except (ValueError, OSError, EOFError) as e:
+            return Response({'error': f'Lote inválido: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Centenas de reconhecimentos não cabem no timeout do gunicorn nem devem ocupar o pool das
+        # batidas ao vivo: o lote validado é processado por um worker da fila (process_punch_jobs)
+        try:
+            job = enqueue_sync(raw, mode, request.user)
+        except IOError:
+            return Response({'error': 'Erro ao salvar o lote'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return Response({
+            'ticket': str(job.ticket),
+            'status': job.status,
+            'total': len(items),
+            'status_url': request.build_absolute_uri(reverse('job_status', args=[job.ticket])),
+        }, status=status.HTTP_202_ACCEPTED)
 
 class AttendanceUsersListView(ListCreateAPIView):
     serializer_class = AttendanceUsersSerializer
@@ -103,129 +177,87 @@ class AttendanceUsersListView(ListCreateAPIView):
         return users_with_attendance
 
 class AttendanceListView(ListAPIView):
+    permission_classes = [IsAuthenticated]
     serializer_class = AttendanceSerializer
+    pagination_class = KeysetPagination
+    list_fields = ['id', 'user_detail', 'point_type', 'data_hora', 'foto_path', 'foto_thumb', 'is_synced']
+
+    def get_list_fields(self):
+        # ?fields= decide; sem ele a listagem serve a miniatura e a foto completa só com ?photo=full
+        fields = requested_fields(self.request, self.list_fields)
+        if fields is not None:
+            return fields
+        if self.request.query_params.get('photo') == 'full':
+            return self.list_fields
+        return [field for field in self.list_fields if field != 'foto_path']
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.setdefault('fields', self.get_list_fields())
+        return super().get_serializer(*args, **kwargs)
 
     def get_queryset(self):
         user = self.request.user
-        if user.is_admin:
-            return Attendance.objects.all().order_by('-data_hora')
-        return Attendance.objects.filter(user=user).order_by('-data_hora')
+        params = self.request.query_params
+        queryset = Attendance.objects.all() if user.is_admin else Attendance.objects.filter(user=user)
+
+        try:
+            if user.is_admin and params.get('user_id'):
+                queryset = queryset.filter(user_id=int(params['user_id']))
+            if params.get('start_date'):
+                queryset = queryset.filter(data_hora__gte=local_day_start(datetime.strptime(params['start_date'], '%Y-%m-%d').date()))
+            if params.get('end_date'):
+                queryset = queryset.filter(data_hora__lt=local_day_start(datetime.strptime(params['end_date'], '%Y-%m-%d').date() + timedelta(days=1)))
+        except ValueError:
+            raise ValidationError({'error': 'Parâmetros inválidos. Use datas YYYY-MM-DD e user_id numérico.'})
+        if params.get('point_type'):
+            if params['point_type'] not in VALID_POINT_TYPES:
+                raise ValidationError({'error': f"Tipo de ponto inválido. Use: {', '.join(VALID_POINT_TYPES)}"})
+            queryset = queryset.filter(point_type=params['point_type'])
+
+        # Projeção: só as colunas dos campos pedidos (id e data_hora sempre, pelo cursor)
+        fields = self.get_list_fields()
+        columns = {'id', 'data_hora', *(field for field in fields if field != 'user_detail')}
+        if 'user_detail' in fields:
+            queryset = queryset.select_related('user')
+            columns.update({'user', 'user__username'})
+        return queryset.only(*columns)
 
 class UserAttendanceDetailView(APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request, user_id):
         try:
-            user = User.objects.get(id=user_id)
+            user = User.objects.only('id', 'username', 'cpf', 'role').get(id=user_id)
             period = request.query_params.get('period', 'mes').lower()
-            
-            start_date_str = request.query_params.get('start_date')
-            end_date_str = request.query_params.get('end_date')
-
-            start_date = None
-            end_date = None
-
-            # Se datas específicas foram fornecidas
-            if start_date_str and end_date_str:
-                try:
-                    start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
-                    end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
-                except ValueError:
-                    return Response({'error': 'Formato de data inválido. Use YYYY-MM-DD.'}, status=status.HTTP_400_BAD_REQUEST)
-            
-            # Se não há datas específicas, definir baseado no período
-            else:
-                today = timezone.now().date()
-                
-                if period == 'hoje':
-                    start_date = today
-                    end_date = today
-                elif period == 'semana':
-                    # Início da semana (domingo)
-                    days_since_sunday = (today.weekday() + 1) % 7
-                    start_date = today - timedelta(days=days_since_sunday)
-                    end_date = start_date + timedelta(days=6)
-                elif period == 'mes':
-                    # Primeiro e último dia do mês atual
-                    start_date = today.replace(day=1)
-                    if today.month == 12:
-                        end_date = today.replace(year=today.year + 1, month=1, day=1) - timedelta(days=1)
-                    else:
-                        end_date = today.replace(month=today.month + 1, day=1) - timedelta(days=1)
-                elif period == 'ano':
-                    # Primeiro e último dia do ano atual
-                    start_date = today.replace(month=1, day=1)
-                    end_date = today.replace(month=12, day=31)
-                else:
-                    # Default para mês se período inválido
-                    start_date = today.replace(day=1)
-                    if today.month == 12:
-                        end_date = today.replace(year=today.year + 1, month=1, day=1) - timedelta(days=1)
-                    else:
-                        end_date = today.replace(month=today.month + 1, day=1) - timedelta(days=1)
-
-            logger.info(f"UserAttendanceDetailView: Usuário {user.username}, Período {period}, Data início: {start_date}, Data fim: {end_date}")
-
-            # Filtrar attendances pelo período selecionado
-            attendances_display = filter_attendances_by_period(user, period, start_date=start_date, end_date=end_date)
-            logger.info(f"UserAttendanceDetailView: Usuário {user.username}, Atendimentos filtrados: {attendances_display.count()}")
-            
-            attendance_count = attendances_display.count()
-
-            # Agrupar attendances por data para exibição na tabela
-            attendance_data = group_attendances_by_date(attendances_display)
-
-            # Preparar atividades recentes para o período selecionado
-            recent_activities = defaultdict(list)
-            for att in attendances_display:
-                date_str = att.data_hora.astimezone(timezone.get_current_timezone()).strftime('%d/%m/%Y')
-                recent_activities[date_str].append({
-                    'id': att.id,
-                    'point_type': att.point_type,
-                    'data_hora': att.data_hora.isoformat(),
-                    'foto_path': att.foto_path.url if att.foto_path else None,
-                })
-            
-            logger.info(f"UserAttendanceDetailView: `recent_activities` (para exibição na tabela): {dict(recent_activities)}")
-
-            # Para as estatísticas CUMULATIVAS, usar TODOS os attendances do usuário
-            # Justificativas do usuário
-            justifications = Justification.objects.filter(user=user, date__gte=start_date, date__lte=end_date)
-            justification_map = {}
-            for j in justifications:
-                date_str = j.date.strftime('%d/%m/%Y') if j.date else timezone.now().date().strftime('%d/%m/%Y')
-                justification_map[date_str] = j.reason
-
-            # Calcular estatísticas cumulativas (todos os registros)
-            stats = calculate_stats(user, attendance_data, justifications.count(), attendance_count)
-
-            # Adicionar informações adicionais do usuário
-            stats['cpf'] = user.cpf if hasattr(user, 'cpf') and user.cpf else 'N/A'
-            stats['role'] = user.role if hasattr(user, 'role') and user.role else 'N/A'
-            stats['period_start'] = start_date.strftime('%d/%m/%Y') if start_date else None
-            stats['period_end'] = end_date.strftime('%d/%m/%Y') if end_date else None
-
-            logger.info(f"UserAttendanceDetailView: Stats calculadas: {stats}")
 
-            return Response({
-                'user': user.username,
-                'total_attendances': attendance_count,
-                'attendances': attendance_data,  # Dados filtrados para a tabela
-                'stats': stats,  # Estatísticas cumulativas
-                'period_info': {
-                    'period': period,
-                    'start_date': start_date.strftime('%Y-%m-%d') if start_date else None,
-                    'end_date': end_date.strftime('%Y-%m-%d') if end_date else None,
-                    'start_date_display': start_date.strftime('%d/%m/%Y') if start_date else None,
-                    'end_date_display': end_date.strftime('%d/%m/%Y') if end_date else None,
-                }
-            }, status=status.HTTP_200_OK)
+            try:
+                start_date, end_date = resolve_period(period, request.query_params.get('start_date'), request.query_params.get('end_date'))
+            except ValueError:
+                return Response({'error': 'Formato de data inválido. Use YYYY-MM-DD.'}, status=status.HTTP_400_BAD_REQUEST)
+
+            report = build_attendance_report(user, start_date, end_date)
+            logger.info('report.built', view='user_detail', user_id=user.id, period=period, start=start_date, end=end_date, punches=report['total_attendances'], days=len(report['attendances']))
+
+            stats = report['stats']
+            stats['period_start'] = start_date.strftime('%d/%m/%Y')
+            stats['period_end'] = end_date.strftime('%d/%m/%Y')
+
+            logger.payload('report.stats', lambda: stats, user_id=user.id)
+
+            report['period_info'] = {
+                'period': period,
+                'start_date': start_date.strftime('%Y-%m-%d'),
+                'end_date': end_date.strftime('%Y-%m-%d'),
+                'start_date_display': start_date.strftime('%d/%m/%Y'),
+                'end_date_display': end_date.strftime('%d/%m/%Y'),
+            }
+            return Response(report, status=status.HTTP_200_OK)
 
         except User.DoesNotExist:
-            logger.error(f"Usuário com ID {user_id} não encontrado")
+            logger.warning('report.user_not_found', 'Usuário com ID {user_id} não encontrado', user_id=user_id)
             return Response({'error': 'Usuário não encontrado'}, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
-            logger.error(f"Erro ao buscar atendimentos do usuário {user_id}: {str(e)}")
+            logger.error('report.error', 'Erro ao buscar atendimentos do usuário {user_id}: {error}', user_id=user_id, error=str(e))
             return Response({'error': f'Erro interno: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 class MyAttendanceReportView(APIView):
@@ -238,79 +270,122 @@ class MyAttendanceReportView(APIView):
                 return Response({'error': 'Autenticação necessária'}, status=status.HTTP_401_UNAUTHORIZED)
 
             period = request.query_params.get('period', 'mes').lower()
-            
-            start_date_str = request.query_params.get('start_date')
-            end_date_str = request.query_params.get('end_date')
-
-            start_date = None
-            end_date = None
-
-            if start_date_str and end_date_str:
-                try:
-                    start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
-                    end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
-                except ValueError:
-                    return Response({'error': 'Formato de data inválido. Use YYYY-MM-DD.'}, status=status.HTTP_400_BAD_REQUEST)
-            else:
-                today = timezone.now().date()
-                
-                if period == 'hoje':
-                    start_date = today
-                    end_date = today
-                elif period == 'semana':
-                    days_since_sunday = (today.weekday() + 1) % 7
-                    start_date = today - timedelta(days=days_since_sunday)
-                    end_date = start_date + timedelta(days=6)
-                elif period == 'mes':
-                    start_date = today.replace(day=1)
-                    if today.month == 12:
-                        end_date = today.replace(year=today.year + 1, month=1, day=1) - timedelta(days=1)
-                    else:
-                        end_date = today.replace(month=today.month + 1, day=1) - timedelta(days=1)
-                elif period == 'ano':
-                    start_date = today.replace(month=1, day=1)
-                    end_date = today.replace(month=12, day=31)
-                else:
-                    start_date = today.replace(day=1)
-                    if today.month == 12:
-                        end_date = today.replace(year=today.year + 1, month=1, day=1) - timedelta(days=1)
-                    else:
-                        end_date = today.replace(month=today.month + 1, day=1) - timedelta(days=1)
-
-            attendances_display = filter_attendances_by_period(user, period, start_date=start_date, end_date=end_date)
-            logger.info(f"MyAttendanceReportView: Usuário {user.username}, Atendimentos encontrados: {attendances_display.count()}")
-            attendance_count = attendances_display.count()
-
-            attendance_data = group_attendances_by_date(attendances_display) 
-
-            recent_activities = defaultdict(list)
-            for att in attendances_display:
-                date_str = att.data_hora.astimezone(timezone.get_current_timezone()).strftime('%d/%m/%Y')
-                recent_activities[date_str].append({
-                    'id': att.id,
-                    'point_type': att.point_type,
-                    'data_hora': att.data_hora.isoformat(),
-                    'foto_path': att.foto_path.url if att.foto_path else None,
-                })
-
-            justifications = Justification.objects.filter(user=user, date__gte=start_date, date__lte=end_date)
-            justification_map = {}
-            for j in justifications:
-                date_str = j.date.strftime('%d/%m/%Y') if j.date else timezone.now().date().strftime('%d/%m/%Y')
-                justification_map[date_str] = j.reason
-
-            stats = calculate_stats(user, attendance_data, justifications.count(), attendance_count) 
-
-            stats['cpf'] = user.cpf if user.cpf else 'N/A'
-            stats['role'] = user.role if user.role else 'N/A'
 
-            return Response({
-                'user': user.username,
-                'total_attendances': attendance_count,
-                'attendances': attendance_data, 
-                'stats': stats
-            }, status=status.HTTP_200_OK)
+            try:
+                start_date, end_date = resolve_period(period, request.query_params.get('start_date'), request.query_params.get('end_date'))
+            except ValueError:
+                return Response({'error': 'Formato de data inválido. Use YYYY-MM-DD.'}, status=status.HTTP_400_BAD_REQUEST)
+
+            report = build_attendance_report(user, start_date, end_date)
+            logger.info('report.built', view='my_report', user_id=user.id, period=period, start=start_date, end=end_date, punches=report['total_attendances'], days=len(report['attendances']))
+
+            return Response(report, status=status.HTTP_200_OK)
+
+        except Exception as e:
+            logger.error('report.error', 'Erro ao buscar atendimentos do próprio usuário: {error}', user_id=request.user.id, error=str(e))
+            return Response({'error': 'Erro interno ao buscar relatórios'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+class OrganizationAttendanceReportView(APIView):
+    permission_classes = [IsAuthenticated, AdminPermission]
+
+    def get(self, request):
+        period = request.query_params.get('period', 'mes').lower()
+        try:
+            start_date, end_date = resolve_period(period, request.query_params.get('start_date'), request.query_params.get('end_date'))
+        except ValueError:
+            return Response({'error': 'Formato de data inválido. Use YYYY-MM-DD.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            page = max(1, int(request.query_params.get('page', 1)))
+            page_size = int(request.query_params.get('page_size', settings.ORGANIZATION_REPORT_PAGE_SIZE))
+        except ValueError:
+            return Response({'error': 'page e page_size devem ser números inteiros'}, status=status.HTTP_400_BAD_REQUEST)
+        page_size = min(max(1, page_size), settings.ORGANIZATION_REPORT_MAX_PAGE_SIZE)
 
+        try:
+            report = build_organization_report(start_date, end_date, page, page_size)
         except Exception as e:
-            logger.error(f"Erro ao buscar atendimentos do próprio usuário: {str(e)}")
+            logger.error('report.error', 'Erro ao montar o relatório geral: {error}', error=str(e))
             return Response({'error': 'Erro interno ao buscar relatórios'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        logger.info('report.built', view='organization', period=period, start=start_date, end=end_date, page=page, users=len(report['results']))
+
+        report['period_info'] = {
+            'period': period,
+            'start_date': start_date.strftime('%Y-%m-%d'),
+            'end_date': end_date.strftime('%Y-%m-%d'),
+            'start_date_display': start_date.strftime('%d/%m/%Y'),
+            'end_date_display': end_date.strftime('%d/%m/%Y'),
+        }
+        return Response(report, status=status.HTTP_200_OK)
+
+class AttendanceExportView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        kind = request.query_params.get('kind', 'punches').lower()
+        export_format = request.query_params.get('export', 'csv').lower()
+        point_type = request.query_params.get('point_type') or None
+        if kind not in EXPORT_KINDS:
+            return Response({'error': f"kind deve ser um de: {', '.join(EXPORT_KINDS)}"}, status=status.HTTP_400_BAD_REQUEST)
+        if export_format not in EXPORT_FORMATS:
+            return Response({'error': f"export deve ser um de: {', '.join(EXPORT_FORMATS)}"}, status=status.HTTP_400_BAD_REQUEST)
+        if export_format == 'xlsx' and not xlsx_available():
+            return Response({'error': 'Exportação XLSX indisponível: instale o openpyxl'}, status=status.HTTP_400_BAD_REQUEST)
+        if point_type and point_type not in VALID_POINT_TYPES:
+            return Response({'error': f"Tipo de ponto inválido. Use: {', '.join(VALID_POINT_TYPES)}"}, status=status.HTTP_400_BAD_REQUEST)
+        if point_type and kind == 'days':
+            # O resumo diário junta entrada, almoço e saída numa linha: não há o que filtrar por tipo
+            return Response({'error': 'point_type só se aplica a kind=punches'}, status=status.HTTP_400_BAD_REQUEST)
+
+        period = request.query_params.get('period', 'mes').lower()
+        try:
+            start_date, end_date = resolve_period(period, request.query_params.get('start_date'), request.query_params.get('end_date'))
+            user_id = int(request.query_params['user_id']) if request.query_params.get('user_id') else None
+        except ValueError:
+            return Response({'error': 'Parâmetros inválidos. Use datas YYYY-MM-DD e user_id numérico.'}, status=status.HTTP_400_BAD_REQUEST)
+        # Usuários comuns só exportam os próprios registros
+        if not request.user.is_admin:
+            user_id = request.user.id
+
+        logger.info('export.started', kind=kind, export=export_format, user_id=user_id, start=start_date, end=end_date, requested_by=request.user.id)
+        if export_format == 'xlsx':
+            # XLSX só fica válido depois da última linha: gerado na fila e baixado pronto pelo ticket
+            job = enqueue_export({
+                'kind': kind,
+                'start_date': start_date.isoformat(),
+                'end_date': end_date.isoformat(),
+                'user_id': user_id,
+                'point_type': point_type,
+            }, request.user)
+            return Response({
+                'ticket': str(job.ticket),
+                'status': job.status,
+                'status_url': request.build_absolute_uri(reverse('job_status', args=[job.ticket])),
+            }, status=status.HTTP_202_ACCEPTED)
+
+        # CSV sai em fluxo desde a primeira linha; o worker gthread (gunicorn.conf.py) não é
+        # derrubado pelo timeout enquanto a resposta é enviada
+        header, rows = export_rows(kind, start_date, end_date, user_id, point_type)
+        response = StreamingHttpResponse(stream_csv(header, rows), content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="{export_filename(kind, start_date, end_date, export_format)}"'
+        return response
+
+class PunchJobDownloadView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, ticket):
+        job = PunchJob.objects.filter(ticket=ticket, kind=PunchJob.KIND_EXPORT).first()
+        if job is None:
+            return Response({'error': 'Ticket não encontrado'}, status=status.HTTP_404_NOT_FOUND)
+        if not can_read_job(request.user, job):
+            return Response({'error': 'Sem permissão para consultar este ticket'}, status=status.HTTP_403_FORBIDDEN)
+        if job.status != PunchJob.STATUS_DONE:
+            return Response({'error': 'Exportação ainda não concluída'}, status=status.HTTP_409_CONFLICT)
+        path = (job.payload or {}).get('file')
+        if not path:
+            return Response({'error': 'Exportação expirada; gere novamente'}, status=status.HTTP_410_GONE)
+        return FileResponse(
+            default_storage.open(path, 'rb'),
+            as_attachment=True,
+            filename=job.result['filename'],
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        )
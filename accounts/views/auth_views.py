@@ -10,9 +10,10 @@ from rest_framework.permissions import AllowAny
 from django.core.mail import send_mail
 from django.utils import timezone
 from django.conf import settings
-import logging
+from ..recognition_pool import RecognitionUnavailable
+from ..logs import get_event_logger
 
-logger = logging.getLogger(__name__)
+logger = get_event_logger(__name__)
 User = get_user_model()
 
 class RegisterView(APIView):
@@ -38,8 +39,10 @@ class RegisterView(APIView):
                         'role': user.role
                     }
                 }, status=status.HTTP_201_CREATED)
+            except RecognitionUnavailable as e:
+                return Response({'error': str(e.detail)}, status=e.status_code)
             except Exception as e:
-                logger.error(f"Erro ao registrar usuário: {str(e)}")
+                logger.error('auth.register_error', 'Erro ao registrar usuário: {error}', error=str(e))
                 return Response({'error': 'Erro interno ao registrar'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -62,7 +65,7 @@ class LoginView(APIView):
                 pass
 
             if not user:
-                logger.error(f"Autenticação falhou. Email: {email}, Password: {password}")
+                logger.warning('auth.login_failed', 'Autenticação falhou para o email {email}', email=email)
                 return Response({'error': 'Credenciais inválidas'}, status=status.HTTP_401_UNAUTHORIZED)
             
             refresh = RefreshToken.for_user(user)
@@ -0,0 +1,26 @@
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status
+from rest_framework.permissions import AllowAny
+from django.http import HttpResponse
+from ..metrics import render_prometheus
+from ..permission import MetricsPermission
+from ..warmup import is_ready
+
+
+class ReadinessView(APIView):
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        if is_ready():
+            return Response({'status': 'ready'}, status=status.HTTP_200_OK)
+        return Response({'status': 'warming_up'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+
+class MetricsView(APIView):
+    authentication_classes = []
+    permission_classes = [MetricsPermission]
+
+    def get(self, request):
+        return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -6,33 +6,51 @@ from rest_framework.generics import ListCreateAPIView, RetrieveUpdateDestroyAPIV
 from ..serializers import JustificationSerializer, JustificationApprovalSerializer
 from ..models import Justification, JustificationApproval
 from ..permission import AdminPermission
+from ..pagination import JustificationKeysetPagination, requested_fields
+from ..logs import get_event_logger
 from django.utils import timezone
 from django.core.exceptions import ObjectDoesNotExist
+from datetime import datetime
 from rest_framework.exceptions import PermissionDenied
-import logging
 
-logger = logging.getLogger(__name__)
+logger = get_event_logger(__name__)
 
 class JustificationListCreateView(ListCreateAPIView):
     serializer_class = JustificationSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = JustificationKeysetPagination
+    list_fields = ['id', 'user', 'employee', 'reason', 'date', 'created_at', 'approval', 'approved', 'status', 'approved_by', 'approved_at']
 
     def get_queryset(self):
         user = self.request.user
         if user.is_admin:
-            return Justification.objects.all().order_by('-created_at')
-        return Justification.objects.filter(user=user).order_by('-created_at')
+            return Justification.objects.all().order_by('-created_at', '-id')
+        return Justification.objects.filter(user=user).order_by('-created_at', '-id')
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
     
     def list(self, request, *args, **kwargs):
         """Customizar a resposta da listagem para incluir dados de aprovação"""
+        fields = requested_fields(request, self.list_fields)
         queryset = self.get_queryset()
-        
+        params = request.query_params
+        try:
+            if request.user.is_admin and params.get('user_id'):
+                queryset = queryset.filter(user_id=int(params['user_id']))
+            if params.get('start_date'):
+                queryset = queryset.filter(date__gte=datetime.strptime(params['start_date'], '%Y-%m-%d').date())
+            if params.get('end_date'):
+                queryset = queryset.filter(date__lte=datetime.strptime(params['end_date'], '%Y-%m-%d').date())
+        except ValueError:
+            return Response({'error': 'Parâmetros inválidos. Use datas YYYY-MM-DD e user_id numérico.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Usuário, aprovação e revisor vêm no mesmo SELECT (antes: duas consultas extras por justificativa)
+        page = self.paginate_queryset(queryset.select_related('user', 'approval__reviewed_by'))
+
         data = []
-        for justification in queryset:
-            approval = JustificationApproval.objects.filter(justification=justification).first()
+        for justification in page:
+            approval = getattr(justification, 'approval', None)
             
             if approval is not None:
                 status_text = 'aprovada' if approval.approved else 'recusada'
@@ -55,11 +73,13 @@ class JustificationListCreateView(ListCreateAPIView):
                 'approved_by': approval.reviewed_by.username if approval and approval.reviewed_by else None,
                 'approved_at': approval.reviewed_at.isoformat() if approval and approval.reviewed_at else None,
             }
+            if fields is not None:
+                item = {field: item[field] for field in fields}
             data.append(item)
-            
-            logger.info(f"Justification {justification.id}: approved={approved_status}, status={status_text}")
+
+        logger.debug('justification.listed', '{count} justificativas listadas', count=len(data), user_id=request.user.id)
         
-        return Response(data, status=status.HTTP_200_OK)
+        return self.get_paginated_response(data)
 
 
 class JustificationApprovalView(APIView):
@@ -74,7 +94,7 @@ class JustificationApprovalView(APIView):
             
             final_approval = approved if approved is not None else approval
             
-            logger.info(f"Processando aprovação/reprovação para justification {justification_id}: approved={approved}, approval={approval}, final={final_approval}")
+            logger.info('justification.review', 'Processando aprovação/reprovação da justificativa {justification_id}', justification_id=justification_id, approved=approved, approval=approval, final=final_approval)
             
             if final_approval is None:
                 return Response({'error': 'Campo approved ou approval é obrigatório'}, status=status.HTTP_400_BAD_REQUEST)
@@ -95,7 +115,7 @@ class JustificationApprovalView(APIView):
             
             action = "aprovada" if approval_obj.approved else "reprovada"
             status_text = "aprovada" if approval_obj.approved else "recusada"
-            logger.info(f"Justificativa {justification_id} {action} por {request.user.username}")
+            logger.info('justification.reviewed', 'Justificativa {justification_id} {action} por {reviewer}', justification_id=justification_id, action=action, reviewer=request.user.username)
             
             response_data = {
                 'id': justification.id,
@@ -116,10 +136,10 @@ class JustificationApprovalView(APIView):
             return Response(response_data, status=status.HTTP_200_OK)
             
         except Justification.DoesNotExist:
-            logger.error(f"Justificativa {justification_id} não encontrada")
+            logger.error('justification.not_found', 'Justificativa {justification_id} não encontrada', justification_id=justification_id)
             return Response({'error': 'Justificativa não encontrada'}, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
-            logger.error(f"Erro ao aprovar/reprovar justificativa {justification_id}: {str(e)}")
+            logger.error('justification.review_error', 'Erro ao aprovar/reprovar justificativa {justification_id}: {error}', justification_id=justification_id, error=str(e))
             return Response({'error': f'Erro interno: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 class JustificationDetailView(RetrieveUpdateDestroyAPIView):
@@ -144,7 +164,7 @@ class JustificationDetailView(RetrieveUpdateDestroyAPIView):
         
         JustificationApproval.objects.filter(justification=instance).delete()
         
-        logger.info(f"Justificativa {instance.id} deletada por {self.request.user.username}")
+        logger.info('justification.deleted', 'Justificativa {justification_id} deletada por {username}', justification_id=instance.id, username=self.request.user.username)
         instance.delete()
     
     def destroy(self, request, *args, **kwargs):
@@ -154,5 +174,5 @@ class JustificationDetailView(RetrieveUpdateDestroyAPIView):
             self.perform_destroy(instance)
             return Response({'message': 'Justificativa deletada com sucesso!'}, status=status.HTTP_204_NO_CONTENT)
         except Exception as e:
-            logger.error(f"Erro ao deletar justificativa: {str(e)}")
+            logger.error('justification.delete_error', 'Erro ao deletar justificativa: {error}', error=str(e))
             return Response({'error': 'Erro interno do servidor'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
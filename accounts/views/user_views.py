@@ -8,10 +8,16 @@ from ..serializers import RegisterSerializer, UserProfileSerializer, AttendanceU
 from accounts.models import UserRole, CustomUser
 from ..permission import AdminPermission
 from django.core.exceptions import ObjectDoesNotExist
-import logging
 from ..utils.validators import validate_cpf, validate_phone_number
-
-logger = logging.getLogger(__name__)
+from ..matching import notify_embedding_removed
+from ..recognition_pool import RecognitionUnavailable
+from ..enrollment import parse_manifest
+from ..punch_queue import enqueue_enrollment
+from django.urls import reverse
+from ..logs import get_event_logger
+import zipfile
+
+logger = get_event_logger(__name__)
 User = get_user_model()
 
 class UserManagementView(APIView):
@@ -26,14 +32,16 @@ class UserManagementView(APIView):
                 if 'role' in request.data and request.data['role'] == 'admin' and not request.user.is_admin:
                     return Response({'error': 'Apenas admins podem promover a admin'}, status=status.HTTP_403_FORBIDDEN)
                 serializer.save()
-                logger.info(f"Usuário {user.email} editado por {request.user.email}")
+                logger.info('user.updated', 'Usuário {email} editado por {editor}', user_id=user.id, email=user.email, editor=request.user.email)
                 return Response(serializer.data, status=status.HTTP_200_OK)
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         except ObjectDoesNotExist:
-            logger.error(f"Usuário com ID {user_id} não encontrado")
+            logger.error('user.not_found', 'Usuário com ID {user_id} não encontrado', user_id=user_id)
             return Response({'error': 'Usuário não encontrado'}, status=status.HTTP_404_NOT_FOUND)
+        except RecognitionUnavailable as e:
+            return Response({'error': str(e.detail)}, status=e.status_code)
         except Exception as e:
-            logger.error(f"Erro ao editar usuário {user_id}: {str(e)}")
+            logger.error('user.update_error', 'Erro ao editar usuário {user_id}: {error}', user_id=user_id, error=str(e))
             return Response({'error': 'Erro interno'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     def delete(self, request, user_id):
@@ -43,14 +51,16 @@ class UserManagementView(APIView):
             if user.id == request.user.id:
                 return Response({'error': 'Não é possível excluir a si mesmo'}, status=status.HTTP_403_FORBIDDEN)
             user_email = user.email
+            deleted_user_id = user.id
             user.delete()
-            logger.info(f"Usuário {user_email} excluído por {request.user.email}")
+            notify_embedding_removed(deleted_user_id)
+            logger.info('user.deleted', 'Usuário {email} excluído por {editor}', user_id=deleted_user_id, email=user_email, editor=request.user.email)
             return Response({'message': 'Usuário excluído com sucesso'}, status=status.HTTP_200_OK)
         except ObjectDoesNotExist:
-            logger.error(f"Usuário com ID {user_id} não encontrado")
+            logger.error('user.not_found', 'Usuário com ID {user_id} não encontrado', user_id=user_id)
             return Response({'error': 'Usuário não encontrado'}, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
-            logger.error(f"Erro ao excluir usuário {user_id}: {str(e)}")
+            logger.error('user.delete_error', 'Erro ao excluir usuário {user_id}: {error}', user_id=user_id, error=str(e))
             return Response({'error': 'Erro interno'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 class UserProfileView(APIView):
@@ -71,19 +81,19 @@ class UserProfileView(APIView):
             if cpf:
                 is_valid_cpf, cpf_error = validate_cpf(cpf)
                 if not is_valid_cpf:
-                    logger.error(f"CPF inválido para usuário {user.email}: {cpf}")
+                    logger.error('user.invalid_cpf', 'CPF inválido para usuário {email}: {cpf}', user_id=user.id, email=user.email, cpf=cpf)
                     return Response({'cpf': cpf_error}, status=status.HTTP_400_BAD_REQUEST)
 
             if phone_number:
                 is_valid_phone, phone_error = validate_phone_number(phone_number)
                 if not is_valid_phone:
-                    logger.error(f"Telefone inválido para usuário {user.email}: {phone_number}")
+                    logger.error('user.invalid_phone', 'Telefone inválido para usuário {email}: {phone_number}', user_id=user.id, email=user.email, phone_number=phone_number)
                     return Response({'phone_number': phone_error}, status=status.HTTP_400_BAD_REQUEST)
 
             serializer.save()
-            logger.info(f"Perfil do usuário {user.email} atualizado com sucesso")
+            logger.info('user.profile_updated', 'Perfil do usuário {email} atualizado com sucesso', user_id=user.id, email=user.email)
             return Response(serializer.data, status=status.HTTP_200_OK)
-        logger.error(f"Erro ao atualizar perfil do usuário {user.email}: {serializer.errors}")
+        logger.error('user.profile_invalid', 'Erro ao atualizar perfil do usuário {email}: {errors}', user_id=user.id, email=user.email, errors=serializer.errors)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 class UserListManageView(APIView):
@@ -93,10 +103,10 @@ class UserListManageView(APIView):
         try:
             users = CustomUser.objects.filter(role=UserRole.USER.value)
             serializer = UserProfileSerializer(users, many=True)
-            logger.info(f"Lista de usuários comuns retornada para {request.user.email}")
+            logger.info('user.listed', 'Lista de usuários comuns retornada para {requested_by}', requested_by=request.user.email, count=len(serializer.data))
             return Response(serializer.data, status=status.HTTP_200_OK)
         except Exception as e:
-            logger.error(f"Erro ao listar usuários comuns: {str(e)}")
+            logger.error('user.list_error', 'Erro ao listar usuários comuns: {error}', error=str(e))
             return Response({'error': 'Erro interno ao listar usuários'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     def put(self, request, user_id):
@@ -110,40 +120,78 @@ class UserListManageView(APIView):
                 if cpf:
                     is_valid_cpf, cpf_error = validate_cpf(cpf)
                     if not is_valid_cpf:
-                        logger.error(f"CPF inválido para usuário {user.email}: {cpf}")
+                        logger.error('user.invalid_cpf', 'CPF inválido para usuário {email}: {cpf}', user_id=user.id, email=user.email, cpf=cpf)
                         return Response({'cpf': cpf_error}, status=status.HTTP_400_BAD_REQUEST)
 
                 if phone_number:
                     is_valid_phone, phone_error = validate_phone_number(phone_number)
                     if not is_valid_phone:
-                        logger.error(f"Telefone inválido para usuário {user.email}: {phone_number}")
+                        logger.error('user.invalid_phone', 'Telefone inválido para usuário {email}: {phone_number}', user_id=user.id, email=user.email, phone_number=phone_number)
                         return Response({'phone_number': phone_error}, status=status.HTTP_400_BAD_REQUEST)
 
                 serializer.save()
-                logger.info(f"Usuário {user.email} editado por {request.user.email}")
+                logger.info('user.updated', 'Usuário {email} editado por {editor}', user_id=user.id, email=user.email, editor=request.user.email)
                 return Response(serializer.data, status=status.HTTP_200_OK)
-            logger.error(f"Erro ao editar usuário {user_id}: {serializer.errors}")
+            logger.error('user.update_invalid', 'Erro ao editar usuário {user_id}: {errors}', user_id=user_id, errors=serializer.errors)
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         except CustomUser.DoesNotExist:
-            logger.error(f"Usuário com ID {user_id} não encontrado ou não é um usuário comum")
+            logger.error('user.not_found', 'Usuário com ID {user_id} não encontrado ou não é um usuário comum', user_id=user_id)
             return Response({'error': 'Usuário não encontrado ou não é um usuário comum'}, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
-            logger.error(f"Erro ao editar usuário {user_id}: {str(e)}")
+            logger.error('user.update_error', 'Erro ao editar usuário {user_id}: {error}', user_id=user_id, error=str(e))
             return Response({'error': 'Erro interno'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     def delete(self, request, user_id):
         try:
             user = CustomUser.objects.get(id=user_id, role=UserRole.USER.value)
             if user.id == request.user.id:
-                logger.error(f"Tentativa de excluir a si mesmo por {request.user.email}")
+                logger.error('user.self_delete', 'Tentativa de excluir a si mesmo por {email}', user_id=request.user.id, email=request.user.email)
                 return Response({'error': 'Não é possível excluir a si mesmo'}, status=status.HTTP_403_FORBIDDEN)
             user_email = user.email
+            deleted_user_id = user.id
             user.delete()
-            logger.info(f"Usuário {user_email} excluído por {request.user.email}")
+            notify_embedding_removed(deleted_user_id)
+            logger.info('user.deleted', 'Usuário {email} excluído por {editor}', user_id=deleted_user_id, email=user_email, editor=request.user.email)
             return Response({'message': 'Usuário excluído com sucesso'}, status=status.HTTP_200_OK)
         except CustomUser.DoesNotExist:
-            logger.error(f"Usuário com ID {user_id} não encontrado ou não é um usuário comum")
+            logger.error('user.not_found', 'Usuário com ID {user_id} não encontrado ou não é um usuário comum', user_id=user_id)
             return Response({'error': 'Usuário não encontrado ou não é um usuário comum'}, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
-            logger.error(f"Erro ao excluir usuário {user_id}: {str(e)}")
+            logger.error('user.delete_error', 'Erro ao excluir usuário {user_id}: {error}', user_id=user_id, error=str(e))
             return Response({'error': 'Erro interno'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+class BulkEnrollView(APIView):
+    permission_classes = [IsAuthenticated, AdminPermission]
+
+    def post(self, request):
+        manifest = request.FILES.get('manifest')
+        photos = request.FILES.get('photos')
+        if not manifest or not photos:
+            return Response({'error': 'Envie o manifesto (manifest) e o arquivo zip de fotos (photos).'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            rows = parse_manifest(manifest.read(), manifest.name)
+        except (ValueError, UnicodeDecodeError) as e:
+            return Response({'error': f'Manifesto inválido: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            zipfile.ZipFile(photos).close()
+            photos.seek(0)
+        except zipfile.BadZipFile:
+            return Response({'error': 'Arquivo de fotos deve ser um zip válido.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Milhares de fotos não cabem no timeout do gunicorn: o cadastro roda na fila (process_punch_jobs)
+        manifest.seek(0)
+        try:
+            job = enqueue_enrollment(manifest, photos, request.user)
+        except IOError as e:
+            logger.error('enroll.upload_error', 'Erro ao salvar arquivos do cadastro em lote: {error}', error=str(e))
+            return Response({'error': 'Erro ao salvar arquivos do cadastro em lote'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        logger.info('enroll.enqueued', 'Cadastro em lote de {rows} linhas enfileirado por {requested_by}', ticket=job.ticket, rows=len(rows), requested_by=request.user.email)
+        return Response({
+            'ticket': str(job.ticket),
+            'status': job.status,
+            'total': len(rows),
+            'status_url': request.build_absolute_uri(reverse('job_status', args=[job.ticket])),
+        }, status=status.HTTP_202_ACCEPTED)
@@ -0,0 +1,62 @@
+from concurrent.futures import wait
+from django.conf import settings
+from .face_encoding import warm_up
+from .recognition_pool import get_executor
+import threading
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+_models_warm = threading.Event()
+_pool_warm = threading.Event()
+
+
+def warm_up_models():
+    # Só usado com FACE_POOL_SIZE=0, quando a codificação roda no próprio processo web
+    if _models_warm.is_set():
+        return
+    started = time.perf_counter()
+    warm_up()
+    _models_warm.set()
+    logger.info(f"Modelos de reconhecimento facial carregados em {time.perf_counter() - started:.2f}s")
+
+
+def warm_up_pool():
+    if settings.FACE_POOL_SIZE <= 0:
+        warm_up_models()
+        _pool_warm.set()
+        return
+    # Os processos do pool ('spawn') carregam os próprios pesos; o processo web não precisa deles
+    started = time.perf_counter()
+    executor, _ = get_executor()
+    futures = [executor.submit(warm_up) for _ in range(settings.FACE_POOL_SIZE)]
+    wait(futures, timeout=settings.FACE_WARMUP_TIMEOUT)
+    for future in futures:
+        if future.done() and future.exception() is None:
+            continue
+        logger.error("Falha ao aquecer os processos do pool de reconhecimento")
+        return
+    _pool_warm.set()
+    logger.info(f"Pool de reconhecimento aquecido em {time.perf_counter() - started:.2f}s")
+
+
+def run_warm_up():
+    try:
+        warm_up_pool()
+    except Exception as e:
+        logger.error(f"Erro no aquecimento do reconhecimento facial: {str(e)}")
+
+
+def start_warm_up():
+    # Chamado em cada worker ao carregar o app: o executor do pool é criado por processo
+    _pool_warm.clear()
+    thread = threading.Thread(target=run_warm_up, name='face-warmup', daemon=True)
+    thread.start()
+    return thread
+
+
+def is_ready():
+    if not settings.FACE_WARMUP_ON_START:
+        return True
+    return _pool_warm.is_set()
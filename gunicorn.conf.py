@@ -0,0 +1,26 @@
+# Configuração do gunicorn (carregada automaticamente a partir do diretório de trabalho).
+# Sem preload_app: a codificação facial roda no pool de processos 'spawn' de cada worker, que
+# carrega os pesos do dlib por conta própria, então carregá-los no mestre só gastaria memória.
+# Cada worker aquece o seu pool em segundo plano (AccountsConfig.ready) e /health/ready/
+# responde 503 até terminar.
+import tempfile
+import os
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'management.settings')
+os.environ.setdefault('FACE_WARMUP_ON_START', 'True')
+# Diretório compartilhado em que cada worker grava suas métricas para o /metrics agregar
+os.environ.setdefault('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'chronos_metrics'))
+
+workers = int(os.environ.get('GUNICORN_WORKERS', '3'))
+# gthread: o timeout vigia o laço principal do worker, não cada requisição, então respostas em fluxo
+# longas (exportação CSV) não derrubam o worker; threads também evitam que um download lento ocupe
+# o worker inteiro. O reconhecimento continua limitado pelo pool de processos (FACE_POOL_SIZE).
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', '4'))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '60'))
+
+
+def on_starting(server):
+    # Descarta valores de execuções anteriores antes de iniciar os workers
+    from accounts.metrics import clear_metrics_dir
+    clear_metrics_dir()
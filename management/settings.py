@@ -1,5 +1,7 @@
-from decouple import config
+from decouple import config, Csv
+from corsheaders.defaults import default_headers
 import os
+import tempfile
 from pathlib import Path
 from datetime import timedelta
 
@@ -41,6 +43,8 @@ MIDDLEWARE = [
 ALLOWED_HOSTS = ['*']
 
 CORS_ALLOW_ALL_ORIGINS = True  # Apenas para testes!
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
+CORS_EXPOSE_HEADERS = ['Idempotent-Replayed']
 
 APPEND_SLASH = False
 
@@ -128,5 +132,140 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Reconhecimento facial
+# Backend de busca: 'pgvector' (índice HNSW no Postgres), 'gallery' (matriz NumPy em memória),
+# 'quantized' (códigos compactos em memória + reordenação exata) ou 'scan' (varredura em Python)
+FACE_MATCH_BACKEND = config('FACE_MATCH_BACKEND', default='pgvector')
+FACE_MATCH_THRESHOLD = config('FACE_MATCH_THRESHOLD', default=0.5, cast=float)
+# Modo de reconhecimento na batida de ponto: 'verify' (1:1 com o usuário autenticado ou user_id
+# informado), 'identify' (1:N em toda a base) ou 'auto' (verifica quando há identidade, senão identifica)
+FACE_MATCH_MODE = config('FACE_MATCH_MODE', default='auto')
+# Permite batidas sem autenticação (quiosque): identificação 1:N, ou verificação 1:1 quando o quiosque informa user_id
+ATTENDANCE_ANONYMOUS_KIOSK = config('ATTENDANCE_ANONYMOUS_KIOSK', default=False, cast=bool)
+FACE_MATCH_CANDIDATES = config('FACE_MATCH_CANDIDATES', default=1, cast=int)
+# Lista de candidatos na busca HNSW (m/ef_construction são fixos no modelo e na migração 0011)
+FACE_HNSW_EF_SEARCH = config('FACE_HNSW_EF_SEARCH', default=40, cast=int)
+# Intervalo mínimo entre consultas ao carimbo de versão da galeria em memória
+FACE_GALLERY_VERSION_CHECK_SECONDS = config('FACE_GALLERY_VERSION_CHECK_SECONDS', default=1.0, cast=float)
+# Códigos compactos: 'int8' (~4x menor) ou 'float16' (2x menor) e candidatos reordenados com distância exata
+FACE_EMBEDDING_CODE_DTYPE = config('FACE_EMBEDDING_CODE_DTYPE', default='int8')
+FACE_QUANTIZED_CANDIDATES = config('FACE_QUANTIZED_CANDIDATES', default=10, cast=int)
+FACE_QUANTIZED_CHUNK_ROWS = config('FACE_QUANTIZED_CHUNK_ROWS', default=65536, cast=int)
+# Pool de processos para detecção/codificação (0 = executar na própria thread da requisição)
+FACE_POOL_SIZE = config('FACE_POOL_SIZE', default=2, cast=int)
+# Máximo de imagens na fila + em processamento antes de responder 503 (0 = 2x o tamanho do pool)
+FACE_POOL_MAX_PENDING = config('FACE_POOL_MAX_PENDING', default=0, cast=int)
+FACE_POOL_TIMEOUT = config('FACE_POOL_TIMEOUT', default=15.0, cast=float)
+# Carrega e aquece os modelos do dlib na inicialização (ligado pelo gunicorn.conf.py)
+FACE_WARMUP_ON_START = config('FACE_WARMUP_ON_START', default=False, cast=bool)
+FACE_WARMUP_TIMEOUT = config('FACE_WARMUP_TIMEOUT', default=120.0, cast=float)
+# Pré-processamento: maior lado da imagem usada na detecção (0 = resolução original),
+# detector 'hog' ou 'cnn', upsample da detecção, jitters e modelo de landmarks ('small'/'large')
+FACE_MAX_IMAGE_EDGE = config('FACE_MAX_IMAGE_EDGE', default=800, cast=int)
+FACE_DETECTOR_MODEL = config('FACE_DETECTOR_MODEL', default='hog')
+FACE_DETECTION_UPSAMPLE = config('FACE_DETECTION_UPSAMPLE', default=1, cast=int)
+FACE_NUM_JITTERS = config('FACE_NUM_JITTERS', default=1, cast=int)
+FACE_ENCODER_MODEL = config('FACE_ENCODER_MODEL', default='small')
+# Cache de embeddings por SHA-256 da imagem (reenvios do quiosque): entradas em memória por
+# processo, validade em segundos e tabela no banco para reaproveitar entre workers
+FACE_EMBEDDING_CACHE_SIZE = config('FACE_EMBEDDING_CACHE_SIZE', default=1024, cast=int)
+FACE_EMBEDDING_CACHE_TTL = config('FACE_EMBEDDING_CACHE_TTL', default=600, cast=int)
+FACE_EMBEDDING_CACHE_DB = config('FACE_EMBEDDING_CACHE_DB', default=False, cast=bool)
+# Cadastro em lote: processos de codificação e tamanho dos lotes de bulk_create
+FACE_BULK_ENROLL_WORKERS = config('FACE_BULK_ENROLL_WORKERS', default=os.cpu_count() or 1, cast=int)
+FACE_BULK_ENROLL_CHUNK_SIZE = config('FACE_BULK_ENROLL_CHUNK_SIZE', default=500, cast=int)
+
+# Batida assíncrona: aceita a foto, enfileira no banco e devolve um ticket consultável
+ATTENDANCE_ASYNC = config('ATTENDANCE_ASYNC', default=False, cast=bool)
+PUNCH_QUEUE_WORKERS = config('PUNCH_QUEUE_WORKERS', default=os.cpu_count() or 1, cast=int)
+PUNCH_JOB_STALE_SECONDS = config('PUNCH_JOB_STALE_SECONDS', default=120, cast=int)
+# Trabalhos em lote (sincronização offline, cadastro em lote) levam minutos: só voltam para a fila depois deste tempo
+BATCH_JOB_STALE_SECONDS = config('BATCH_JOB_STALE_SECONDS', default=3600, cast=int)
+PUNCH_JOB_MAX_ATTEMPTS = config('PUNCH_JOB_MAX_ATTEMPTS', default=3, cast=int)
+# Segundos sugeridos ao cliente (Retry-After) entre consultas ao status de um trabalho pendente
+PUNCH_JOB_RETRY_AFTER = config('PUNCH_JOB_RETRY_AFTER', default=1, cast=int)
+# Fotos das batidas: gravadas depois do commit em caminhos derivados do SHA-256, reduzidas a
+# ATTENDANCE_PHOTO_MAX_EDGE px em WEBP ou JPEG, com miniatura para os relatórios (0 workers = grava no commit)
+ATTENDANCE_PHOTO_FORMAT = config('ATTENDANCE_PHOTO_FORMAT', default='WEBP')
+ATTENDANCE_PHOTO_MAX_EDGE = config('ATTENDANCE_PHOTO_MAX_EDGE', default=1024, cast=int)
+ATTENDANCE_THUMB_EDGE = config('ATTENDANCE_THUMB_EDGE', default=160, cast=int)
+ATTENDANCE_PHOTO_QUALITY = config('ATTENDANCE_PHOTO_QUALITY', default=80, cast=int)
+ATTENDANCE_PHOTO_WORKERS = config('ATTENDANCE_PHOTO_WORKERS', default=2, cast=int)
+# Fotos aguardando gravação por processo; acima disso a gravação acontece na própria requisição
+ATTENDANCE_PHOTO_QUEUE_SIZE = config('ATTENDANCE_PHOTO_QUEUE_SIZE', default=64, cast=int)
+# Idempotency-Key nas batidas: validade das respostas guardadas e tempo após o qual uma chave
+# ainda "processando" (requisição interrompida) pode ser reutilizada
+PUNCH_IDEMPOTENCY_TTL = config('PUNCH_IDEMPOTENCY_TTL', default=86400, cast=int)
+PUNCH_IDEMPOTENCY_STALE_SECONDS = config('PUNCH_IDEMPOTENCY_STALE_SECONDS', default=120, cast=int)
+# Sincronização offline dos quiosques (processada na fila): itens por lote, lote de bulk_create
+# e processos que reconhecem as fotos de um lote em paralelo
+ATTENDANCE_SYNC_MAX_ITEMS = config('ATTENDANCE_SYNC_MAX_ITEMS', default=1000, cast=int)
+ATTENDANCE_SYNC_CHUNK_SIZE = config('ATTENDANCE_SYNC_CHUNK_SIZE', default=200, cast=int)
+ATTENDANCE_SYNC_WORKERS = config('ATTENDANCE_SYNC_WORKERS', default=os.cpu_count() or 1, cast=int)
+# Tamanho máximo do lote já descompactado (JSON com as fotos em base64)
+ATTENDANCE_SYNC_MAX_BYTES = config('ATTENDANCE_SYNC_MAX_BYTES', default=256 * 1024 * 1024, cast=int)
+# Relatório geral dos funcionários (admin): tamanho padrão e máximo da página
+ORGANIZATION_REPORT_PAGE_SIZE = config('ORGANIZATION_REPORT_PAGE_SIZE', default=100, cast=int)
+ORGANIZATION_REPORT_MAX_PAGE_SIZE = config('ORGANIZATION_REPORT_MAX_PAGE_SIZE', default=1000, cast=int)
+# Listagens de batidas e justificativas (paginação por chave): tamanho padrão e máximo da página
+API_PAGE_SIZE = config('API_PAGE_SIZE', default=50, cast=int)
+API_MAX_PAGE_SIZE = config('API_MAX_PAGE_SIZE', default=500, cast=int)
+# Exportação CSV/XLSX: linhas lidas por vez do cursor no servidor
+ATTENDANCE_EXPORT_CHUNK_SIZE = config('ATTENDANCE_EXPORT_CHUNK_SIZE', default=2000, cast=int)
+# Segundos em que a planilha XLSX gerada na fila fica disponível para download
+ATTENDANCE_EXPORT_TTL = config('ATTENDANCE_EXPORT_TTL', default=86400, cast=int)
+# Cache dos relatórios (ver accounts/report_cache.py). O padrão em arquivo é compartilhado entre os
+# workers do gunicorn; LocMem ficaria por processo e a invalidação de um worker não chegaria aos outros.
+# REPORT_CACHE_TIMEOUT=0 desliga o cache
+REPORT_CACHE_ALIAS = 'reports'
+REPORT_CACHE_TIMEOUT = config('REPORT_CACHE_TIMEOUT', default=86400, cast=int)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    REPORT_CACHE_ALIAS: {
+        'BACKEND': config('REPORT_CACHE_BACKEND', default='django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': config('REPORT_CACHE_LOCATION', default=os.path.join(tempfile.gettempdir(), 'chronos_report_cache')),
+        'TIMEOUT': REPORT_CACHE_TIMEOUT,
+        'OPTIONS': {
+            'MAX_ENTRIES': config('REPORT_CACHE_MAX_ENTRIES', default=10000, cast=int),
+        },
+    },
+}
+# Métricas das etapas da batida em /metrics (formato Prometheus). Com METRICS_DIR definido, cada
+# processo grava seus valores nesse diretório compartilhado e o endpoint soma todos os workers
+METRICS_ENABLED = config('METRICS_ENABLED', default=True, cast=bool)
+METRICS_DIR = config('METRICS_DIR', default='')
+METRICS_FLUSH_INTERVAL = config('METRICS_FLUSH_INTERVAL', default=5.0, cast=float)
+# Acesso ao /metrics: token Bearer do scraper e/ou IPs liberados (separados por vírgula)
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+METRICS_ALLOWED_IPS = config('METRICS_ALLOWED_IPS', default='127.0.0.1,::1', cast=Csv())
+
+# Logs: nível e formato ('text' ou 'json') do app, máximo de registros por segundo por evento e
+# amostragem por evento, ex.: LOG_SAMPLE_RATES=punch.received=0.1,face.encoded=0.05
+LOG_LEVEL = config('LOG_LEVEL', default='INFO')
+LOG_FORMAT = config('LOG_FORMAT', default='text')
+LOG_RATE_LIMIT = config('LOG_RATE_LIMIT', default=20, cast=int)
+LOG_SAMPLE_RATES = config(
+    'LOG_SAMPLE_RATES',
+    default='',
+    cast=lambda value: {event.strip(): float(rate) for event, rate in (item.split('=', 1) for item in value.split(',') if '=' in item)},
+)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'text': {'format': '%(asctime)s %(levelname)s %(name)s %(message)s'},
+        'json': {'()': 'accounts.logs.JsonFormatter'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'formatter': LOG_FORMAT},
+    },
+    'loggers': {
+        'accounts': {'handlers': ['console'], 'level': LOG_LEVEL, 'propagate': False},
+    },
+}
+
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10485760  
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10485760 
\ No newline at end of file